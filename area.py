@@ -0,0 +1,206 @@
+import bisect
+import collections
+import itertools
+import json
+import math
+import os
+
+import esy.osm.pbf
+from esy.osm.pbf import osmformat_pb2
+
+from idset import IdSet
+
+Selection = collections.namedtuple('Selection', 'blocks ids')
+"""Éléments d'un fichier retenus par une zone : positions des blocs qui en contiennent, ids retenus par type."""
+
+
+class Area:
+    """Zone d'analyse : rectangle ou polygones GeoJSON (trous compris, règle pair-impair sur tous les anneaux).
+
+    Le rectangle englobant est découpé une fois pour toutes en grid × grid cellules : une cellule est entièrement
+    dans la zone, entièrement hors de la zone, ou traversée par des côtés. Seules ces dernières testent, pour un point,
+    les côtés qui les traversent : leur parité le long du segment joignant le point au centre de la cellule, dont
+    l'appartenance est connue.
+    """
+
+    OUTSIDE, INSIDE, BORDER_OUTSIDE, BORDER_INSIDE = range(4)
+    """État d'une cellule, celui de son centre pour une cellule traversée (BORDER_...)."""
+    TYPES = ('node', 'way', 'relation')
+    """Types des membres de relation (MemberType du format PBF)."""
+    METERS_PER_DEGREE = 111_320
+
+    def __init__(self, rings: list, grid: int = 256):
+        rings = [ring if ring[0] == ring[-1] else [*ring, ring[0]] for ring in rings if len(ring) >= 3]
+        if not rings:
+            raise ValueError('Zone vide')
+        self.grid = grid
+        xs = [x for ring in rings for x, _ in ring]
+        ys = [y for ring in rings for _, y in ring]
+        self.bbox = (min(xs), min(ys), max(xs), max(ys))
+        self._dx = (self.bbox[2] - self.bbox[0]) / grid or 1e-9
+        self._dy = (self.bbox[3] - self.bbox[1]) / grid or 1e-9
+        edges = [
+            (x0, y0, x1, y1) for ring in rings for (x0, y0), (x1, y1) in zip(ring, ring[1:]) if (x0, y0) != (x1, y1)
+        ]
+        self._cells = bytearray(grid * grid)
+        self._edges: dict = {}
+        """Par cellule traversée : côtés (x0, y0, x1, y1) qui la traversent."""
+        for edge in edges:
+            self._trace(edge)
+        # État des centres, ligne par ligne : parité des côtés coupés à gauche du centre (+1 : OUTSIDE -> INSIDE,
+        # BORDER_OUTSIDE -> BORDER_INSIDE)
+        for row in range(grid):
+            y = self.bbox[1] + (row + 0.5) * self._dy
+            crossings = sorted(
+                x0 + (y - y0) * (x1 - x0) / (y1 - y0) for x0, y0, x1, y1 in edges if (y0 > y) != (y1 > y)
+            )
+            for col in range(grid):
+                x = self.bbox[0] + (col + 0.5) * self._dx
+                inside = bisect.bisect_left(crossings, x) % 2
+                self._cells[row * grid + col] += self.INSIDE if inside else self.OUTSIDE
+
+    def _cell(self, x: float, y: float) -> tuple:
+        col = min(max(int((x - self.bbox[0]) / self._dx), 0), self.grid - 1)
+        row = min(max(int((y - self.bbox[1]) / self._dy), 0), self.grid - 1)
+        return row, col
+
+    def _trace(self, edge: tuple) -> None:
+        """Marque les cellules traversées par le côté edge, rangée par rangée."""
+        x0, y0, x1, y1 = edge
+        row0, _ = self._cell(x0, min(y0, y1))
+        row1, _ = self._cell(x0, max(y0, y1))
+        for row in range(row0, row1 + 1):
+            if y0 == y1:
+                lo, hi = min(x0, x1), max(x0, x1)
+            else:
+                # Portion du côté comprise dans la rangée
+                bottom = max(self.bbox[1] + row * self._dy, min(y0, y1))
+                top = min(self.bbox[1] + (row + 1) * self._dy, max(y0, y1))
+                xa = x0 + (bottom - y0) * (x1 - x0) / (y1 - y0)
+                xb = x0 + (top - y0) * (x1 - x0) / (y1 - y0)
+                lo, hi = min(xa, xb), max(xa, xb)
+            for col in range(self._cell(lo, 0)[1], self._cell(hi, 0)[1] + 1):
+                k = row * self.grid + col
+                self._cells[k] = self.BORDER_OUTSIDE
+                self._edges.setdefault(k, []).append(edge)
+
+    @classmethod
+    def from_bbox(cls, min_lon: float, min_lat: float, max_lon: float, max_lat: float) -> 'Area':
+        area = cls([[(min_lon, min_lat), (max_lon, min_lat), (max_lon, max_lat), (min_lon, max_lat)]], grid=1)
+        area._cells[0], area._edges = cls.INSIDE, {}  # La zone est son propre rectangle englobant
+        return area
+
+    @classmethod
+    def from_geojson(cls, filename: str) -> 'Area':
+        """Polygones (Polygon, MultiPolygon) d'un fichier GeoJSON : géométrie, Feature ou FeatureCollection."""
+        with open(filename, encoding='utf8') as f:
+            data = json.load(f)
+        rings = []
+
+        def collect(geometry: dict) -> None:
+            match geometry['type']:
+                case 'Polygon':
+                    rings.extend(geometry['coordinates'])
+                case 'MultiPolygon':
+                    for polygon in geometry['coordinates']:
+                        rings.extend(polygon)
+                case 'GeometryCollection':
+                    for member in geometry['geometries']:
+                        collect(member)
+
+        match data['type']:
+            case 'FeatureCollection':
+                for feature in data['features']:
+                    collect(feature['geometry'])
+            case 'Feature':
+                collect(data['geometry'])
+            case _:
+                collect(data)
+        return cls([[tuple(point[:2]) for point in ring] for ring in rings])
+
+    @classmethod
+    def load(cls, spec: str) -> 'Area':
+        """Zone décrite par un fichier GeoJSON ou un rectangle « lon min,lat min,lon max,lat max »."""
+        if os.path.exists(spec):
+            return cls.from_geojson(spec)
+        return cls.from_bbox(*(float(value) for value in spec.split(',')))
+
+    def contains(self, lon: float, lat: float) -> bool:
+        if not (self.bbox[0] <= lon <= self.bbox[2] and self.bbox[1] <= lat <= self.bbox[3]):
+            return False
+        row, col = self._cell(lon, lat)
+        k = row * self.grid + col
+        state = self._cells[k]
+        if state < self.BORDER_OUTSIDE:
+            return state == self.INSIDE
+        inside = state == self.BORDER_INSIDE
+        cx, cy = self.bbox[0] + (col + 0.5) * self._dx, self.bbox[1] + (row + 0.5) * self._dy
+        for x0, y0, x1, y1 in self._edges[k]:
+            # Le segment (lon, lat) -> centre coupe-t-il ce côté ?
+            d1 = (x1 - x0) * (lat - y0) - (y1 - y0) * (lon - x0)
+            d2 = (x1 - x0) * (cy - y0) - (y1 - y0) * (cx - x0)
+            if (d1 > 0) != (d2 > 0):
+                d3 = (cx - lon) * (y0 - lat) - (cy - lat) * (x0 - lon)
+                d4 = (cx - lon) * (y1 - lat) - (cy - lat) * (x1 - lon)
+                if (d3 > 0) != (d4 > 0):
+                    inside = not inside
+        return inside
+
+    def select(self, file: esy.osm.pbf.File, margin: float = 0) -> Selection:
+        """Parcours rapide du fichier (coordonnées et références seulement, sans construire les éléments) : nœuds
+        de la zone, voies et relations qui référencent un élément retenu, blocs qui en contiennent.
+
+        Avec margin (mètres), les blocs des nœuds proches de la zone (rectangle englobant élargi de margin) et des
+        voies qui y renvoient sont aussi retenus, sans que leurs éléments le soient : géométrie des voies voisines
+        des adresses de la zone.
+        """
+        ids = {type_: IdSet() for type_ in self.TYPES}
+        nodes, ways, relations = ids['node'], ids['way'], ids['relation']
+        near = IdSet()  # Nœuds proches de la zone, hors de celle-ci
+        dy = margin / self.METERS_PER_DEGREE
+        dx = dy / max(math.cos(math.radians(max(abs(self.bbox[1]), abs(self.bbox[3])))), 0.01)
+        bbox = (self.bbox[0] - dx, self.bbox[1] - dy, self.bbox[2] + dx, self.bbox[3] + dy)
+
+        def is_near(lon: float, lat: float) -> bool:
+            return margin > 0 and bbox[0] <= lon <= bbox[2] and bbox[1] <= lat <= bbox[3]
+
+        blocks = set()
+        for block in file.blocks:
+            if block.header.type != 'OSMData':
+                continue
+            primitive_block = osmformat_pb2.PrimitiveBlock()
+            primitive_block.ParseFromString(esy.osm.pbf.read_blob(block.file, block.ofs, block.header.datasize))
+            scale = primitive_block.granularity * 1e-9
+            lat_offset, lon_offset = primitive_block.lat_offset * 1e-9, primitive_block.lon_offset * 1e-9
+            kept = 0
+            for group in primitive_block.primitivegroup:
+                dense = group.dense
+                points = itertools.chain(
+                    zip(*(itertools.accumulate(values) for values in (dense.id, dense.lat, dense.lon))),
+                    ((node.id, node.lat, node.lon) for node in group.nodes)
+                )
+                for id_, lat, lon in points:
+                    lon, lat = lon_offset + lon * scale, lat_offset + lat * scale
+                    if self.contains(lon, lat):
+                        nodes.add(id_)
+                        kept += 1
+                    elif is_near(lon, lat):
+                        near.add(id_)
+                        kept += 1
+                for way in group.ways:
+                    refs = list(itertools.accumulate(way.refs))
+                    if any(ref in nodes for ref in refs):
+                        ways.add(way.id)
+                        kept += 1
+                    elif near and any(ref in near for ref in refs):
+                        kept += 1
+                for relation in group.relations:
+                    members = (ids[self.TYPES[type_]] for type_ in relation.types)
+                    if any(member in kept_ids for member, kept_ids in zip(
+                            itertools.accumulate(relation.memids), members
+                    )):
+                        relations.add(relation.id)
+                        kept += 1
+            if kept:
+                blocks.add(block.ofs)
+        return Selection(frozenset(blocks), ids)
@@ -0,0 +1,398 @@
+import argparse
+import datetime
+import hashlib
+import json
+import logging
+import os
+import platform
+import random
+import resource
+import struct
+import sys
+import time
+import zlib
+
+import esy.osm.pbf
+from esy.osm.pbf import fileformat_pb2, osmformat_pb2
+
+import main
+import rules
+from idset import IdSet
+from names import NameIndex
+from rules import VerdictCache
+
+# Libellés de voies à la française : type de voie, puis nom de personne ou lieu-dit précédé de son article
+STREET_TYPES = (
+    ('Rue', 50), ('Chemin', 12), ('Impasse', 8), ('Allée', 6), ('Avenue', 6), ('Route', 6), ('Place', 4),
+    ('Boulevard', 3), ('Sentier', 2), ('Square', 1), ('Quai', 1), ('Cours', 1),
+)
+PEOPLE = (
+    'Victor Hugo', 'Jean Jaurès', 'Charles de Gaulle', 'Pasteur', 'Jules Ferry', 'Gambetta', 'Émile Zola',
+    'du Général Leclerc', 'Georges Clemenceau', 'Anatole France', 'Jean Moulin', 'Voltaire', 'Pierre Curie',
+    'Jean de La Fontaine', 'Paul Bert', 'Aristide Briand', 'Frédéric Mistral', 'Albert Camus', 'Louis Blériot',
+    'du Maréchal Foch', 'Saint-Exupéry', 'Étienne Dolet', 'Édouard Herriot', 'Jeanne d\'Arc', 'Marcel Pagnol',
+)
+PLACES = (
+    'de la Mairie', 'de l\'Église', 'du Moulin', 'des Écoles', 'de la Gare', 'du Château', 'des Lilas',
+    'de la Fontaine', 'du Stade', 'des Prés', 'de l\'Étang', 'du Lavoir', 'de la République', 'de la Paix',
+    'des Tilleuls', 'du Puits', 'des Vignes', 'de la Croix', 'du Bourg', 'des Acacias', 'de l\'Érable',
+    'du Presbytère', 'des Jardins', 'de la Libération', 'du 8 Mai 1945', 'du 11 Novembre', 'des Peupliers',
+)
+HIGHWAYS = ('residential', 'residential', 'residential', 'unclassified', 'tertiary', 'service', 'track', 'path')
+
+
+def street_names(count: int, rng: random.Random) -> list:
+    """count libellés distincts, du plus fréquent au plus rare."""
+    types = [type_ for type_, _ in STREET_TYPES]
+    weights = [weight for _, weight in STREET_TYPES]
+    names = {'Grande Rue': None, 'Rue Haute': None, 'Rue Basse': None}
+    count = min(count, len(types) * (len(PEOPLE) + len(PLACES)) + len(names))
+    while len(names) < count:
+        names[f'{rng.choices(types, weights)[0]} {rng.choice(PEOPLE + PLACES)}'] = None
+    names = list(names)
+    rng.shuffle(names)
+    return names[:count]
+
+
+def typo(name: str, rng: random.Random) -> str:
+    """Une erreur courante de saisie : casse, accent oublié, espace en trop."""
+    match rng.randrange(4):
+        case 0:
+            return name[0].lower() + name[1:]
+        case 1:
+            return name.replace('É', 'E').replace('é', 'e').replace('è', 'e')
+        case 2:
+            return name.replace(' ', '  ', 1)
+        case _:
+            return name + ' '
+
+
+class Fixture:
+    """Extrait .osm.pbf synthétique et déterministe (même graine, mêmes paramètres : même fichier).
+
+    Les nœuds successifs forment des villages semés au hasard en France : une marche aléatoire de quelques mètres par
+    pas. Les voies relient des nœuds successifs, des côtés de quelques mètres comme dans un extrait réel.
+    """
+
+    VERSION = 2
+    """Version de la génération, dans le nom du fichier (un fichier d'une version antérieure est régénéré)."""
+    VILLAGE = 400
+    """Nœuds par village."""
+    STEP = 5
+    """Pas maximal (m) en latitude et en longitude entre deux nœuds successifs."""
+
+    def __init__(self, nodes: int = 200_000, ways: int = 30_000, relations: int = 2_000,
+                 streets: int = 500, zipf: float = 1.1, addresses: float = 0.15, typos: float = 0.02,
+                 block_size: int = 8000, seed: int = 0):
+        self.params = {
+            'nodes': nodes, 'ways': ways, 'relations': relations, 'streets': streets, 'zipf': zipf,
+            'addresses': addresses, 'typos': typos, 'block_size': block_size, 'seed': seed
+        }
+
+    def path(self, directory: str = 'cache') -> str:
+        digest = hashlib.sha256(json.dumps({**self.params, 'version': self.VERSION}, sort_keys=True).encode())
+        digest = digest.hexdigest()[:12]
+        return os.path.join(directory, f'bench-{digest}.osm.pbf')
+
+    def build(self, directory: str = 'cache') -> str:
+        """Écrit le fichier s'il n'existe pas encore, retourne son chemin."""
+        path = self.path(directory)
+        if os.path.exists(path):
+            return path
+        os.makedirs(directory, exist_ok=True)
+        p = self.params
+        rng = random.Random(p['seed'])
+        names = street_names(p['streets'], rng)
+        weights = [1 / rank ** p['zipf'] for rank in range(1, len(names) + 1)]
+
+        def street() -> str:
+            name = rng.choices(names, weights)[0]
+            return typo(name, rng) if rng.random() < p['typos'] else name
+
+        tmp = f'{path}.{os.getpid()}.tmp'
+        with open(tmp, 'wb') as f:
+            header = osmformat_pb2.HeaderBlock()
+            header.required_features.extend(('OsmSchema-V0.6', 'DenseNodes'))
+            self._blob(f, 'OSMHeader', header)
+            node_ids = self._ids(p['nodes'], 1_000_000, rng)
+            points = self._walk(rng)
+            for i in range(0, len(node_ids), p['block_size']):
+                self._blob(f, 'OSMData', self._nodes(node_ids[i:i + p['block_size']], points, street, rng))
+            way_ids = self._ids(p['ways'], 100_000, rng)
+            for i in range(0, len(way_ids), p['block_size']):
+                self._blob(f, 'OSMData', self._ways(way_ids[i:i + p['block_size']], node_ids, street, rng))
+            relation_ids = self._ids(p['relations'], 10_000, rng)
+            for i in range(0, len(relation_ids), p['block_size']):
+                self._blob(f, 'OSMData', self._relations(relation_ids[i:i + p['block_size']], way_ids, street, rng))
+        os.replace(tmp, path)
+        return path
+
+    @staticmethod
+    def _ids(count: int, start: int, rng: random.Random) -> list:
+        ids, id_ = [], start
+        for _ in range(count):
+            id_ += rng.randint(1, 50)
+            ids.append(id_)
+        return ids
+
+    def _walk(self, rng: random.Random):
+        """Coordonnées (lat, lon en 100 nanodegrés) des nœuds successifs."""
+        step = round(self.STEP / 111_320 * 1e7)
+        while True:
+            lat, lon = rng.randint(420_000_000, 510_000_000), rng.randint(-50_000_000, 80_000_000)
+            for _ in range(self.VILLAGE):
+                lat += rng.randint(-step, step)
+                lon += rng.randint(-step, step)
+                yield lat, lon
+
+    @staticmethod
+    def _blob(f, type_: str, message) -> None:
+        data = message.SerializeToString()
+        blob = fileformat_pb2.Blob(raw_size=len(data), zlib_data=zlib.compress(data)).SerializeToString()
+        header = fileformat_pb2.BlobHeader(type=type_, datasize=len(blob)).SerializeToString()
+        f.write(struct.pack('>I', len(header)))
+        f.write(header)
+        f.write(blob)
+
+    @staticmethod
+    def _strings(block):
+        table = {'': 0}
+
+        def string(value: str) -> int:
+            if value not in table:
+                table[value] = len(table)
+            return table[value]
+
+        def close():
+            block.stringtable.s.extend(value.encode() for value in table)
+
+        return string, close
+
+    def _nodes(self, ids: list, points, street, rng: random.Random):
+        block = osmformat_pb2.PrimitiveBlock()
+        string, close = self._strings(block)
+        dense = block.primitivegroup.add().dense
+        last_id, last_lat, last_lon = 0, 0, 0
+        for id_, (lat, lon) in zip(ids, points):
+            dense.id.append(id_ - last_id)
+            dense.lat.append(lat - last_lat)
+            dense.lon.append(lon - last_lon)
+            last_id, last_lat, last_lon = id_, lat, lon
+            dense.denseinfo.version.append(rng.randint(1, 5))
+            draw = rng.random()
+            if draw < self.params['addresses']:
+                tags = {'addr:housenumber': str(rng.randint(1, 120)), 'addr:street': street()}
+            elif draw < self.params['addresses'] + 0.03:
+                tags = {'amenity': rng.choice(('bench', 'school', 'townhall')), 'name': street()}
+            else:
+                tags = {}
+            for key, value in tags.items():
+                dense.keys_vals.extend((string(key), string(value)))
+            dense.keys_vals.append(0)
+        close()
+        return block
+
+    def _ways(self, ids: list, node_ids: list, street, rng: random.Random):
+        block = osmformat_pb2.PrimitiveBlock()
+        string, close = self._strings(block)
+        group = block.primitivegroup.add()
+        for id_ in ids:
+            way = group.ways.add()
+            way.id = id_
+            way.info.version = rng.randint(1, 8)
+            if rng.random() < 0.6:
+                tags = {'highway': rng.choice(HIGHWAYS), 'name': street()}
+            else:
+                tags = {'building': 'yes'}
+            for key, value in tags.items():
+                way.keys.append(string(key))
+                way.vals.append(string(value))
+            start = rng.randrange(max(1, len(node_ids) - 10))
+            last = 0
+            for ref in node_ids[start:start + rng.randint(2, 10)]:
+                way.refs.append(ref - last)
+                last = ref
+        close()
+        return block
+
+    def _relations(self, ids: list, way_ids: list, street, rng: random.Random):
+        block = osmformat_pb2.PrimitiveBlock()
+        string, close = self._strings(block)
+        group = block.primitivegroup.add()
+        for id_ in ids:
+            relation = group.relations.add()
+            relation.id = id_
+            relation.info.version = rng.randint(1, 3)
+            if rng.random() < 0.5:
+                tags = {'type': 'associatedStreet', 'name': street()}
+            else:
+                tags = {'type': 'multipolygon', 'landuse': 'residential'}
+            for key, value in tags.items():
+                relation.keys.append(string(key))
+                relation.vals.append(string(value))
+            last = 0
+            for ref in rng.sample(way_ids, min(len(way_ids), 3)):
+                relation.memids.append(ref - last)
+                relation.types.append(osmformat_pb2.Relation.WAY)
+                relation.roles_sid.append(string('street'))
+                last = ref
+        close()
+        return block
+
+
+def peak_rss() -> int:
+    """Pic de mémoire résidente du processus depuis son lancement, en Kio."""
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak // 1024 if sys.platform == 'darwin' else peak
+
+
+class Bench:
+    """Chronométrage séparé des étapes de l'analyse : chargement des règles, parse_block et ses composants.
+
+    Les blocs sont décodés une fois (étape decode) puis gardés en mémoire pour les étapes suivantes.
+    Chaque étape est répétée repeat fois, la meilleure durée est retenue.
+    Les vérifications ne font aucun appel réseau : les actions (API OSM, JOSM) sont mises en attente et ignorées.
+    Le pic de mémoire relevé après chaque étape est celui du processus depuis son lancement.
+    """
+
+    def __init__(self, path: str, repeat: int = 3):
+        self.path = path
+        self.repeat = repeat
+        self.stages: dict = {}
+        self.blocks: list = []
+
+    def _time(self, stage: str, run) -> None:
+        """Chronomètre run (qui retourne le nombre d'éléments traités)."""
+        best = None
+        for _ in range(self.repeat):
+            start = time.perf_counter()
+            elements = run()
+            elapsed = time.perf_counter() - start
+            best = elapsed if best is None else min(best, elapsed)
+        self.stages[stage] = {
+            'seconds': round(best, 6),
+            'elements': elements,
+            'elements_per_s': round(elements / best) if best else None,
+            'peak_rss_kib': peak_rss()
+        }
+        logging.info(f'{stage:>14} : {best:8.3f} s, {self.stages[stage]["elements_per_s"] or 0:>12,} /s')
+
+    def run(self) -> dict:
+        self._time('rules_compile', lambda: len(rules.compile_rules('invalid_ways_name.csv')))
+        rules.Snapshot('invalid_ways_name.csv').load()
+        self._time('rules_snapshot', lambda: len(rules.Snapshot('invalid_ways_name.csv').load()))
+
+        def decode():
+            self.blocks = [
+                main._entries(block) for block in esy.osm.pbf.File(self.path).blocks
+                if block.header.type == 'OSMData'
+            ]
+            return sum(len(entries) for entries, _ in self.blocks)
+        self._time('decode', decode)
+
+        app = main.Application()
+        app._deferred = []  # Aucun appel réseau
+
+        def exclusions():
+            count = 0
+            for entries, _ in self.blocks:
+                count += len(entries)
+                excluded = app._exclude.window(entries)
+                if excluded:
+                    for entry in entries:
+                        _ = entry.id in excluded[main._nwr(entry)]
+            return count
+        self._time('exclusions', exclusions)
+
+        def names():
+            app.names.close()
+            app.names = NameIndex()
+            count = 0
+            for entries, _ in self.blocks:
+                for entry in entries:
+                    if 'name' in entry.tags:
+                        app.add_names(entry)
+                        count += 1
+            return count
+        self._time('names', names)
+
+        def rule_matching():
+            app._verdicts = VerdictCache(app._options['verdict_cache_size'])
+            app._deferred = []
+            count = 0
+            for entries, _ in self.blocks:
+                count += len(entries)
+                for entry in entries:
+                    app.check_highway_name(entry)
+            return count
+        self._time('rule_matching', rule_matching)
+        self.stages['rule_matching']['findings'] = len(app._deferred)
+        self.stages['rule_matching']['verdict_cache'] = str(app._verdicts)
+
+        def parse_block():
+            app.seen = {type_: IdSet() for type_ in app.seen}
+            app._verdicts = VerdictCache(app._options['verdict_cache_size'])
+            app._deferred = []
+            count = 0
+            for entries, versions in self.blocks:
+                count += len(entries)
+                app.parse_block(entries, 0, 0, 0, versions)
+            return count
+        self._time('parse_block', parse_block)
+        self.stages['parse_block']['findings'] = len(app._deferred)
+        return self.stages
+
+
+def compare(current: dict, reference: dict, tolerance: float) -> list:
+    """Étapes dont le débit a baissé de plus de tolerance (fraction) par rapport à reference."""
+    slower = []
+    for stage, values in current['stages'].items():
+        before = reference['stages'].get(stage, {}).get('elements_per_s')
+        if before and values['elements_per_s'] and values['elements_per_s'] < before * (1 - tolerance):
+            slower.append(f'{stage} : {before:,} -> {values["elements_per_s"]:,} /s')
+    return slower
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Mesure les performances de l'analyse sur un extrait synthétique.")
+    parser.add_argument('--nodes', type=int, default=200_000)
+    parser.add_argument('--ways', type=int, default=30_000)
+    parser.add_argument('--relations', type=int, default=2_000)
+    parser.add_argument('--streets', type=int, default=500, help='Nombre de libellés de voies distincts')
+    parser.add_argument('--zipf', type=float, default=1.1, help='Exposant de la loi de Zipf des libellés')
+    parser.add_argument('--addresses', type=float, default=0.15, help='Part des nœuds portant une adresse')
+    parser.add_argument('--typos', type=float, default=0.02, help='Part des libellés comportant une erreur')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--repeat', type=int, default=3, help='Répétitions de chaque étape (meilleure durée)')
+    parser.add_argument('--pbf', metavar='FICHIER', help='Mesure sur cet extrait au lieu du fichier synthétique')
+    parser.add_argument('--output', default='bench.json', metavar='FICHIER', help='Résultats (JSON)')
+    parser.add_argument('--compare', metavar='FICHIER', help='Résultats de référence (JSON) à comparer')
+    parser.add_argument('--tolerance', type=float, default=0.1,
+                        help='Baisse de débit tolérée par rapport à la référence (fraction)')
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format='%(message)s')
+
+    fixture = Fixture(args.nodes, args.ways, args.relations, args.streets, args.zipf, args.addresses, args.typos,
+                      seed=args.seed)
+    path = args.pbf or fixture.build()
+    result = {
+        'date': datetime.datetime.now().isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'machine': platform.machine(),
+        'fixture': {'path': path, **({} if args.pbf else fixture.params)},
+        'stages': Bench(path, args.repeat).run(),
+        'peak_rss_kib': peak_rss()
+    }
+    with open(args.output, 'w', encoding='utf8') as f:
+        json.dump(result, f, indent=2, ensure_ascii=False)
+
+    if args.compare:
+        with open(args.compare, encoding='utf8') as f:
+            reference = json.load(f)
+        if reference['fixture'] != result['fixture']:
+            logging.warning(f'Extrait différent de celui de la référence {args.compare}')
+        slower = compare(result, reference, args.tolerance)
+        for line in slower:
+            logging.warning(f'Régression {line}')
+        sys.exit(1 if slower else 0)
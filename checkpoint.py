@@ -0,0 +1,118 @@
+import concurrent.futures
+import fnmatch
+import json
+import os
+import pickle
+import sqlite3
+import time
+
+
+class Checkpoint:
+    """Points de reprise d'une longue analyse, dans directory/checkpoint.sqlite.
+
+    Chaque point de reprise n'écrit que ce qui a changé depuis le précédent : l'état (régions terminées, dernier bloc
+    analysé, compteurs, séries de noms déversées dans directory...), les tranches modifiées des ensembles d'éléments
+    déjà vus et les ajouts à l'index des adresses et des voies. L'écriture est faite par un thread dédié, une seule à
+    la fois, pendant que l'analyse continue.
+    """
+
+    FILES = ('names-*.csv', 'region-*.osm.pbf')
+    """Fichiers de l'analyse écrits dans directory : séries de noms déversées (NameIndex), extraits régionaux
+    concaténés (Scheduler)."""
+
+    def __init__(self, directory: str = 'checkpoint', interval: float = 300):
+        os.makedirs(directory, exist_ok=True)
+        self.directory = directory
+        self.interval = interval
+        self.filename = os.path.join(directory, 'checkpoint.sqlite')
+        self.saved = 0
+        self._executor = concurrent.futures.ThreadPoolExecutor(1, thread_name_prefix='checkpoint')
+        self._pending = None
+        self._last = time.monotonic()
+        self.db = self._run(self._connect)
+
+    def _connect(self) -> sqlite3.Connection:
+        db = sqlite3.connect(self.filename, timeout=60)
+        db.execute('PRAGMA journal_mode=WAL')
+        db.execute('PRAGMA synchronous=NORMAL')
+        with db:
+            db.execute('CREATE TABLE IF NOT EXISTS state (key TEXT PRIMARY KEY, value TEXT) WITHOUT ROWID')
+            db.execute(
+                'CREATE TABLE IF NOT EXISTS seen ('
+                'type TEXT, chunk INTEGER, bitmap INTEGER, data BLOB, PRIMARY KEY (type, chunk)) WITHOUT ROWID'
+            )
+            db.execute('CREATE TABLE IF NOT EXISTS streets (seq INTEGER PRIMARY KEY, region TEXT, data BLOB)')
+        return db
+
+    def _run(self, function, *args):
+        """Exécute function dans le thread d'écriture (seul utilisateur de la connexion), après l'écriture en cours."""
+        self.wait()
+        return self._executor.submit(function, *args).result()
+
+    def wait(self) -> None:
+        """Attend la fin de l'écriture en cours."""
+        if self._pending is not None:
+            pending, self._pending = self._pending, None
+            pending.result()  # Propage une éventuelle erreur d'écriture
+
+    def due(self) -> bool:
+        return time.monotonic() - self._last >= self.interval
+
+    def load(self) -> tuple:
+        """Dernier point de reprise : (état, {type: [(n° de tranche, bitmap, octets)]}, [ajouts à l'index des rues]).
+
+        L'état est vide s'il n'y a pas de point de reprise.
+        """
+        def read():
+            row = self.db.execute("SELECT value FROM state WHERE key = 'state'").fetchone()
+            state = json.loads(row[0]) if row else {}
+            seen = {}
+            for type_, chunk, bitmap, data in self.db.execute('SELECT type, chunk, bitmap, data FROM seen'):
+                seen.setdefault(type_, []).append((chunk, bool(bitmap), data))
+            streets = [
+                pickle.loads(data) for data, in self.db.execute(
+                    'SELECT data FROM streets WHERE region = ? ORDER BY seq', (state.get('region'),)
+                )
+            ]
+            return state, seen, streets
+
+        return self._run(read)
+
+    def save(self, state: dict, seen: dict, streets: dict | None) -> None:
+        """Enregistre en arrière-plan un point de reprise : état complet, tranches modifiées des ensembles d'éléments
+        vus ({type: IdSet.changes()}), ajouts à l'index des rues de la région en cours (StreetIndex.tail)."""
+        self.wait()
+        region, state = state.get('region'), json.dumps(state)  # Copie de l'état, qui continue d'évoluer
+
+        def write():
+            data = pickle.dumps(streets, pickle.HIGHEST_PROTOCOL) if streets is not None else None
+            with self.db:
+                self.db.executemany(
+                    'INSERT OR REPLACE INTO seen VALUES (?, ?, ?, ?)',
+                    ((type_, *chunk) for type_, chunks in seen.items() for chunk in chunks)
+                )
+                self.db.execute('DELETE FROM streets WHERE region IS NOT ?', (region,))
+                if data is not None:
+                    self.db.execute('INSERT INTO streets (region, data) VALUES (?, ?)', (region, data))
+                self.db.execute("INSERT OR REPLACE INTO state VALUES ('state', ?)", (state,))
+
+        self._pending = self._executor.submit(write)
+        self._last = time.monotonic()
+        self.saved += 1
+
+    def clear(self) -> None:
+        """Supprime le point de reprise et les fichiers de l'analyse dans directory (FILES), les autres fichiers étant
+        conservés (analyse terminée, ou nouvelle analyse sans --resume)."""
+        def delete():
+            with self.db:
+                for table in ('state', 'seen', 'streets'):
+                    self.db.execute(f'DELETE FROM {table}')
+
+        self._run(delete)
+        for entry in os.scandir(self.directory):
+            if entry.is_file() and any(fnmatch.fnmatchcase(entry.name, pattern) for pattern in self.FILES):
+                os.unlink(entry.path)
+
+    def close(self) -> None:
+        self._run(self.db.close)
+        self._executor.shutdown()
@@ -0,0 +1,99 @@
+import concurrent.futures
+import json
+import logging
+import os
+import urllib.parse
+
+import requests
+import requests.adapters
+
+
+def rebase(url: str, base: str | None) -> str:
+    """url servie par base (miroir, serveur local) : l'origine (schéma, hôte) de url est remplacée par base."""
+    if not base:
+        return url
+    parts = urllib.parse.urlsplit(url)
+    return base.rstrip('/') + urllib.parse.urlunsplit(('', '', parts.path, parts.query, ''))
+
+
+class ExtractCache:
+    """Cache disque des extraits .osm.pbf, revalidés par ETag / Last-Modified à chaque téléchargement.
+
+    Les fichiers sont écrits par morceaux au fil de la réception, sans passer en mémoire. Une requête sans réponse ni
+    données pendant timeout secondes échoue (requests.exceptions.Timeout) plutôt que de bloquer l'analyse.
+    """
+
+    CHUNK_SIZE = 1 << 20
+
+    def __init__(self, directory: str = 'cache', workers: int = 4, session: requests.Session | None = None,
+                 timeout: float = 60):
+        self.directory = directory
+        self.workers = workers
+        self.timeout = timeout
+        if session is None:
+            session = requests.Session()
+            adapter = requests.adapters.HTTPAdapter(pool_connections=workers, pool_maxsize=workers)
+            session.mount('http://', adapter)
+            session.mount('https://', adapter)
+        self.session = session
+        self.downloaded, self.revalidated = 0, 0
+
+    def path(self, url: str) -> str:
+        """Chemin local de l'extrait correspondant à url."""
+        parts = urllib.parse.urlsplit(url)
+        return os.path.join(self.directory, parts.netloc.replace(':', '_'), *parts.path.lstrip('/').split('/'))
+
+    def fetch(self, url: str) -> str:
+        """Télécharge url si l'extrait est absent ou a changé sur le serveur, retourne son chemin local."""
+        path = self.path(url)
+        meta_path = path + '.meta.json'
+        meta = {}
+        if os.path.exists(path) and os.path.exists(meta_path):
+            with open(meta_path, encoding='utf8') as f:
+                meta = json.load(f)
+
+        headers = {}
+        if 'etag' in meta:
+            headers['If-None-Match'] = meta['etag']
+        if 'last-modified' in meta:
+            headers['If-Modified-Since'] = meta['last-modified']
+
+        with self.session.get(url, headers=headers, stream=True, timeout=self.timeout) as r:
+            if r.status_code == 304:  # Not Modified
+                logging.debug(f'{url} inchangé.')
+                self.revalidated += 1
+                return path
+            r.raise_for_status()
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with open(path + '.part', 'wb') as dest:
+                for chunk in r.iter_content(self.CHUNK_SIZE):
+                    dest.write(chunk)
+            os.replace(path + '.part', path)
+            meta = {k: r.headers[k] for k in ('etag', 'last-modified') if k in r.headers}
+        with open(meta_path, 'w', encoding='utf8') as f:
+            json.dump(meta, f)
+        self.downloaded += 1
+        return path
+
+    def size(self, url: str) -> int:
+        """Taille de l'extrait : celle du fichier en cache, sinon celle annoncée par le serveur (0 si inconnue)."""
+        path = self.path(url)
+        if os.path.exists(path):
+            return os.path.getsize(path)
+        try:
+            r = self.session.head(url, allow_redirects=True, timeout=self.timeout)
+            r.raise_for_status()
+        except requests.RequestException as e:
+            logging.warning(f'{url} : taille inconnue ({e}).')
+            return 0
+        return int(r.headers.get('content-length', 0))
+
+    def sizes(self, urls) -> list:
+        """Tailles de plusieurs extraits, obtenues simultanément, dans l'ordre de urls."""
+        with concurrent.futures.ThreadPoolExecutor(self.workers) as executor:
+            return list(executor.map(self.size, urls))
+
+    def fetch_all(self, urls):
+        """Télécharge plusieurs extraits simultanément, produit leurs chemins locaux dans l'ordre de urls."""
+        with concurrent.futures.ThreadPoolExecutor(self.workers) as executor:
+            yield from executor.map(self.fetch, urls)
@@ -0,0 +1,116 @@
+import array
+import bisect
+import csv
+import hashlib
+import logging
+import operator
+import os
+import struct
+import sys
+
+
+class Exclusions:
+    """Index des éléments exclus (exclusions.csv) : un tableau trié d'entiers 64 bits par type d'élément.
+
+    L'index est conservé dans un fichier binaire (sidecar) réutilisé tant que le CSV n'a pas changé.
+    """
+
+    TYPES = ('node', 'way', 'relation')
+    MAGIC = b'CKEX'
+    VERSION = 1
+    HEADER = struct.Struct('<4sI32sqq3q')
+    """Signature, version, SHA-256 du CSV, mtime (ns) et taille du CSV, nombre d'ids par type."""
+
+    def __init__(self, filename: str = 'exclusions.csv', sidecar: str | None = None):
+        self.filename = filename
+        self.sidecar = sidecar or os.path.splitext(filename)[0] + '.idx'
+        self.ids = self._load()
+        """Par type d'élément, ids exclus triés (array('q'))."""
+
+    def __len__(self):
+        return sum(map(len, self.ids.values()))
+
+    def contains(self, type_: str, id_: int) -> bool:
+        ids = self.ids[type_]
+        i = bisect.bisect_left(ids, id_)
+        return i < len(ids) and ids[i] == id_
+
+    def window(self, entries: list) -> dict | None:
+        """Ids exclus, par type, compris dans l'intervalle des ids de entries (un bloc).
+
+        Retourne None si aucun id exclu n'est dans cet intervalle : aucun test par élément n'est alors nécessaire.
+        Les éléments peuvent être de types mélangés et non triés (fichiers osmChange).
+        """
+        if not entries or not any(self.ids.values()):
+            return None
+        ids = list(map(operator.attrgetter('id'), entries))
+        lo, hi = min(ids), max(ids)
+        window = {}
+        for type_, excluded in self.ids.items():
+            i, j = bisect.bisect_left(excluded, lo), bisect.bisect_right(excluded, hi)
+            window[type_] = frozenset(excluded[i:j])
+        return window if any(window.values()) else None
+
+    def _load(self) -> dict:
+        stat = os.stat(self.filename)
+        digest = None
+        ids = None
+        try:
+            with open(self.sidecar, 'rb') as f:
+                magic, version, sha, mtime, size, *counts = self.HEADER.unpack(f.read(self.HEADER.size))
+                if magic == self.MAGIC and version == self.VERSION:
+                    if (mtime, size) != (stat.st_mtime_ns, stat.st_size):
+                        digest = self._digest()
+                    if digest is None or digest == sha:
+                        ids = {}
+                        for type_, count in zip(self.TYPES, counts):
+                            ids[type_] = array.array('q')
+                            ids[type_].fromfile(f, count)
+                            if sys.byteorder == 'big':
+                                ids[type_].byteswap()
+        except (OSError, EOFError, struct.error):
+            ids = None
+        if ids is not None:
+            logging.debug(f'Exclusions lues depuis {self.sidecar}.')
+            if digest is not None:  # CSV touché mais inchangé
+                self._save(ids, digest, stat)
+            return ids
+
+        ids = self._parse()
+        self._save(ids, digest or self._digest(), stat)
+        return ids
+
+    def _digest(self) -> bytes:
+        with open(self.filename, 'rb') as f:
+            return hashlib.sha256(f.read()).digest()
+
+    def _parse(self) -> dict:
+        """Lecture du CSV en une seule passe."""
+        ids = {type_: [] for type_ in self.TYPES}
+        with open(self.filename, newline='', encoding="utf8") as f:
+            reader = csv.reader(f)
+            next(reader)  # Saute la 1ère ligne
+            for row in reader:
+                if len(row):
+                    type_, *id_ = row[0].split(' ')
+                    if type_ in ids:
+                        ids[type_].append(int(id_[0]))
+        return {type_: array.array('q', sorted(set(values))) for type_, values in ids.items()}
+
+    def _save(self, ids: dict, digest: bytes, stat: os.stat_result) -> None:
+        try:
+            tmp = f'{self.sidecar}.{os.getpid()}.tmp'
+            with open(tmp, 'wb') as f:
+                f.write(self.HEADER.pack(
+                    self.MAGIC, self.VERSION, digest, stat.st_mtime_ns, stat.st_size,
+                    *(len(ids[type_]) for type_ in self.TYPES)
+                ))
+                for type_ in self.TYPES:
+                    values = ids[type_]
+                    if sys.byteorder == 'big':
+                        values = array.array('q', values)
+                        values.byteswap()
+                    values.tofile(f)
+            os.replace(tmp, self.sidecar)
+        except OSError as e:
+            logging.info(f"Index des exclusions non enregistré ({e})")
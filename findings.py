@@ -0,0 +1,208 @@
+import argparse
+import collections
+import csv
+import datetime
+import logging
+import sqlite3
+import sys
+
+Finding = collections.namedtuple('Finding', 'check rule type id key value replace level region')
+"""Constat d'une vérification : vérification, motif de la règle (None hors invalid_ways_name.csv), élément (type, id),
+clé, valeur constatée et valeur corrigée (None sans correction), niveau de log, région."""
+
+MESSAGES = {
+    'name_egale_addr_housenumber': 'name = addr:housenumber ({value})',
+    'name_egale_ref': 'name = ref ({value})',
+    'name_commence_par_espace': "'name' commence par un espace ({value})",
+    'name_termine_par_espace': "'name' se termine par un espace ({value})",
+    'name_commence_par_un_chiffre': "'name' commence par un chiffre ({value})",
+    'tag_deprecie': "Tag '{key}'='{value}' déprécié",
+    'key_deprecie': "Key '{key}' dépréciée",
+    'addr_street_sans_voie': 'addr:street sans voie de ce nom à proximité ({value})',
+    'check_highway_name': 'Erreur/Typo "{rule}" sur "{key}"="{value}"',
+}
+"""Message de log de chaque vérification, formaté à partir des champs du constat."""
+
+CORRECTION = 'Correction/Typo "{rule}" sur "{key}"="{value}" -> "{replace}"'
+
+
+def log_finding(finding: Finding) -> None:
+    """Abonné écrivant le constat dans le log : le message n'est formaté que si son niveau est actif."""
+    logger = logging.getLogger('findings')
+    if not logger.isEnabledFor(finding.level):
+        return
+    template = CORRECTION if finding.replace is not None else MESSAGES[finding.check]
+    logger.log(
+        finding.level, template.format(**finding._asdict()),
+        extra={'check': finding.check, 'type': finding.type, 'id': finding.id, 'region': finding.region}
+    )
+
+
+class FindingStore:
+    """Constats de toutes les exécutions dans une base SQLite indexée par région, règle, vérification et élément.
+
+    Chaque exécution (run) est numérotée par start. Les constats sont conservés en mémoire et écrits par lots de
+    batch_size, chaque lot en une seule transaction.
+    """
+
+    COLUMNS = ('check_name', 'rule', 'type', 'id', 'key', 'value', 'replace', 'level', 'region')
+
+    def __init__(self, filename: str, batch_size: int = 10_000):
+        self.filename = filename
+        self.batch_size = batch_size
+        self.db = sqlite3.connect(filename, timeout=60)
+        self.db.execute('PRAGMA journal_mode=WAL')
+        self.db.execute('PRAGMA synchronous=NORMAL')
+        with self.db:
+            self.db.execute('CREATE TABLE IF NOT EXISTS runs (run INTEGER PRIMARY KEY, started TEXT, label TEXT)')
+            self.db.execute(
+                'CREATE TABLE IF NOT EXISTS findings (run INTEGER, check_name TEXT, rule TEXT, type TEXT, id INTEGER, '
+                'key TEXT, value TEXT, replace TEXT, level INTEGER, region TEXT)'
+            )
+            self.db.execute('CREATE INDEX IF NOT EXISTS findings_region ON findings (run, region)')
+            self.db.execute('CREATE INDEX IF NOT EXISTS findings_rule ON findings (run, rule)')
+            self.db.execute('CREATE INDEX IF NOT EXISTS findings_check ON findings (run, check_name)')
+            self.db.execute('CREATE INDEX IF NOT EXISTS findings_element ON findings (type, id, run)')
+        self.run: int | None = None
+        self._buffer: list = []
+        self.count = 0
+
+    def start(self, label: str = '') -> int:
+        """Débute une nouvelle exécution, à laquelle les constats suivants sont rattachés."""
+        self.flush()
+        with self.db:
+            self.run = self.db.execute(
+                'INSERT INTO runs (started, label) VALUES (?, ?)',
+                (datetime.datetime.now().isoformat(timespec='seconds'), label)
+            ).lastrowid
+        return self.run
+
+    def resume(self, run: int, count: int) -> None:
+        """Reprend l'exécution run interrompue : seuls ses count premiers constats (point de reprise) sont conservés."""
+        self.flush()
+        with self.db:
+            self.db.execute(
+                'DELETE FROM findings WHERE rowid IN '
+                '(SELECT rowid FROM findings WHERE run = ? ORDER BY rowid LIMIT -1 OFFSET ?)',
+                (run, count)
+            )
+        self.run, self.count = run, count
+
+    def previous(self) -> int | None:
+        """Exécution précédant l'exécution en cours (la dernière sans exécution en cours)."""
+        sql, params = 'SELECT MAX(run) FROM runs', ()
+        if self.run is not None:
+            sql, params = sql + ' WHERE run < ?', (self.run,)
+        return self.db.execute(sql, params).fetchone()[0]
+
+    def carry(self, run: int, exclude) -> int:
+        """Recopie dans l'exécution en cours les constats de l'exécution run, sauf ceux des éléments exclude
+        ((type, id)) : l'état courant est celui de run, mis à jour par les éléments revérifiés ensuite. Retourne le
+        nombre de constats recopiés."""
+        self.flush()
+        columns = ', '.join(self.COLUMNS)
+        with self.db:
+            self.db.execute(
+                'CREATE TEMP TABLE IF NOT EXISTS excluded (type TEXT, id INTEGER, PRIMARY KEY (type, id)) WITHOUT ROWID'
+            )
+            self.db.execute('DELETE FROM excluded')
+            self.db.executemany('INSERT OR IGNORE INTO excluded VALUES (?, ?)', exclude)
+            copied = self.db.execute(
+                f'INSERT INTO findings (run, {columns}) SELECT ?, {columns} FROM findings WHERE run = ? '
+                f'AND NOT EXISTS (SELECT 1 FROM excluded WHERE excluded.type = findings.type '
+                f'AND excluded.id = findings.id) ORDER BY rowid',
+                (self.run, run)
+            ).rowcount
+        self.count += copied
+        return copied
+
+    def add(self, finding: Finding) -> None:
+        """Abonné enregistrant le constat (écrit avec le lot en cours)."""
+        self._buffer.append((self.run, *finding))
+        if len(self._buffer) >= self.batch_size:
+            self.flush()
+
+    def flush(self) -> None:
+        if self._buffer:
+            with self.db:
+                self.db.executemany(
+                    f'INSERT INTO findings (run, {", ".join(self.COLUMNS)}) VALUES (?{", ?" * len(self.COLUMNS)})',
+                    self._buffer
+                )
+            self.count += len(self._buffer)
+            self._buffer = []
+
+    def close(self) -> None:
+        self.flush()
+        self.db.close()
+
+    def runs(self) -> list:
+        """Exécutions enregistrées : [(run, début, libellé, nombre de constats)]."""
+        return self.db.execute(
+            'SELECT runs.run, started, label, COUNT(findings.run) FROM runs '
+            'LEFT JOIN findings ON findings.run = runs.run GROUP BY runs.run ORDER BY runs.run'
+        ).fetchall()
+
+    def query(self, run: int | None = None, region: str | None = None, rule: str | None = None,
+              check: str | None = None, type_: str | None = None, id_: int | None = None):
+        """Constats d'une exécution (la dernière par défaut, toutes pour un élément) filtrés sur les critères
+        indiqués : produit des Finding."""
+        self.flush()
+        criteria = {'region': region, 'rule': rule, 'check_name': check, 'type': type_, 'id': id_}
+        if run is None and id_ is None:
+            run = self.db.execute('SELECT MAX(run) FROM findings').fetchone()[0]
+        if run is not None:
+            criteria['run'] = run
+        where = [(f'{column} = ?', value) for column, value in criteria.items() if value is not None]
+        sql = f'SELECT {", ".join(self.COLUMNS)} FROM findings'
+        if where:
+            sql += ' WHERE ' + ' AND '.join(condition for condition, _ in where)
+        for row in self.db.execute(sql + ' ORDER BY run, rowid', [value for _, value in where]):
+            yield Finding(*row)
+
+    def diff(self, old: int, new: int):
+        """Constats apparus ('+') ou disparus ('-') entre les exécutions old et new : produit (signe, Finding).
+
+        La région n'entre pas dans la comparaison : un élément commun à deux régions n'est vérifié que dans la
+        première analysée.
+        """
+        self.flush()
+        columns = ', '.join(self.COLUMNS[:-1])
+        for sign, a, b in (('-', old, new), ('+', new, old)):
+            for row in self.db.execute(
+                    f'SELECT {columns}, NULL FROM findings WHERE run = ? '
+                    f'EXCEPT SELECT {columns}, NULL FROM findings WHERE run = ?',
+                    (a, b)
+            ):
+                yield sign, Finding(*row)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Interroge les constats enregistrés par main.py --findings.')
+    parser.add_argument('--db', default='findings.sqlite', metavar='FICHIER', help='Base des constats')
+    commands = parser.add_subparsers(dest='command', required=True)
+    commands.add_parser('runs', help='Liste les exécutions enregistrées')
+    query = commands.add_parser('query', help="Constats d'une exécution (la dernière par défaut)")
+    query.add_argument('--run', type=int)
+    query.add_argument('--region')
+    query.add_argument('--rule', help="Motif de la règle d'invalid_ways_name.csv")
+    query.add_argument('--check', help='Nom de la vérification')
+    query.add_argument('--element', metavar='TYPE/ID', help='Élément, toutes exécutions confondues (way/123)')
+    diff = commands.add_parser('diff', help='Constats apparus (+) ou disparus (-) entre deux exécutions')
+    diff.add_argument('old', type=int)
+    diff.add_argument('new', type=int)
+    args = parser.parse_args()
+
+    store = FindingStore(args.db)
+    writer = csv.writer(sys.stdout)
+    match args.command:
+        case 'runs':
+            writer.writerow(['Run', 'Started', 'Label', 'Findings'])
+            writer.writerows(store.runs())
+        case 'query':
+            type_, id_ = args.element.split('/') if args.element else (None, None)
+            writer.writerow(FindingStore.COLUMNS)
+            writer.writerows(store.query(args.run, args.region, args.rule, args.check, type_, id_ and int(id_)))
+        case 'diff':
+            writer.writerow(['Sign', *FindingStore.COLUMNS])
+            writer.writerows((sign, *finding) for sign, finding in store.diff(args.old, args.new))
@@ -0,0 +1,76 @@
+import array
+import bisect
+
+
+class IdSet:
+    """Ensemble compact d'ids OSM (entiers positifs), à la manière d'un bitmap « roaring ».
+
+    Les ids sont répartis par tranches de 65536 : une tranche peu remplie est un tableau trié d'entiers 16 bits,
+    au-delà de SPARSE_MAX ids elle devient un bitmap de 8 Kio.
+    """
+
+    SPARSE_MAX = 4096
+
+    def __init__(self, ids=()):
+        self._chunks: dict = {}
+        self._len = 0
+        self._dirty: set = set()
+        """Tranches modifiées depuis le dernier appel à changes."""
+        self.update(ids)
+
+    def __len__(self):
+        return self._len
+
+    def __contains__(self, id_: int) -> bool:
+        chunk = self._chunks.get(id_ >> 16)
+        if chunk is None:
+            return False
+        low = id_ & 0xFFFF
+        if type(chunk) is bytearray:
+            return bool(chunk[low >> 3] & (1 << (low & 7)))
+        i = bisect.bisect_left(chunk, low)
+        return i < len(chunk) and chunk[i] == low
+
+    def add(self, id_: int) -> bool:
+        """Ajoute id_, retourne False s'il était déjà présent."""
+        high, low = id_ >> 16, id_ & 0xFFFF
+        chunk = self._chunks.get(high)
+        if chunk is None:
+            self._chunks[high] = array.array('H', (low,))
+        elif type(chunk) is bytearray:
+            bit = 1 << (low & 7)
+            if chunk[low >> 3] & bit:
+                return False
+            chunk[low >> 3] |= bit
+        else:
+            i = bisect.bisect_left(chunk, low)
+            if i < len(chunk) and chunk[i] == low:
+                return False
+            chunk.insert(i, low)
+            if len(chunk) > self.SPARSE_MAX:
+                bitmap = bytearray(8192)
+                for value in chunk:
+                    bitmap[value >> 3] |= 1 << (value & 7)
+                self._chunks[high] = bitmap
+        self._dirty.add(high)
+        self._len += 1
+        return True
+
+    def update(self, ids) -> None:
+        for id_ in ids:
+            self.add(id_)
+
+    def changes(self) -> list:
+        """Tranches modifiées depuis l'appel précédent (points de reprise) : [(n° de tranche, bitmap, octets)]."""
+        changed = [(high, type(self._chunks[high]) is bytearray, bytes(self._chunks[high])) for high in self._dirty]
+        self._dirty = set()
+        return changed
+
+    def restore(self, chunks) -> None:
+        """Rétablit des tranches produites par changes."""
+        for high, bitmap, data in chunks:
+            old = self._chunks.get(high)
+            if old is not None:
+                self._len -= int.from_bytes(old, 'little').bit_count() if type(old) is bytearray else len(old)
+            chunk = self._chunks[high] = bytearray(data) if bitmap else array.array('H', data)
+            self._len += int.from_bytes(chunk, 'little').bit_count() if bitmap else len(chunk)
@@ -0,0 +1,124 @@
+import json
+import logging
+import queue
+import threading
+import time
+
+import requests
+
+from metrics import Latency
+
+# @see https://josm.openstreetmap.de/wiki/Help/RemoteControlCommands
+
+
+class JosmDispatcher:
+    """Envoi asynchrone et groupé des commandes load_object au contrôle à distance de JOSM.
+
+    Les commandes sont mises dans une file bornée (l'appelant attend si elle est pleine) et envoyées par un thread
+    dédié, par lots d'au plus batch_size commandes ou linger secondes : les objets d'un même lot partageant les mêmes
+    addtags sont chargés par un seul appel.
+    Si output est indiqué, les appels sont écrits dans ce fichier (une ligne JSON par appel) au lieu d'être envoyés.
+    """
+
+    MERGEABLE = frozenset(('objects', 'addtags'))
+    """Paramètres des commandes pouvant être regroupées, les autres (new_layer...) sont envoyées seules."""
+
+    def __init__(self, url: str = 'http://localhost:8111', output: str | None = None,
+                 batch_size: int = 50, linger: float = 0.5, queue_size: int = 1000, put_timeout: float | None = 60):
+        self.url = url.rstrip('/')
+        self.output = output
+        self.batch_size = batch_size
+        self.linger = linger
+        self.put_timeout = put_timeout
+        self.sent, self.dropped = 0, 0
+        self.latency = Latency()
+        self._queue = queue.Queue(queue_size)
+        self._thread = None
+
+    def __str__(self):
+        return f'{self.sent:,} sent / {self.dropped:,} dropped'
+
+    def load_object(self, params: dict) -> None:
+        """Met en file une commande load_object, params comme pour le contrôle à distance de JOSM."""
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name='josm', daemon=True)
+            self._thread.start()
+        try:
+            self._queue.put(params, timeout=self.put_timeout)
+        except queue.Full:
+            self.dropped += 1
+
+    def close(self) -> None:
+        """Envoie les commandes restantes et arrête le thread d'envoi."""
+        if self._thread is not None:
+            self._queue.put(None)
+            self._thread.join()
+            self._thread = None
+
+    def _run(self) -> None:
+        session = requests.Session()
+        out = open(self.output, 'a', encoding='utf8') if self.output else None
+        try:
+            stop = False
+            while not stop:
+                batch = [self._queue.get()]
+                deadline = time.monotonic() + self.linger
+                while len(batch) < self.batch_size and batch[-1] is not None:
+                    try:
+                        batch.append(self._queue.get(timeout=max(0.0, deadline - time.monotonic())))
+                    except queue.Empty:
+                        break
+                if None in batch:
+                    stop = True
+                    batch = batch[:batch.index(None)]
+                for params in self._merge(batch):
+                    self._send(session, out, params)
+        finally:
+            if out:
+                out.close()
+            session.close()
+
+    def _merge(self, batch: list):
+        """Regroupe les commandes du lot par addtags, dans l'ordre, les autres commandes formant une barrière."""
+        groups = {}
+        for params in batch:
+            if params.keys() <= self.MERGEABLE:
+                objects = params['objects']
+                groups.setdefault(params.get('addtags'), []).extend(
+                    objects.split(',') if isinstance(objects, str) else objects
+                )
+            else:
+                yield from self._groups(groups)
+                groups = {}
+                yield params
+        yield from self._groups(groups)
+
+    @staticmethod
+    def _groups(groups: dict):
+        for addtags, objects in groups.items():
+            params = {'objects': ','.join(dict.fromkeys(objects))}
+            if addtags is not None:
+                params['addtags'] = addtags
+            yield params
+
+    def _send(self, session: requests.Session, out, params: dict) -> None:
+        started = time.monotonic()
+        try:
+            self._call(session, out, params)
+        finally:
+            self.latency.observe(time.monotonic() - started)
+
+    def _call(self, session: requests.Session, out, params: dict) -> None:
+        if out:
+            out.write(json.dumps(
+                {k: v if isinstance(v, (str, bool, int)) else list(v) for k, v in params.items()},
+                ensure_ascii=False
+            ) + '\n')
+            self.sent += 1
+            return
+        try:
+            session.get(f'{self.url}/load_object', params=params).raise_for_status()
+            self.sent += 1
+        except requests.exceptions.RequestException as e:
+            self.dropped += 1
+            logging.info(f'JOSM : appel load_object abandonné ({e})')
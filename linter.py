@@ -0,0 +1,81 @@
+import logging
+import re
+
+MOIS = (
+    'Janvier', 'Février', 'Mars', 'Avril', 'Mai', 'Juin',
+    'Juillet', 'Août', 'Septembre', 'Octobre', 'Novembre', 'Décembre'
+)
+
+CHIFFRE_EXCEPTIONS = re.compile(rf'(?:\d+ (?:{"|".join(MOIS)})|(?:1er|1ère|\d+e|\d+è|\d+ème)\s)')
+"""Libellés commençant par un chiffre admis : date historique (8 Mai...), ordinal (1er, 2ème...) suivi d'un espace."""
+
+CHIFFRE_KEYS = frozenset(('amenity', 'office', 'razed:shop', 'shop'))
+"""Clés dont la présence admet un libellé commençant par un chiffre."""
+
+CHIFFRE_TAGS = {
+    'highway': frozenset(('bus_stop',)),
+    'historic': frozenset(('memorial',)),
+    'public_transport': frozenset(('stop_position', 'plateform')),
+    'tourism': frozenset(('artwork', 'chalet', 'hotel')),
+}
+"""Valeurs de ces clés admettant un libellé commençant par un chiffre."""
+
+HOUSENUMBER_EXCEPTIONS = frozenset((121991199,))
+"""Nœuds dont le libellé peut égaler addr:housenumber (ids entiers, comme ceux des éléments)."""
+
+
+class NameLinter:
+    """Vérifications du libellé (tag name) fusionnées en une seule évaluation par élément.
+
+    Chaque vérification active (checks.csv) garde son nom, ses types d'éléments et ses exceptions ; lint produit les
+    vérifications en erreur dans l'ordre où elles étaient appelées séparément.
+    """
+
+    CHECKS = {
+        # Vérification : types d'éléments, niveau de log, chargement dans JOSM
+        'name_egale_addr_housenumber': (('node', 'way'), logging.WARNING, True),
+        'name_egale_ref': (('node', 'way', 'relation'), logging.WARNING, True),
+        'name_commence_par_espace': (('node', 'way', 'relation'), logging.ERROR, False),
+        'name_termine_par_espace': (('node', 'way', 'relation'), logging.ERROR, False),
+        'name_commence_par_un_chiffre': (('node', 'way'), logging.WARNING, True),
+    }
+    ALIASES = {'name_commence_ou_termine_par_espace': ('name_commence_par_espace', 'name_termine_par_espace')}
+    """Vérifications de checks.csv regroupant plusieurs vérifications du linter."""
+
+    def __init__(self, enabled):
+        enabled = {
+            check for name in enabled for check in self.ALIASES.get(name, (name,)) if check in self.CHECKS
+        }
+        self._enabled = {
+            type_: frozenset(check for check in enabled if type_ in self.CHECKS[check][0])
+            for type_ in ('node', 'way', 'relation')
+        }
+
+    def __bool__(self):
+        return any(self._enabled.values())
+
+    @property
+    def types(self) -> tuple:
+        """Types d'éléments concernés par au moins une vérification active."""
+        return tuple(type_ for type_, checks in self._enabled.items() if checks)
+
+    def lint(self, type_: str, id_, tags: dict):
+        """Vérifications en erreur pour le libellé tags['name'] d'un élément : produit leurs noms."""
+        enabled = self._enabled[type_]
+        name = tags['name']
+        if 'name_egale_addr_housenumber' in enabled and name == tags.get('addr:housenumber') and not (
+                (type_ == 'node' and id_ in HOUSENUMBER_EXCEPTIONS) or tags.get('amenity') == 'restaurant'
+        ):
+            yield 'name_egale_addr_housenumber'
+        if 'name_egale_ref' in enabled and name == tags.get('ref'):
+            yield 'name_egale_ref'
+        first = name[:1]
+        if 'name_commence_par_espace' in enabled and first.isspace():
+            yield 'name_commence_par_espace'
+        if 'name_termine_par_espace' in enabled and name[-1:].isspace():
+            yield 'name_termine_par_espace'
+        if 'name_commence_par_un_chiffre' in enabled and first.isdecimal() and not (
+                CHIFFRE_EXCEPTIONS.match(name) or not CHIFFRE_KEYS.isdisjoint(tags)
+                or any(tags.get(key) in values for key, values in CHIFFRE_TAGS.items())
+        ):
+            yield 'name_commence_par_un_chiffre'
@@ -1,28 +1,136 @@
+import argparse
+import array
 import csv
 import datetime
 import logging
+import multiprocessing
 import os
+import pickle
 import re
+import shutil
 import tempfile
-import xml.etree.ElementTree
+import time
 # from pprint import pprint
 
 import esy.osm.pbf
-import requests
+from esy.osm.pbf import osmformat_pb2
+
+from area import Area
+from checkpoint import Checkpoint
+from download import ExtractCache
+from exclusions import Exclusions
+from findings import Finding, FindingStore, log_finding
+from idset import IdSet
+from josm import JosmDispatcher
+from linter import NameLinter
+from metrics import Metrics
+from names import NameIndex
+from osmapi import OsmApi
+from osmchange import ACTIONS, last_changes
+from results import ResultCache
+from rules import Snapshot, VerdictCache, compile_rules
+from scheduler import Scheduler, load_regions
+from similar import SimilarNames, rule
+from streets import StreetIndex
 
 
 def _nwr(entry) -> str:
     return 'node' if type(entry) == esy.osm.pbf.file.Node else 'way' if type(
         entry) == esy.osm.pbf.file.Way else 'relation'
 
+
+def _entries(block_) -> (list, list | None):
+    """Éléments d'un bloc et leurs versions (None si le fichier ne contient pas ces métadonnées)."""
+    if not isinstance(block_, esy.osm.pbf.file.Block):
+        return list(block_), None
+    primitive_block = osmformat_pb2.PrimitiveBlock()
+    primitive_block.ParseFromString(esy.osm.pbf.read_blob(block_.file, block_.ofs, block_.header.datasize))
+    entries = list(esy.osm.pbf.iter_primitive_block(primitive_block))
+    versions = []
+    for group in primitive_block.primitivegroup:  # Même ordre que iter_primitive_block
+        versions.extend(group.dense.denseinfo.version)
+        versions.extend(way.info.version for way in group.ways)
+        versions.extend(relation.info.version for relation in group.relations)
+    if len(versions) != len(entries) or 0 in versions:
+        return entries, None
+    return entries, versions
+
+
+def _entry_from_xml(element):
+    """Construit un Node, Way ou Relation à partir d'un élément XML de l'API OSM."""
+    tags = {i.attrib['k']: i.attrib['v'] for i in element.iter('tag')}
+    match element.tag:
+        case 'node':
+            return esy.osm.pbf.Node(
+                id=element.attrib['id'], tags=tags,
+                lonlat=(float(element.attrib['lon']), float(element.attrib['lat']))
+            )
+        case 'way':
+            return esy.osm.pbf.Way(id=element.attrib['id'], tags=tags, refs=None)
+        case 'relation':
+            return esy.osm.pbf.Relation(id=element.attrib['id'], tags=tags, members=None)
+
 # @see https://josm.openstreetmap.de/wiki/Help/RemoteControlCommands
 
 
 class Application:
 
-    def __init__(self):
+    def __init__(self, verdict_cache_size: int = 100_000, result_cache: str | None = None,
+                 street_radius: float = 200, findings: str | None = None, log_findings: bool = True,
+                 checkpoint: str | None = None, checkpoint_interval: float = 300, area: str | None = None,
+                 metrics: str | None = None, metrics_interval: float = 60,
+                 osm_api: str = 'https://api.openstreetmap.org/api/0.6', api_interval: float = 0.2,
+                 josm_url: str = 'http://localhost:8111', josm_output: str | None = None):
+        self._options = {
+            'verdict_cache_size': verdict_cache_size, 'result_cache': result_cache, 'street_radius': street_radius,
+            'metrics': metrics
+        }
+        """Paramètres transmis aux processus de travail du mode parallèle."""
         self.errors: int = 0
-        self.names: dict = {}
+        self.checkpoints = Checkpoint(checkpoint, checkpoint_interval) if checkpoint else None
+        """Points de reprise de l'analyse (--checkpoint)."""
+        self.done: list = []
+        """Régions entièrement analysées."""
+        self.summary: list = []
+        """Bilan de chaque région analysée : {'region', 'nodes', 'ways', 'relations', 'errors', 'seconds'...}."""
+        self._resumed: dict = {}
+        """État de la région interrompue, reprise par parse (--resume)."""
+        self._source: tuple | None = None
+        """Fichier de la région en cours : (chemin, taille)."""
+        self._streets_mark: tuple | None = None
+        """Contenu de streets déjà enregistré dans un point de reprise."""
+        self.names = self._name_index()
+        self.area = Area.load(area) if area else None
+        """Zone d'analyse (--area) : seuls ses nœuds et les éléments qui y renvoient sont vérifiés."""
+        self._selection = None
+        """Éléments du fichier en cours retenus par la zone d'analyse (Area.select)."""
+        self._verdicts = VerdictCache(verdict_cache_size)
+        self.api = OsmApi(osm_api, min_interval=api_interval)
+        self.josm = JosmDispatcher(josm_url, output=josm_output)
+        self._to_verify: list = []
+        self._deferred: list | None = None
+        """Actions (logs, JOSM, API OSM) mises en attente par un processus de travail, None en mode séquentiel."""
+        self._actions: int = 0
+        """Nombre d'actions (JOSM, relecture API OSM) demandées par les vérifications."""
+        self._to_store: list = []
+        self.seen = {type_: IdSet() for type_ in ('node', 'way', 'relation')}
+        """Éléments déjà analysés, d'un extrait et d'une région à l'autre : chacun n'est vérifié qu'une fois."""
+        self._new_ids: dict | None = None
+        """Processus de travail : ids analysés, à ajouter à seen par le processus principal."""
+        self._pool = None
+        """Processus de travail du mode parallèle, créés une seule fois pour toute l'exécution (workers)."""
+        self._shared: str | None = None
+        """Répertoire des états publiés aux processus de travail : ajouts à seen de chaque extrait, sélections."""
+        self._generation = 0
+        """Nombre d'ajouts à seen publiés (processus de travail : appliqués)."""
+        self.region: str | None = None
+        """Région en cours d'analyse, rattachée aux constats."""
+        self.findings = FindingStore(findings) if findings else None
+        """Constats de toutes les exécutions (--findings)."""
+        self.subscribers: list = [self.findings.add] if self.findings else []
+        """Destinataires de chaque constat (Finding) : base des constats, log."""
+        if log_findings:
+            self.subscribers.append(log_finding)
 
         logging.debug("Loading deprecated keys.")
         self._deprecated_keys = list()
@@ -41,175 +149,201 @@ class Application:
             )
 
         logging.debug("Loading exclusions.")
-        with open('exclusions.csv', newline='', encoding="utf8") as f:
-            reader = csv.reader(f)
-            next(reader)  # Saute la 1ère ligne
-            nodes = frozenset(
-                int(row[0].split(' ')[1])
-                for row in reader
-                if len(row) and len(row[0].split(' ')) and row[0].split(' ')[0] == 'node'
-            )
-
-            f.seek(0)
-            reader = csv.reader(f)
-            next(reader)  # Saute la 1ère ligne
-            ways = frozenset(
-                int(row[0].split(' ')[1])
-                for row in reader
-                if len(row) and len(row[0].split(' ')) and row[0].split(' ')[0] == 'way'
-            )
-
-            f.seek(0)
-            reader = csv.reader(f)
-            next(reader)  # Saute la 1ère ligne
-            relations = frozenset(
-                int(row[0].split(' ')[1])
-                for row in reader
-                if len(row) and len(row[0].split(' ')) and row[0].split(' ')[0] == 'relation'
-            )
-
-        self._exclude = {'node': nodes, 'way': ways, 'relation': relations}
+        self._exclude = Exclusions('exclusions.csv')
 
         logging.debug("Loading invalid ways name.")
-        with open('invalid_ways_name.csv', newline='', encoding="utf8") as f:
+        self._invalid_ways_name = Snapshot('invalid_ways_name.csv').load()
+        self.metrics = Metrics(self._invalid_ways_name.patterns, metrics, metrics_interval)
+
+        logging.debug("Loading checks.")
+        with open('checks.csv', newline='', encoding="utf8") as f:
             reader = csv.reader(f)
             next(reader)  # Saute la 1ère ligne
-
-            l_: list = []
-            for row in reader:
-                if len(row) and row[0][0] != '#':
-                    try:
-                        r0 = re.compile(row[0])
-                    except re.error as e:
-                        print(repr(e))
-                        print('Exception on regexp :', e.msg)
-                        print('in ', e.pattern)
-                        print(' ' * e.pos, '---^')
-                        raise
-                    if len(row) == 1:
-                        l_.append((r0,))
-                    else:
-                        l_.append((r0, row[1]))
-            self._invalid_ways_name = l_
+            enabled = frozenset(row[0] for row in reader if len(row) and row[0][0] != '#' and row[1].strip() == '1')
+
+        self._name_linter = NameLinter(enabled)
+        """Vérifications du libellé activées individuellement dans checks.csv, évaluées ensemble par lint_name."""
+        if self._name_linter:
+            enabled |= {'lint_name'}
+
+        nwr = ('node', 'way', 'relation')
+        registry = (
+            # Vérification, types d'éléments, clés dont la présence déclenche la vérification
+            (self.add_names, nwr, {'name'}),
+            (self.lint_name, self._name_linter.types, {'name'}),
+            (self.check_highway_name, ('node',), {'addr:street'}),
+            (self.check_highway_name, ('way',), {'highway'}),
+            (self.check_highway_name, ('relation',), {'type'}),
+            (self.addr_street_sans_voie, ('node',), {'addr:street'}),
+            (self.key_deprecie, nwr, self._deprecated_keys),
+            (self.tag_deprecie, nwr, {key for key, _ in self._deprecated_tags}),
+        )
+        self._checks = {}
+        """Par type d'élément : (toutes les clés déclenchantes, [(vérification active, ses clés déclenchantes)])"""
+        self._collectors = {}
+        """Par type d'élément : vérifications refaites même pour un élément inchangé (collecte des noms)."""
+        for type_ in nwr:
+            checks = [
+                (check, frozenset(keys)) for check, types, keys in registry
+                if type_ in types and check.__name__ in enabled
+            ]
+            self._checks[type_] = (frozenset().union(*(keys for _, keys in checks)), checks)
+            self._collectors[type_] = [
+                (check, keys) for check, keys in checks if check.__name__ in ('add_names', 'addr_street_sans_voie')
+            ]
+        self.streets = StreetIndex(street_radius) if 'addr_street_sans_voie' in enabled else None
+        """Adresses, voies nommées et coordonnées des nœuds, pour le contrôle spatial des addr:street."""
+
+        self._results = None
+        if result_cache:
+            logging.debug("Loading result cache.")
+            self._results = ResultCache(result_cache, sources=(
+                'invalid_ways_name.csv', 'deprecated_keys.csv', 'deprecated_tags.csv', 'exclusions.csv', 'checks.csv'
+            ))
+
+    def _load_object(self, params: dict) -> None:
+        """Commande JOSM load_object, différée vers le processus principal en mode parallèle"""
+        self._actions += 1
+        if self._deferred is not None:
+            self._deferred.append(('load_object', params))
+            return
+        self.josm.load_object(params)
+
+    def _name_index(self) -> NameIndex:
+        """Collecte des noms, déversée dans le répertoire des points de reprise s'il y en a."""
+        return NameIndex(directory=self.checkpoints.directory if self.checkpoints else None)
+
+    def _report(self, check: str, type_: str, id_, key: str, value: str, replace: str | None = None,
+                rule: str | None = None, level: int = logging.WARNING) -> None:
+        """Constat d'une vérification, différé vers le processus principal en mode parallèle"""
+        finding = Finding(check, rule, type_, int(id_), key, value, replace, level, self.region)
+        if self._deferred is not None:
+            self._deferred.append(('finding', finding))
+            return
+        self._publish(finding)
+
+    def _publish(self, finding: Finding) -> None:
+        for subscriber in self.subscribers:
+            subscriber(finding)
 
     def add_names(self, entry):
         """Compte les libellés de 'name' dans une liste les regroupant tous."""
-        name = entry.tags['name']
-        try:
-            self.names[name].add(f'{_nwr(entry)}/{entry.id}')
-        except KeyError:
-            self.names[name] = {f'{_nwr(entry)}/{entry.id}'}
+        self.names.add(entry.tags['name'], _nwr(entry), entry.id)
 
-    def name_egale_addr_housenumber(self, entry):
-        """Recherche name = addr:housenumber"""
-        try:
-            if entry.tags['name'] == entry.tags['addr:housenumber']:
-                if (type(entry) == esy.osm.pbf.file.Node and entry.id in ('121991199',)) or \
-                   ('amenity' in entry.tags and entry.tags['amenity'] == 'restaurant'):
-                    return  # Exceptions
-                self.errors += 1
-                logging.warning(
-                    f"name = addr:housenumber ({entry.tags['name']})",
-                    extra={'type': _nwr(entry), 'id': entry.id}
-                )
-                requests.get(
-                    'http://localhost:8111/load_object',
-                    params={'objects': _nwr(entry) + str(entry.id)}
-                )
-        except KeyError:
-            pass
-
-    def name_egale_ref(self, entry):
-        """Recherche name = addr:housenumber"""
-        try:
-            if entry.tags['name'] == entry.tags['ref']:
-                self.errors += 1
-                logging.warning(
-                    f"name = ref ({entry.tags['name']})",
-                    extra={'type': _nwr(entry), 'id': entry.id}
-                )
-                requests.get(
-                    'http://localhost:8111/load_object',
-                    params={'objects': _nwr(entry) + str(entry.id)}
-                )
-        except KeyError:
-            pass
-
-    def name_commence_ou_termine_par_espace(self, entry):
-        """name commence ou se termine par un espace"""
-        if re.match(r'^\s', entry.tags['name']):
-            self.errors += 1
-            logging.error(
-                f"'name' commence par un espace ({entry.tags['name']})",
-                extra={'type': _nwr(entry), 'id': entry.id}
-            )
-        if re.match(r'\s$', entry.tags['name']):
+    def lint_name(self, entry):
+        """Vérifications du libellé (name_egale_..., name_commence_...), en une seule évaluation (NameLinter)"""
+        for check in self._name_linter.lint(_nwr(entry), entry.id, entry.tags):
+            _, level, load = NameLinter.CHECKS[check]
             self.errors += 1
-            logging.error(
-                "'name' se termine par un espace ({entry.tags['name']})",
-                extra={'type': _nwr(entry), 'id': entry.id}
-            )
-
-    def name_commence_par_un_chiffre(self, entry):
-        """Name commence avec un chiffre sauf shops sauf ..."""
-        mois = (
-            'Janvier', 'Février', 'Mars', 'Avril', 'Mai', 'Juin',
-            'Juillet', 'Août', 'Septembre', 'Octobre', 'Novembre', 'Décembre'
-        )
-        try:
-            # si commence par un chiffre mais...
-            # est un shop
-            # est un amenity
-            # est un numérique suivi d'un mois de l'année (date historique)
-            # est 1er, 2ème etc.
-            if re.match(r'^\d', entry.tags['name']):
-                if (
-                   re.match(f'^\\d+ ({"|".join(mois)})', entry.tags['name']) or
-                   re.match(r'^(1er|1ère|\d+e|\d+è|\d+ème)\s', entry.tags['name']) or
-                   'amenity' in entry.tags or
-                   ('highway' in entry.tags and entry.tags['highway'] in ('bus_stop', )) or
-                   ('historic' in entry.tags and entry.tags['historic'] in ('memorial', )) or
-                   'office' in entry.tags or
-                   ('public_transport' in entry.tags and
-                        entry.tags['public_transport'] in ('stop_position', 'plateform')) or
-                   'razed:shop' in entry.tags or
-                   'shop' in entry.tags or
-                   ('tourism' in entry.tags and
-                        entry.tags['tourism'] in ('artwork', 'chalet', 'hotel'))
-                   ):
-                    return  # Exceptions à la règle
-                self.errors += 1
-                logging.warning(
-                    f"'name' commence par un chiffre ({entry.tags['name']})",
-                    extra={'type': _nwr(entry), 'id': entry.id}
-                )
-                requests.get(
-                    'http://localhost:8111/load_object',
-                    params={'objects': _nwr(entry) + str(entry.id)}
-                )
-
-        except KeyError:
-            pass
+            self._report(check, _nwr(entry), entry.id, 'name', entry.tags['name'], level=level)
+            if load:
+                self._load_object({'objects': _nwr(entry) + str(entry.id)})
 
     def tag_deprecie(self, entry):
         """Tags (key/value) dépréciés"""
         for tag in entry.tags:
             if (tag, entry.tags[tag]) in self._deprecated_tags:
                 self.errors += 1
-                logging.info(
-                    f"Tag \'{tag}\'=\'{entry.tags[tag]}\' déprécié ({entry.tags['name']})",
-                    extra={'type': _nwr(entry), 'id': entry.id}
-                )
+                self._report('tag_deprecie', _nwr(entry), entry.id, tag, entry.tags[tag], level=logging.INFO)
 
     def key_deprecie(self, entry):
         """Key dépréciés"""
         for tag in entry.tags:
             if tag in self._deprecated_keys:
                 self.errors += 1
-                logging.info(
-                    f"Key \'{tag}\' dépréciée ({entry.tags['name']})",
-                    extra={'type': _nwr(entry), 'id': entry.id}
-                )
+                self._report('key_deprecie', _nwr(entry), entry.id, tag, entry.tags[tag], level=logging.INFO)
+
+    def addr_street_sans_voie(self, entry):
+        """Collecte les adresses (addr:street), comparées en fin d'analyse (report_streets) aux voies nommées
+        collectées bloc par bloc (parse_block)"""
+        self.streets.add_address(entry)
+
+    def report_streets(self) -> None:
+        """Signale les adresses dont la voie (addr:street) n'a pas été trouvée à proximité"""
+        if self.streets is None:
+            return
+        for id_, street in self.streets.missing():
+            self.errors += 1
+            self._report('addr_street_sans_voie', 'node', id_, 'addr:street', street)
+            self._load_object({'objects': f'node{id_}'})
+        self.streets.clear()
+
+    def verify_name(self, type_: str, id_: int, key: str) -> None:
+        """Met en attente la relecture de l'élément depuis l'API OSM, faite par lots (flush_verifications)"""
+        self._to_verify.append((type_, id_, key))
+        if len(self._to_verify) >= self.api.batch_size:
+            self.flush_verifications()
+
+    def flush_verifications(self) -> None:
+        """Relit par lots les éléments en attente depuis l'API OSM et y applique toutes les règles"""
+        pending, self._to_verify = self._to_verify, []
+        elements = {
+            type_: self.api.fetch(type_, (id_ for t, id_, _ in pending if t == type_))
+            for type_ in {t for t, _, _ in pending}
+        }
+        for type_, id_, key in pending:
+            element = elements[type_].get(str(id_))
+            if element is not None:  # None : Element Gone !
+                self._check_reloaded(_entry_from_xml(element), key)
+
+    def _check_reloaded(self, new_entry, key: str) -> str | None:
+        """Applique toutes les règles (recherche, correction) à l'élément relu depuis l'API OSM"""
+        # logging.warning(f'Typo "{row[0].pattern}" reload\n{new_entry}')
+        try:
+            value = new_entry.tags[key]
+        except KeyError:  # Tag supprimé depuis la création de l'extrait
+            return None
+        corrections = []
+        candidates = self._invalid_ways_name.candidates(value)
+        while candidates:
+            i = candidates.pop(0)
+            row = self._invalid_ways_name[i]
+            match = self.metrics.search(i, row[0], value) if self.metrics.timed else row[0].search(value)
+            if match:
+                if len(row) == 1:     # search
+                    self.errors += 1
+                    self._report('check_highway_name', _nwr(new_entry), new_entry.id, key, value, rule=row[0].pattern)
+                    self._load_object({'objects': _nwr(new_entry) + str(new_entry.id)})
+                elif len(row) == 2:   # search & replace
+                    try:
+                        replace = match.expand(row[1])
+                    except re.error as e:
+                        print(repr(e))
+                        print('Exception on regexp :', e.msg)
+                        print('in ', e.pattern)
+                        print(' ' * e.pos, '---^')
+                        raise
+                    if replace != value:
+                        corrections.append((row[0].pattern, value, replace))
+                        value = replace
+                        # Le libellé a changé : nouvelle sélection des règles suivantes
+                        candidates = self._invalid_ways_name.candidates(value, i + 1)
+
+        if value != new_entry.tags[key]:
+            self.errors += 1
+            for pattern, old, new in corrections:
+                self._report('check_highway_name', _nwr(new_entry), new_entry.id, key, old, new, pattern, logging.ERROR)
+            self._load_object({
+                'objects': _nwr(new_entry) + str(new_entry.id),
+                'addtags': f'{key}={replace}'
+            })
+        return value
+
+    def _verdict(self, value: str) -> tuple:
+        """1ère règle de correction qui modifie value : (n° de la règle, remplacement), () si aucune."""
+        for i in self._invalid_ways_name.candidates(value):
+            row = self._invalid_ways_name[i]
+            if len(row) == 2:
+                match = self.metrics.search(i, row[0], value) if self.metrics.timed else row[0].search(value)
+                if match:
+                    try:
+                        replace = match.expand(row[1])
+                    except re.error as e:
+                        print(f'{e} : {row[1]}')
+                        raise e
+                    if replace != value:
+                        return i, replace
+        return ()
 
     def check_highway_name(self, entry):
         """Pour un sous-ensemble des highway, vérifie le contenu du champ name et sa validité"""
@@ -225,92 +359,21 @@ class Application:
         """Types (tags) de voies auxquelles les tests de nommage s'appliquent."""
 
         def check_name(entry_, key: str) -> str:
-            # 1er tour pour chercher 1 match
-            # new_entry = None
-            for row in self._invalid_ways_name:
-                if len(row) == 2:
-                    match = row[0].search(entry_.tags[key])
-                    if match:
-                        try:
-                            replace = match.expand(row[1])
-                        except re.error as e:
-                            print(f'{e} : {row[1]}')
-                            raise e
-                        if replace != entry_.tags[key]:
-                            req = requests.get(f'https://api.openstreetmap.org/api/0.6/{_nwr(entry_)}/{entry_.id}')
-                            try:
-                                req.raise_for_status()
-                            except requests.exceptions.HTTPError as e:
-                                if req.status_code == 410:  # Element Gone !
-                                    return entry_.tags[key]
-                                raise e
-                            root = xml.etree.ElementTree.fromstring(req.content)
-                            match root[0].tag:
-                                case 'node':
-                                    new_entry = esy.osm.pbf.Node(
-                                        id=root[0].attrib['id'],
-                                        tags={i.attrib['k']: i.attrib['v'] for i in root[0].iter('tag')},
-                                        lonlat=(float(root[0].attrib['lon']), float(root[0].attrib['lat']))
-                                    )
-                                    break
-                                case 'way':
-                                    new_entry = esy.osm.pbf.Way(
-                                        id=root[0].attrib['id'],
-                                        tags={i.attrib['k']: i.attrib['v'] for i in root[0].iter('tag')},
-                                        refs=None
-                                    )
-                                    break
-                                case 'relation':
-                                    new_entry = esy.osm.pbf.Relation(
-                                        id=root[0].attrib['id'],
-                                        tags={i.attrib['k']: i.attrib['v'] for i in root[0].iter('tag')},
-                                        members=None
-                                    )
-                                    break
-            else:   # not Find, no break;
+            # 1er tour pour chercher 1 match, le verdict est mémorisé pour ce libellé
+            verdict = self._verdicts.get((key, entry_.tags[key]))
+            if verdict is None:
+                verdict = self._verdict(entry_.tags[key])
+                self._verdicts.put((key, entry_.tags[key]), verdict)
+
+            if not verdict:   # not Find
                 return entry_.tags[key]
 
-            # logging.warning(f'Typo "{row[0].pattern}" reload\n{new_entry}')
-            value = new_entry.tags[key]
-            error_msg = []
-            for row in self._invalid_ways_name:
-                match = row[0].search(value)
-                if match:
-                    if len(row) == 1:     # search
-                        self.errors += 1
-                        logging.warning(f'Erreur/Typo "{row[0].pattern}" sur "{key}"="{value}"')
-                        requests.get(
-                            'http://localhost:8111/load_object',
-                            params={'objects': _nwr(new_entry) + str(new_entry.id)}
-                        )
-                    elif len(row) == 2:   # search & replace
-                        try:
-                            replace = match.expand(row[1])
-                        except re.error as e:
-                            print(repr(e))
-                            print('Exception on regexp :', e.msg)
-                            print('in ', e.pattern)
-                            print(' ' * e.pos, '---^')
-                            raise
-                        if replace != value:
-                            error_msg.append(
-                                f'Correction/Typo "{row[0].pattern}" sur "{key}"="{value}" -> "{replace}"'
-                            )
-                            value = replace
-
-            if value != new_entry.tags[key]:
-                self.errors += 1
-                if len(error_msg):
-                    for msg in error_msg:
-                        logging.error(msg)
-                requests.get(
-                    'http://localhost:8111/load_object',
-                    params={
-                        'objects': _nwr(new_entry) + str(new_entry.id),
-                        'addtags': f'{key}={replace}'
-                    }
-                )
-            return value
+            self._actions += 1
+            if self._deferred is not None:  # Mode parallèle : vérification faite par le processus principal
+                self._deferred.append(('verify_name', _nwr(entry_), entry_.id, key))
+            else:
+                self.verify_name(_nwr(entry_), entry_.id, key)
+            return entry_.tags[key]
 
         try:    # if keys doesn't exist
             match entry:
@@ -323,95 +386,553 @@ class Application:
         except KeyError:
             pass
 
-    def parse_block(self, block_, nodes_: int, ways_: int, relations_: int) -> (int, int, int):
-        for entry in block_:
+    def parse_block(self, block_, nodes_: int, ways_: int, relations_: int, versions: list | None = None) -> (int, int, int):
+        if versions is None:
+            entries, versions = _entries(block_)
+        else:
+            entries = list(block_)
+        if self.streets is not None:
+            # Y compris les éléments déjà vus ou hors de la zone d'analyse : les adresses de cette région y renvoient
+            self.streets.add_nodes(entries)
+            self.streets.add_ways(entries)
+        if self._selection is not None:  # Zone d'analyse
+            ids = self._selection.ids
+            kept = [n for n, entry in enumerate(entries) if entry.id in ids[_nwr(entry)]]
+            entries = [entries[n] for n in kept]
+            if versions:
+                versions = [versions[n] for n in kept]
+        excluded = self._exclude.window(entries)  # None : aucun élément du bloc n'est exclu
+        # Éléments déjà vérifiés sans erreur dans cette version lors d'une exécution précédente
+        known = self._results.clean(entries, versions) if self._results and versions else None
+        self.metrics.blocks += 1
+        self.metrics.elements += len(entries)
+        timed = self.metrics.timed  # Sans --metrics, aucune mesure autour des vérifications
+        for n, entry in enumerate(entries):
             match type(entry):
                 case esy.osm.pbf.file.Node:
-                    if int(entry.id) in self._exclude['node']:
+                    if excluded and entry.id in excluded['node']:
                         continue
-
+                    if not self.seen['node'].add(entry.id):
+                        continue  # Déjà vu (extraits voisins qui se recouvrent)
                     nodes_ += 1
-                    try:
-                        self.add_names(entry)
-                        # self.name_egale_addr_housenumber(entry)
-                        # self.name_egale_ref(entry)
-                        # self.name_commence_ou_termine_par_espace(entry)
-                        # self.name_commence_par_un_chiffre(entry)
-                    except KeyError:  # Pas de name
-                        pass
-
-                    self.check_highway_name(entry)
-                    # self.key_deprecie(entry)
-                    # self.tag_deprecie(entry)
+                    kind = 'node'
 
                 case esy.osm.pbf.file.Way:
-                    if int(entry.id) in self._exclude['way']:
+                    if excluded and entry.id in excluded['way']:
                         continue
-
+                    if not self.seen['way'].add(entry.id):
+                        continue  # Déjà vu (extraits voisins qui se recouvrent)
                     ways_ += 1
-                    try:
-                        self.add_names(entry)
-                        # self.name_egale_addr_housenumber(entry)
-                        # self.name_egale_ref(entry)
-                        # self.name_commence_ou_termine_par_espace(entry)
-                        # self.name_commence_par_un_chiffre(entry)
-                    except KeyError:  # Pas de name
-                        pass
-
-                    self.check_highway_name(entry)
-                    # self.key_deprecie(entry)
-                    # self.tag_deprecie(entry)
+                    kind = 'way'
 
                 case esy.osm.pbf.file.Relation:
-                    if int(entry.id) in self._exclude['relation']:
+                    if excluded and entry.id in excluded['relation']:
                         continue
-
+                    if not self.seen['relation'].add(entry.id):
+                        continue  # Déjà vu (extraits voisins qui se recouvrent)
                     relations_ += 1
+                    kind = 'relation'
+
+            if self._new_ids is not None:
+                self._new_ids[kind].append(entry.id)
+            triggers, checks = self._checks[kind]
+            if triggers.isdisjoint(entry.tags):
+                continue  # Aucune vérification ne peut s'appliquer
+            if versions:
+                if known and known.get((kind, entry.id)) == versions[n]:
+                    self._results.skipped += 1
+                    checks = self._collectors[kind]  # Seule la collecte des noms est refaite
+                before = (self.errors, self._actions)
+            for check, keys in checks:
+                if not keys.isdisjoint(entry.tags):
+                    if timed:
+                        started = time.perf_counter()
                     try:
-                        self.add_names(entry)
-                        # self.name_egale_ref(entry)
-                        # self.name_commence_ou_termine_par_espace(entry)
-                    except KeyError:  # Pas de name
+                        check(entry)
+                    except KeyError:  # Pas de name...
                         pass
-
-                    self.check_highway_name(entry)
-                    # self.key_deprecie(entry)
-                    # self.tag_deprecie(entry)
-
+                    if timed:
+                        self.metrics.check(check.__name__, time.perf_counter() - started)
+            if versions:
+                self._to_store.append((kind, entry.id, versions[n], before == (self.errors, self._actions)))
+
+        if self._results and self._deferred is None:
+            self._results.store(self._to_store)
+            self._to_store = []
         return nodes_, ways_, relations_
 
-    def parse(self, region_: str, file: esy.osm.pbf.File) -> None:
-        """Analyse tout le fichier transmis en 2 passes (1 Collecte des blocs (et taille), 2 analyse des blocs"""
-        logging.debug('Parsing fichier à vide.')
-        blocks = list(file.blocks)
-        size = len(blocks)
-        nodes, ways, relations = 0, 0, 0
-        self.errors = 0
-        self.names = {}
+    def parse(self, region_: str, file: esy.osm.pbf.File, processes: int = 1) -> None:
+        """Analyse tout le fichier transmis en une seule passe, au fil de la lecture des blocs.
+
+        L'avancement (et l'heure de fin estimée) est calculé sur la position dans le fichier.
+        """
+        size = os.fstat(file.file.fileno()).st_size
+        self.region = region_
+        self._source = (file.file.name, size)
+        resumed = self._resumed if self._resumed.get('region') == region_ else {}
+        if resumed:
+            self._resumed = {}
+        if resumed and tuple(resumed['file']) != self._source:
+            logging.warning(f'{region_} : extrait différent de celui du point de reprise, analyse complète '
+                            f'(les éléments déjà vus avant l\'interruption ne sont pas revérifiés).')
+        elif resumed:
+            # Reprise après le dernier bloc du point de reprise
+            skip, (nodes, ways, relations), self.errors = resumed['block'], resumed['counts'], resumed['errors']
+            logging.debug(f'Reprise de {region_} après le bloc {skip}.')
+            if self.streets is not None:
+                self.streets.clear()
+                for tail in resumed['streets']:
+                    self.streets.extend(tail)
+                self._streets_mark = self.streets.mark()
+        else:
+            skip, nodes, ways, relations = -1, 0, 0, 0
+            self.errors = 0
+            if self.streets is not None:
+                self.streets.clear()
+            self._streets_mark = None
+            if self.checkpoints:
+                self.checkpoint(skip, nodes, ways, relations)
         start = datetime.datetime.now()
+        if self.area:
+            # Voies voisines des adresses de la zone comprises (addr_street_sans_voie)
+            self._selection = self.area.select(file, self.streets.radius if self.streets is not None else 0)
+            print(f'{region_} : {len(self._selection.blocks):,} blocks in area -',
+                  ' - '.join(f'{type_} : {len(ids):,}' for type_, ids in self._selection.ids.items()))
         logging.debug('Parsing des blocs.')
-        # for i, block in enumerate(blocks[56600:]):
-        for i, block in enumerate(blocks):
-            nodes, ways, relations = self.parse_block(block, nodes, ways, relations)
-            now = datetime.datetime.now()
-            end = start + (now - start) / ((i + 1) / size)
-            print(f'{region_}:{i}', f'{now.strftime("%H:%M:%S")} ({(i + 1) / size:3.2%}) -> {end.strftime("%H:%M")} :',
-                  f'Names : {len(self.names)} - Errors : {self.errors}',
-                  f'- Nodes : {nodes:,} - Ways : {ways:,} - Rels : {relations:,}')
+        if processes > 1:
+            nodes, ways, relations = self._parse_parallel(
+                region_, file, size, processes, start, skip, (nodes, ways, relations)
+            )
+        else:
+            for i, block in enumerate(file.blocks):
+                if i <= skip:
+                    continue  # Déjà analysé avant l'interruption
+                if self._selection and block.ofs not in self._selection.blocks:
+                    continue  # Aucun élément de la zone d'analyse
+                nodes, ways, relations = self.parse_block(block, nodes, ways, relations)
+                self._progress(region_, i, block.ofs + block.header.datasize, size, start, nodes, ways, relations)
+        self.flush_verifications()
+        self.report_streets()
+        if self.findings:
+            self.findings.flush()
+        self.summary.append({
+            'region': region_, 'nodes': nodes, 'ways': ways, 'relations': relations, 'errors': self.errors,
+            'seconds': round((datetime.datetime.now() - start).total_seconds(), 1)
+        })
+        if self.checkpoints:
+            self.done.append(region_)
+            self.checkpoint(None, nodes, ways, relations)
         logging.debug('Parsing terminé.')
 
+    def _progress(self, region_: str, i: int, done: int, size: int, start: datetime.datetime,
+                  nodes: int, ways: int, relations: int) -> None:
+        now = datetime.datetime.now()
+        end = start + (now - start) / (done / size)
+        print(f'{region_}:{i}', f'{now.strftime("%H:%M:%S")} ({done / size:3.2%}) -> {end.strftime("%H:%M")} :',
+              f'Names : {len(self.names)} - Errors : {self.errors}',
+              f'- Nodes : {nodes:,} - Ways : {ways:,} - Rels : {relations:,}',
+              f'- Cache : {self._verdicts} - JOSM : {self.josm}',
+              f'- Unchanged : {self._results.skipped:,}' if self._results else '')
+        self.metrics.tick(self.latencies())
+        if self.checkpoints and self.checkpoints.due():
+            self.checkpoint(i, nodes, ways, relations)
+
+    def checkpoint(self, block: int | None, nodes: int, ways: int, relations: int) -> None:
+        """Point de reprise : région en cours analysée jusqu'au bloc n° block inclus (None : entièrement).
+
+        Les noms collectés sont déversés sur disque et les constats écrits, seuls les ajouts depuis le point de reprise
+        précédent sont enregistrés. Les relectures en attente (API OSM) sont enregistrées telles quelles, faites par
+        lots après la reprise : aucun appel réseau ici.
+        """
+        self.names.spill()
+        if self.findings:
+            self.findings.flush()
+        tail = None
+        if self.streets is not None:
+            tail = self.streets.tail(self._streets_mark)
+            self._streets_mark = self.streets.mark()
+        self.checkpoints.save(
+            {
+                'done': self.done, 'summary': self.summary, 'region': self.region, 'file': self._source, 'block': block,
+                'counts': (nodes, ways, relations), 'errors': self.errors, 'names': self.names.files,
+                'findings': (self.findings.run, self.findings.count) if self.findings else None,
+                'to_verify': self._to_verify
+            },
+            {type_: ids.changes() for type_, ids in self.seen.items()},
+            tail
+        )
+
+    def resume(self) -> None:
+        """Reprend l'analyse interrompue au dernier point de reprise : régions terminées, éléments déjà vus, constats,
+        noms collectés et, pour la région en cours, compteurs et index des rues (repris par parse)."""
+        state, seen, streets = self.checkpoints.load()
+        if not state:
+            logging.warning('Aucun point de reprise, analyse complète.')
+            return
+        self.done, self.summary = state['done'], state['summary']
+        for type_, chunks in seen.items():
+            self.seen[type_].restore(chunks)
+        if self.findings and state['findings']:
+            self.findings.resume(*state['findings'])
+        self._to_verify = [tuple(pending) for pending in state.get('to_verify', ())]
+        self.names.close()
+        self.names = self._name_index()
+        self.names.reopen(name for name in state['names'] if os.path.exists(name))
+        if state['block'] is not None:
+            self._resumed = state | {'streets': streets}
+        logging.debug(f"Reprise : {len(self.done)} régions terminées, {state['region']} au bloc {state['block']}.")
+
+    def resumable(self, region_: str) -> str | None:
+        """Fichier de region_ interrompue par le point de reprise, s'il existe encore (pas de nouveau
+        téléchargement)."""
+        if self._resumed.get('region') == region_ and os.path.exists(self._resumed['file'][0]):
+            return self._resumed['file'][0]
+        return None
+
+    def workers(self, processes: int):
+        """Pool des processus de travail, créé au premier appel avec les éléments déjà vus (seen).
+
+        Les éléments vus ensuite leur sont publiés extrait par extrait (fichiers seen-N de _shared), chaque processus
+        appliquant ceux qui lui manquent avant une tranche : son ensemble ne diffère de celui du processus principal
+        que par les éléments de l'extrait en cours.
+        """
+        if self._pool is None:
+            self._shared = tempfile.mkdtemp(prefix='workers-')
+            self._pool = multiprocessing.Pool(
+                processes, initializer=_init_worker,
+                initargs=(self._options, logging.getLogger().level, self.seen, self._shared, self._generation)
+            )
+        return self._pool
+
+    def close_workers(self) -> None:
+        if self._pool is not None:
+            self._pool.close()
+            self._pool.join()
+            self._pool = None
+            shutil.rmtree(self._shared, ignore_errors=True)
+
+    def _share(self, value, name: str | None = None) -> str:
+        """Publie value aux processus de travail dans le fichier name de _shared (nom unique par défaut), retourne
+        son chemin."""
+        if name is None:
+            fd, path = tempfile.mkstemp(suffix='.pickle', dir=self._shared)
+            os.close(fd)
+        else:
+            path = os.path.join(self._shared, name)
+        with open(path, 'wb') as f:
+            pickle.dump(value, f, pickle.HIGHEST_PROTOCOL)
+        return path
+
+    def latencies(self) -> dict:
+        """Durées des appels aux services externes, par service."""
+        return {'osm_api': self.api.latency, 'josm': self.josm.latency}
+
+    def _parse_parallel(self, region_: str, file: esy.osm.pbf.File, size: int, processes: int,
+                        start: datetime.datetime, skip: int = -1, counts: tuple = (0, 0, 0)) -> tuple:
+        """Répartit les blocs par tranches sur un pool de processus puis fusionne les résultats partiels dans l'ordre.
+
+        Les tranches (positions et en-têtes des blocs) sont constituées au fil de la lecture du fichier, extrait par
+        extrait : deux extraits voisins se recouvrent, pas deux blocs d'un même extrait.
+        Les actions à effets de bord (logs, API OSM, JOSM) sont rejouées ici, une seule fois et sans entrelacement.
+        Les blocs jusqu'au n° skip inclus, déjà analysés avant une interruption, et ceux hors de la zone d'analyse
+        sont ignorés.
+        """
+        def segments():
+            """Extraits successifs du fichier (chacun commence par un bloc OSMHeader) : (n°, position, en-tête) des
+            blocs à analyser."""
+            segment = []
+            for j, block in enumerate(file.blocks):
+                if block.header.type == 'OSMHeader' and segment:
+                    yield segment
+                    segment = []
+                if j > skip and (self._selection is None or block.ofs in self._selection.blocks):
+                    segment.append((j, block.ofs, block.header))
+            if segment:
+                yield segment
+
+        pool = self.workers(processes)
+        selection = self._share(self._selection) if self._selection is not None else None
+        nodes, ways, relations = counts
+        for segment in segments():
+            # Les processus partent des éléments vus jusqu'à l'extrait précédent : publiés à la fin de chaque extrait
+            added = {type_: array.array('q') for type_ in self.seen}
+            chunks = [segment[j:j + 16] for j in range(0, len(segment), 16)]
+            tasks = (
+                (file.file.name, [(ofs, header) for _, ofs, header in chunk], self._generation, selection)
+                for chunk in chunks
+            )
+            for chunk, partial in zip(chunks, pool.imap(_parse_range, tasks)):
+                i = chunk[-1][0]  # N° du dernier bloc analysé, les blocs hors de la zone d'analyse comptant aussi
+                nodes += partial['nodes']
+                ways += partial['ways']
+                relations += partial['relations']
+                self.errors += partial['errors']
+                self.names.update(partial['names'])
+                if self.streets is not None:
+                    self.streets.update(partial['streets'])
+                self.metrics.update(partial['metrics'])
+                for type_, ids in partial['seen'].items():
+                    self.seen[type_].update(ids)
+                    added[type_].extend(ids)
+                if self._results:
+                    self._results.store(partial['results'])
+                    self._results.skipped += partial['skipped']
+                self._verdicts.hits += partial['cache'][0]
+                self._verdicts.misses += partial['cache'][1]
+                self._verdicts.evictions += partial['cache'][2]
+                self.replay(partial['findings'])
+                self._progress(region_, i, partial['done'], size, start, nodes, ways, relations)
+            if any(added.values()):
+                self._share(added, f'seen-{self._generation}.pickle')
+                self._generation += 1
+        return nodes, ways, relations
+
+    def parse_changes(self, region_: str, filenames, names_file: str = 'names.csv', chunk: int = 8000) -> None:
+        """Mode incrémental : applique des fichiers osmChange (.osc) à la place d'un extrait complet.
+
+        Les éléments créés ou modifiés passent par les vérifications de parse_block, la collecte des noms issue de
+        names_file (s'il existe) est mise à jour : les éléments modifiés ou supprimés y sont d'abord retirés.
+        De même, les constats de l'exécution précédente sont repris, sauf ceux des éléments modifiés (revérifiés) ou
+        supprimés.
+        """
+        changes = last_changes(filenames)
+        self.region = region_
+        if self.findings and (previous := self.findings.previous()) is not None:
+            carried = self.findings.carry(previous, changes.keys())
+            logging.debug(f'{region_} : {carried} constats repris de l\'exécution {previous}.')
+        self.errors = 0
+        self.names.close()
+        self.names = NameIndex()
+        if os.path.exists(names_file):
+            self.names.load(names_file, skip=changes.keys())
+        counts = {action: 0 for action in ACTIONS}
+        for action, _, _ in changes.values():
+            counts[action] += 1
+        logging.debug(f'{region_} : {len(changes)} éléments modifiés.')
+
+        kept = [(entry, version) for action, entry, version in changes.values() if action != 'delete']
+        nodes, ways, relations = 0, 0, 0
+        for i in range(0, len(kept), chunk):
+            entries, versions = zip(*kept[i:i + chunk])
+            nodes, ways, relations = self.parse_block(
+                entries, nodes, ways, relations, versions=list(versions) if 0 not in versions else []
+            )
+        self.flush_verifications()
+        if self.streets is not None:
+            self.streets.clear()  # Voies inchangées absentes des fichiers osmChange : pas de contrôle spatial
+        if self.findings:
+            self.findings.flush()
+        print(f'{region_}:', ' - '.join(f'{action} : {count:,}' for action, count in counts.items()), ':',
+              f'Names : {len(self.names)} - Errors : {self.errors}',
+              f'- Nodes : {nodes:,} - Ways : {ways:,} - Rels : {relations:,}',
+              f'- Cache : {self._verdicts} - JOSM : {self.josm}')
+        self.metrics.tick(self.latencies())
+
+    def replay(self, findings: list) -> None:
+        """Exécute, dans l'ordre, les actions mises en attente par un processus de travail."""
+        for action, *args in findings:
+            match action:
+                case 'log':
+                    logging.getLogger(args[0].name).handle(args[0])
+                case 'finding':
+                    self._publish(args[0]._replace(region=self.region))
+                case 'load_object':
+                    self._load_object(*args)
+                case 'verify_name':
+                    self.verify_name(*args)
+
     def save_names(self, filename_: str):
         """Sauvegarde la liste de tous les noms (tag name) collectés"""
         with open(filename_, 'w', encoding='UTF8', newline='') as f:
             writer = csv.writer(f)
-            for k in sorted(self.names):
+            for k, refs in self.names.items():  # Fusion externe des séries triées
                 ligne = [k]
-                for i in self.names[k]:
+                for i in refs:
                     ligne.append(i)
                 writer.writerow(ligne)
 
+    def save_summary(self, filename_: str) -> None:
+        """Affiche et sauvegarde le bilan de chaque région analysée"""
+        columns = ('region', 'extracts', 'size', 'download', 'seconds', 'nodes', 'ways', 'relations', 'errors')
+        with open(filename_, 'w', encoding='UTF8', newline='') as f:
+            writer = csv.DictWriter(f, columns, extrasaction='ignore')
+            writer.writeheader()
+            writer.writerows(self.summary)
+        for row in self.summary:
+            print(f"{row['region']} : {row.get('size', 0) / 1e6:,.0f} MB",
+                  f"- Download : {row.get('download', 0):,.0f} s - Parse : {row['seconds']:,.0f} s",
+                  f"- Nodes : {row['nodes']:,} - Ways : {row['ways']:,} - Rels : {row['relations']:,}",
+                  f"- Errors : {row['errors']:,}")
+
+    def save_similar_names(self, filename_: str) -> None:
+        """Sauvegarde les variantes rares de libellés fréquents (typos probables) et la règle suggérée pour chacune.
+
+        Les libellés déjà corrigés par une règle d'invalid_ways_name.csv sont ignorés.
+        """
+        with open(filename_, 'w', encoding='UTF8', newline='') as f:
+            writer = csv.writer(f)
+            writer.writerow(
+                ['Name', 'Count', 'Frequent name', 'Frequent count', 'Distance', 'Search', 'Replace', 'Elements']
+            )
+            for name, refs, frequent, count, distance in SimilarNames().near_duplicates(self.names.items):
+                if self._verdict(name):
+                    continue
+                writer.writerow([name, len(refs), frequent, count, distance, *rule(name, frequent), ' '.join(refs)])
+
+
+class _DeferredHandler(logging.Handler):
+    """Met les enregistrements de log en attente dans la liste d'actions du processus de travail."""
+
+    def __init__(self, app: Application):
+        super().__init__()
+        self.app = app
+
+    def emit(self, record):
+        record.getMessage()  # Les arguments sont formatés avant d'être transmis
+        self.app._deferred.append(('log', record))
+
+
+_worker: Application | None = None
+"""Application propre à chaque processus de travail du mode parallèle."""
+
+
+def _init_worker(options: dict, level: int, seen: dict, shared: str, generation: int) -> None:
+    global _worker
+    _worker = Application(**options)
+    _worker.seen = seen
+    _worker._shared = shared
+    _worker._generation = generation
+    _worker._selection_file = None
+    _worker._deferred = []
+    root = logging.getLogger()
+    root.handlers = [_DeferredHandler(_worker)]
+    root.setLevel(level)
+
+
+def _parse_range(task: tuple) -> dict:
+    """Analyse une tranche de blocs (positions et en-têtes), retourne les résultats partiels et les actions en attente."""
+    filename, headers, generation, selection = task
+    for n in range(_worker._generation, generation):
+        # Éléments vus dans les extraits analysés depuis la tranche précédente de ce processus
+        with open(os.path.join(_worker._shared, f'seen-{n}.pickle'), 'rb') as f:
+            for type_, ids in pickle.load(f).items():
+                _worker.seen[type_].update(ids)
+    _worker._generation = max(_worker._generation, generation)
+    if selection != _worker._selection_file:
+        _worker._selection_file = selection
+        _worker._selection = None
+        if selection is not None:
+            with open(selection, 'rb') as f:
+                _worker._selection = pickle.load(f)
+    _worker.errors = 0
+    _worker.names = NameIndex(None)
+    if _worker.streets is not None:
+        _worker.streets.clear()
+    _worker._deferred = []
+    _worker._to_store = []
+    _worker.metrics = Metrics(_worker.metrics.patterns, timed=_worker.metrics.timed)
+    _worker._new_ids = {type_: array.array('q') for type_ in _worker.seen}
+    cache = (_worker._verdicts.hits, _worker._verdicts.misses, _worker._verdicts.evictions)
+    skipped = _worker._results.skipped if _worker._results else 0
+    nodes, ways, relations = 0, 0, 0
+    with esy.osm.pbf.File(filename) as osm_pbf:
+        for ofs, header in headers:
+            block = esy.osm.pbf.file.Block(osm_pbf.file, ofs, header)
+            nodes, ways, relations = _worker.parse_block(block, nodes, ways, relations)
+    return {
+        'blocks': len(headers),
+        'done': ofs + header.datasize,
+        'nodes': nodes, 'ways': ways, 'relations': relations,
+        'errors': _worker.errors,
+        'names': _worker.names,
+        'streets': _worker.streets,
+        'metrics': _worker.metrics,
+        'findings': _worker._deferred,
+        'results': _worker._to_store,
+        'seen': _worker._new_ids,
+        'skipped': (_worker._results.skipped if _worker._results else 0) - skipped,
+        'cache': (
+            _worker._verdicts.hits - cache[0],
+            _worker._verdicts.misses - cache[1],
+            _worker._verdicts.evictions - cache[2]
+        )
+    }
+
 
 if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Vérifie les libellés OSM des régions françaises.')
+    parser.add_argument('--regions', default='regions.csv', metavar='FICHIER',
+                        help='Régions à analyser et leurs extraits départementaux, analysées de la plus volumineuse '
+                             'à la plus petite')
+    parser.add_argument('--area', metavar='ZONE',
+                        help="Limite l'analyse à une zone : fichier GeoJSON (Polygon, MultiPolygon) ou rectangle "
+                             "« lon min,lat min,lon max,lat max » ; les voies et relations qui renvoient à un nœud "
+                             "de la zone sont vérifiées, les blocs sans élément de la zone ne sont pas décodés")
+    parser.add_argument('--processes', type=int, default=1,
+                        help='Nombre de processus analysant les blocs en parallèle (1 : séquentiel)')
+    parser.add_argument('--prefetch', type=int, default=2,
+                        help="Nombre de régions téléchargées à l'avance pendant l'analyse de la région en cours")
+    parser.add_argument('--downloads', type=int, default=4,
+                        help='Nombre de téléchargements simultanés des extraits départementaux')
+    parser.add_argument('--cache', default='cache',
+                        help='Répertoire du cache des extraits téléchargés')
+    parser.add_argument('--changes', metavar='OSC', nargs='+',
+                        help='Mode incrémental : applique ces fichiers osmChange (.osc, .osc.gz) à names.csv '
+                             'au lieu de télécharger et analyser les extraits complets')
+    parser.add_argument('--result-cache', default='results.sqlite', metavar='FICHIER',
+                        help='Résultats par élément et version, pour ne pas revérifier les éléments inchangés '
+                             '(chaîne vide : désactivé)')
+    parser.add_argument('--metrics', metavar='PREFIXE',
+                        help="Écrit périodiquement les mesures (durées par vérification et par règle, débit, "
+                             "latences API OSM et JOSM) dans PREFIXE.json et PREFIXE.prom (Prometheus)")
+    parser.add_argument('--metrics-interval', type=float, default=60, metavar='SECONDES',
+                        help='Intervalle entre deux écritures des mesures')
+    parser.add_argument('--compile-rules', action='store_true',
+                        help="Valide les règles d'invalid_ways_name.csv (motifs et remplacements), enregistre leur "
+                             "instantané compilé (invalid_ways_name.rules) puis s'arrête")
+    parser.add_argument('--similar-names', metavar='FICHIER',
+                        help="Écrit dans ce fichier les libellés rares proches d'un libellé fréquent "
+                             "(typos probables), avec les éléments concernés et la règle suggérée")
+    parser.add_argument('--street-radius', type=float, default=200, metavar='METRES',
+                        help="Distance en deçà de laquelle la voie d'une adresse (addr:street) doit être trouvée")
+    parser.add_argument('--summary', default='summary.csv', metavar='FICHIER',
+                        help='Bilan de chaque région (extraits, durées, éléments, erreurs) écrit en fin d\'analyse')
+    parser.add_argument('--josm-url', default='http://localhost:8111', metavar='URL',
+                        help='Contrôle à distance de JOSM')
+    parser.add_argument('--osm-api', default='https://api.openstreetmap.org/api/0.6', metavar='URL',
+                        help='API OSM utilisée pour relire les éléments en erreur')
+    parser.add_argument('--api-interval', type=float, default=0.2, metavar='SECONDES',
+                        help="Délai minimal entre deux requêtes à l'API OSM")
+    parser.add_argument('--extracts-url', metavar='URL',
+                        help="Origine (schéma, hôte) remplaçant celle des extraits de regions.csv : miroir, "
+                             "serveur local (replay.py)")
+    parser.add_argument('--josm-output', metavar='FICHIER',
+                        help='Écrit les appels JOSM dans ce fichier au lieu de les envoyer (sans JOSM)')
+    parser.add_argument('--findings', default='findings.sqlite', metavar='FICHIER',
+                        help='Base SQLite des constats de chaque exécution, à interroger avec findings.py '
+                             '(chaîne vide : désactivé)')
+    parser.add_argument('--log-findings', action=argparse.BooleanOptionalAction, default=True,
+                        help='Écrit aussi les constats dans openstreetmap.log')
+    parser.add_argument('--checkpoint', default='checkpoint', metavar='REPERTOIRE',
+                        help="Répertoire des points de reprise et des extraits régionaux en cours d'analyse "
+                             "(chaîne vide : désactivé)")
+    parser.add_argument('--checkpoint-interval', type=float, default=300, metavar='SECONDES',
+                        help='Intervalle entre deux points de reprise')
+    parser.add_argument('--resume', action='store_true',
+                        help="Reprend l'analyse interrompue au dernier point de reprise, sans retélécharger ni "
+                             "réanalyser les régions terminées et les blocs déjà analysés")
+    args = parser.parse_args()
+
+    if args.compile_rules:
+        logging.basicConfig(level=logging.INFO, format='%(levelname)s - %(message)s')
+        snapshot = Snapshot('invalid_ways_name.csv')
+        try:
+            ruleset = compile_rules(snapshot.filename)
+        except re.error as e:
+            parser.exit(1, f'{e}\n')
+        snapshot.save(ruleset)
+        parser.exit(0, f'{len(ruleset)} règles compilées dans {snapshot.path}.\n')
+
     FORMAT = '%(asctime)s [%(lineno)5d] %(levelname)8s - %(funcName)s - %(message)s ' \
              'https://www.openstreetmap.org/%(type)s/%(id)s'
 #    logging.basicConfig(filename='openstreetmap.log', filemode='w', encoding='utf-8', level=logging.DEBUG,
@@ -422,192 +943,57 @@ if __name__ == '__main__':
         format=r'%(asctime)s [%(lineno)5d] %(levelname)8s - %(funcName)s - %(message)s'
     )
 
-#     requests.get(
-#         'http://localhost:8111/load_object',
-#         params={
-#             'objects': {'r/1403916'},
-# #            'addtags': {'name': 'France métropolitaine'}
-#         }
-#     )
-    # liste = {
-    #     'nord', 'ardennes', 'meuse', 'meurthe_et_moselle', 'moselle', 'bas_rhin', 'haut_rhin', 'doubs', 'jura',
-    #     'ain', 'haute_savoie', 'savoie', 'hautes_alpes', 'alpes_de_haute_provence', 'alpes_maritimes', 'var',
-    #     'pyrenees_orientales', 'ariege', 'haute_garonne', 'hautes_pyrenees', 'pyrenees_atlantiques'
-    # }
-    # liste = {'essonne', 'ile_de_france'}
-    liste = [
-        ('Auvergne-Rhône-Alpes', {
-            'https://download.openstreetmap.fr/extracts/europe/france/rhone_alpes/ain.osm.pbf',
-            'https://download.openstreetmap.fr/extracts/europe/france/auvergne/allier.osm.pbf',
-            'https://download.openstreetmap.fr/extracts/europe/france/rhone_alpes/ardeche.osm.pbf',
-            'https://download.openstreetmap.fr/extracts/europe/france/auvergne/cantal.osm.pbf',
-            'https://download.openstreetmap.fr/extracts/europe/france/rhone_alpes/drome.osm.pbf',
-            'https://download.openstreetmap.fr/extracts/europe/france/rhone_alpes/isere.osm.pbf',
-            'https://download.openstreetmap.fr/extracts/europe/france/rhone_alpes/loire.osm.pbf',
-            'https://download.openstreetmap.fr/extracts/europe/france/auvergne/haute_loire.osm.pbf',
-            'https://download.openstreetmap.fr/extracts/europe/france/auvergne/puy_de_dome.osm.pbf',
-            'https://download.openstreetmap.fr/extracts/europe/france/rhone_alpes/rhone.osm.pbf',
-            'https://download.openstreetmap.fr/extracts/europe/france/rhone_alpes/savoie.osm.pbf',
-            'https://download.openstreetmap.fr/extracts/europe/france/rhone_alpes/haute_savoie.osm.pbf'
-        }),
-        ('Bourgogne-Franche-Comté', {
-            'https://download.openstreetmap.fr/extracts/europe/france/bourgogne/cote_d_or.osm.pbf',
-            'https://download.openstreetmap.fr/extracts/europe/france/franche_comte/doubs.osm.pbf',
-            'https://download.openstreetmap.fr/extracts/europe/france/franche_comte/jura.osm.pbf',
-            'https://download.openstreetmap.fr/extracts/europe/france/bourgogne/nievre.osm.pbf',
-            'https://download.openstreetmap.fr/extracts/europe/france/franche_comte/haute_saone.osm.pbf',
-            'https://download.openstreetmap.fr/extracts/europe/france/bourgogne/saone_et_loire.osm.pbf',
-            'https://download.openstreetmap.fr/extracts/europe/france/bourgogne/yonne.osm.pbf',
-            'https://download.openstreetmap.fr/extracts/europe/france/franche_comte/territoire_de_belfort.osm.pbf'
-        }),
-        ('Bretagne', {
-            'https://download.openstreetmap.fr/extracts/europe/france/bretagne/cotes_d_armor.osm.pbf',
-            'https://download.openstreetmap.fr/extracts/europe/france/bretagne/finistere.osm.pbf',
-            'https://download.openstreetmap.fr/extracts/europe/france/bretagne/ille_et_vilaine.osm.pbf',
-            'https://download.openstreetmap.fr/extracts/europe/france/bretagne/morbihan.osm.pbf'
-        }),
-        ('Centre-Val de Loire', {
-            'https://download.openstreetmap.fr/extracts/europe/france/centre/cher.osm.pbf',
-            'https://download.openstreetmap.fr/extracts/europe/france/centre/eure_et_loir.osm.pbf',
-            'https://download.openstreetmap.fr/extracts/europe/france/centre/indre.osm.pbf',
-            'https://download.openstreetmap.fr/extracts/europe/france/centre/indre_et_loire.osm.pbf',
-            'https://download.openstreetmap.fr/extracts/europe/france/centre/loir_et_cher.osm.pbf',
-            'https://download.openstreetmap.fr/extracts/europe/france/centre/loiret.osm.pbf'
-        }),
-        ('Corse', {
-            'https://download.openstreetmap.fr/extracts/europe/france/corse/corse_du_sud.osm.pbf',
-            'https://download.openstreetmap.fr/extracts/europe/france/corse/haute_corse.osm.pbf'
-        }),
-        ('Grand Est', {
-            'https://download.openstreetmap.fr/extracts/europe/france/champagne_ardenne/ardennes.osm.pbf',
-            'https://download.openstreetmap.fr/extracts/europe/france/champagne_ardenne/aube.osm.pbf',
-            'https://download.openstreetmap.fr/extracts/europe/france/alsace/bas_rhin.osm.pbf',
-            'https://download.openstreetmap.fr/extracts/europe/france/alsace/haut_rhin.osm.pbf',
-            'https://download.openstreetmap.fr/extracts/europe/france/champagne_ardenne/haute_marne.osm.pbf',
-            'https://download.openstreetmap.fr/extracts/europe/france/champagne_ardenne/marne.osm.pbf',
-            'https://download.openstreetmap.fr/extracts/europe/france/lorraine/meurthe_et_moselle.osm.pbf',
-            'https://download.openstreetmap.fr/extracts/europe/france/lorraine/meuse.osm.pbf',
-            'https://download.openstreetmap.fr/extracts/europe/france/lorraine/moselle.osm.pbf',
-            'https://download.openstreetmap.fr/extracts/europe/france/lorraine/vosges.osm.pbf'
-        }),
-        ('Hauts-de-France', {
-            'https://download.openstreetmap.fr/extracts/europe/france/picardie/aisne.osm.pbf',
-            'https://download.openstreetmap.fr/extracts/europe/france/nord_pas_de_calais/nord.osm.pbf',
-            'https://download.openstreetmap.fr/extracts/europe/france/picardie/oise.osm.pbf',
-            'https://download.openstreetmap.fr/extracts/europe/france/nord_pas_de_calais/pas_de_calais.osm.pbf',
-            'https://download.openstreetmap.fr/extracts/europe/france/picardie/somme.osm.pbf'
-        }),
-        ('Île-de-France', {
-            'https://download.openstreetmap.fr/extracts/europe/france/ile_de_france/essonne.osm.pbf',
-            'https://download.openstreetmap.fr/extracts/europe/france/ile_de_france/hauts_de_seine.osm.pbf',
-            'https://download.openstreetmap.fr/extracts/europe/france/ile_de_france/paris.osm.pbf',
-            'https://download.openstreetmap.fr/extracts/europe/france/ile_de_france/seine_et_marne.osm.pbf',
-            'https://download.openstreetmap.fr/extracts/europe/france/ile_de_france/seine_saint_denis.osm.pbf',
-            'https://download.openstreetmap.fr/extracts/europe/france/ile_de_france/val_d_oise.osm.pbf',
-            'https://download.openstreetmap.fr/extracts/europe/france/ile_de_france/val_de_marne.osm.pbf',
-            'https://download.openstreetmap.fr/extracts/europe/france/ile_de_france/yvelines.osm.pbf'
-        }),
-        ('Normandie', {
-            'https://download.openstreetmap.fr/extracts/europe/france/basse_normandie/calvados.osm.pbf',
-            'https://download.openstreetmap.fr/extracts/europe/france/haute_normandie/eure.osm.pbf',
-            'https://download.openstreetmap.fr/extracts/europe/france/basse_normandie/manche.osm.pbf',
-            'https://download.openstreetmap.fr/extracts/europe/france/basse_normandie/orne.osm.pbf',
-            'https://download.openstreetmap.fr/extracts/europe/france/haute_normandie/seine_maritime.osm.pbf'
-        }),
-        ('Nouvelle-Aquitaine', {
-            'https://download.openstreetmap.fr/extracts/europe/france/poitou_charentes/charente.osm.pbf',
-            'https://download.openstreetmap.fr/extracts/europe/france/poitou_charentes/charente_maritime.osm.pbf',
-            'https://download.openstreetmap.fr/extracts/europe/france/limousin/correze.osm.pbf',
-            'https://download.openstreetmap.fr/extracts/europe/france/limousin/creuse.osm.pbf',
-            'https://download.openstreetmap.fr/extracts/europe/france/aquitaine/dordogne.osm.pbf',
-            'https://download.openstreetmap.fr/extracts/europe/france/aquitaine/gironde.osm.pbf',
-            'https://download.openstreetmap.fr/extracts/europe/france/aquitaine/landes.osm.pbf',
-            'https://download.openstreetmap.fr/extracts/europe/france/aquitaine/lot_et_garonne.osm.pbf',
-            'https://download.openstreetmap.fr/extracts/europe/france/aquitaine/pyrenees_atlantiques.osm.pbf',
-            'https://download.openstreetmap.fr/extracts/europe/france/poitou_charentes/deux_sevres.osm.pbf',
-            'https://download.openstreetmap.fr/extracts/europe/france/poitou_charentes/vienne.osm.pbf',
-            'https://download.openstreetmap.fr/extracts/europe/france/limousin/haute_vienne.osm.pbf'
-        }),
-        ('Occitanie', {
-            'https://download.openstreetmap.fr/extracts/europe/france/midi_pyrenees/ariege.osm.pbf',
-            'https://download.openstreetmap.fr/extracts/europe/france/languedoc_roussillon/aude.osm.pbf',
-            'https://download.openstreetmap.fr/extracts/europe/france/midi_pyrenees/aveyron.osm.pbf',
-            'https://download.openstreetmap.fr/extracts/europe/france/languedoc_roussillon/gard.osm.pbf',
-            'https://download.openstreetmap.fr/extracts/europe/france/midi_pyrenees/haute_garonne.osm.pbf',
-            'https://download.openstreetmap.fr/extracts/europe/france/midi_pyrenees/gers.osm.pbf',
-            'https://download.openstreetmap.fr/extracts/europe/france/languedoc_roussillon/herault.osm.pbf',
-            'https://download.openstreetmap.fr/extracts/europe/france/midi_pyrenees/lot.osm.pbf',
-            'https://download.openstreetmap.fr/extracts/europe/france/languedoc_roussillon/lozere.osm.pbf',
-            'https://download.openstreetmap.fr/extracts/europe/france/midi_pyrenees/hautes_pyrenees.osm.pbf',
-            'https://download.openstreetmap.fr/extracts/europe/france/languedoc_roussillon/pyrenees_orientales.osm.pbf',
-            'https://download.openstreetmap.fr/extracts/europe/france/midi_pyrenees/tarn.osm.pbf',
-            'https://download.openstreetmap.fr/extracts/europe/france/midi_pyrenees/tarn_et_garonne.osm.pbf'
-        }),
-        ('Pays de la Loire', {
-            'https://download.openstreetmap.fr/extracts/europe/france/pays_de_la_loire/loire_atlantique.osm.pbf',
-            'https://download.openstreetmap.fr/extracts/europe/france/pays_de_la_loire/maine_et_loire.osm.pbf',
-            'https://download.openstreetmap.fr/extracts/europe/france/pays_de_la_loire/mayenne.osm.pbf',
-            'https://download.openstreetmap.fr/extracts/europe/france/pays_de_la_loire/sarthe.osm.pbf',
-            'https://download.openstreetmap.fr/extracts/europe/france/pays_de_la_loire/vendee.osm.pbf'
-        }),
-        ('Provence-Alpes-Côte d\'Azur', {
-            'https://download.openstreetmap.fr/extracts/europe/france/provence_alpes_cote_d_azur/alpes_de_haute_provence.osm.pbf',
-            'https://download.openstreetmap.fr/extracts/europe/france/provence_alpes_cote_d_azur/alpes_maritimes.osm.pbf',
-            'https://download.openstreetmap.fr/extracts/europe/france/provence_alpes_cote_d_azur/bouches_du_rhone.osm.pbf',
-            'https://download.openstreetmap.fr/extracts/europe/france/provence_alpes_cote_d_azur/hautes_alpes.osm.pbf',
-            'https://download.openstreetmap.fr/extracts/europe/france/provence_alpes_cote_d_azur/var.osm.pbf',
-            'https://download.openstreetmap.fr/extracts/europe/france/provence_alpes_cote_d_azur/vaucluse.osm.pbf'
-        }),
-        ('DOM Atlantique : Martinique, Guadeloupe & Guyane', {
-            'https://download.openstreetmap.fr/extracts/central-america/guadeloupe.osm.pbf',
-            'https://download.openstreetmap.fr/extracts/central-america/martinique.osm.pbf',
-            'https://download.openstreetmap.fr/extracts/south-america/guyane.osm.pbf'
-        }),
-        ('DOM Océan Indien : Réunion & Mayotte', {
-            'https://download.openstreetmap.fr/extracts/africa/reunion.osm.pbf',
-            'https://download.openstreetmap.fr/extracts/africa/mayotte.osm.pbf'
-        }),
-        ('Autres territoires Atlantique', {
-            'https://download.openstreetmap.fr/extracts/central-america/saint_martin.osm.pbf',
-            'https://download.openstreetmap.fr/extracts/central-america/saint_barthelemy.osm.pbf',
-            'https://download.openstreetmap.fr/extracts/north-america/saint_pierre_et_miquelon.osm.pbf'
-        }),
-        ('Autres territoires Océan indien', {
-            'https://download.openstreetmap.fr/extracts/africa/france_taaf.osm.pbf'
-        }),
-        ('Autres territoires Océanie-Pacifique', {
-            'https://download.openstreetmap.fr/extracts/oceania/france_taaf.osm.pbf',
-            'https://download.openstreetmap.fr/extracts/oceania/new_caledonia.osm.pbf',
-            'https://download.openstreetmap.fr/extracts/oceania/wallis_et_futuna.osm.pbf'
-        })
-    ]
-
-    app = Application()
-    app.names = {}
-    for region in liste:
-        requests.get(
-            'http://localhost:8111/load_object',
-            params={
+    if args.resume and not args.checkpoint:
+        parser.error('--resume nécessite --checkpoint')
+    app = Application(
+        result_cache=args.result_cache, street_radius=args.street_radius, findings=args.findings,
+        log_findings=args.log_findings, checkpoint=None if args.changes else args.checkpoint,
+        checkpoint_interval=args.checkpoint_interval, area=args.area, metrics=args.metrics,
+        metrics_interval=args.metrics_interval, osm_api=args.osm_api, api_interval=args.api_interval,
+        josm_url=args.josm_url, josm_output=args.josm_output
+    )
+    if app.checkpoints:
+        if args.resume:
+            app.resume()
+        else:
+            app.checkpoints.clear()
+    if app.findings and app.findings.run is None:
+        app.findings.start(' '.join(args.changes) if args.changes else '')
+    extracts = ExtractCache(args.cache, args.downloads)
+    if args.changes:
+        app.parse_changes('Changes', args.changes)
+    else:
+        # Régions terminées avant l'interruption (--resume) exclues
+        regions = [region for region in load_regions(args.regions, args.extracts_url) if region.name not in app.done]
+        scheduler = Scheduler(extracts, regions, args.prefetch, args.checkpoint or None, app.resumable)
+        for job in scheduler:
+            print(f'Loading {job.region.name} : {len(job.region.urls)} Depts, {job.size / 1e6:,.0f} MB',
+                  f'({job.download:.0f} s) - Done.')
+            app.josm.load_object({
                 # 'objects': {'r/1403916'},   # France métropolitaine
                 'objects': {'r/2202162'},   # France
                 'new_layer': True,
-                'layer_name': region[0]
+                'layer_name': job.region.name
                 #            'addtags': {'name': 'France métropolitaine'}
-            }
-        )
-        print(f'Loading {region[0]}, loading Depts: ', end='')
-        with tempfile.NamedTemporaryFile(mode='wb', delete=False) as dest:
-            for departement in region[1]:
-                r = requests.get(departement)
-                r.raise_for_status()
-                dest.write(r.content)
-                print('.', sep='', end='')
-            print(' - Done.')
-            dest.close()
-
-            with esy.osm.pbf.File(dest.name) as osm_pbf:
-                app.parse(region[0], osm_pbf)
-
-            os.unlink(dest.name)
-
+            })
+            with esy.osm.pbf.File(job.path) as osm_pbf:
+                app.parse(job.region.name, osm_pbf, args.processes)
+            app.summary[-1].update(extracts=len(job.region.urls), size=job.size, download=round(job.download, 1))
+
+            os.unlink(job.path)
+        app.close_workers()
+        app.save_summary(args.summary)
+
+    app.josm.close()
+    print(f'JOSM : {app.josm}')
+    if app.findings:
+        app.findings.close()
+        print(f'Findings : {app.findings.count:,} (run {app.findings.run} in {app.findings.filename})')
+    app.metrics.tick(app.latencies(), force=True)
     app.save_names(f'names.csv')
+    if args.similar_names:
+        app.save_similar_names(args.similar_names)
+    app.names.close()
+    if app.checkpoints:
+        app.checkpoints.clear()
+        app.checkpoints.close()
@@ -0,0 +1,192 @@
+import array
+import datetime
+import json
+import os
+import threading
+import time
+
+
+class Latency:
+    """Durées d'appels (API OSM, JOSM) : nombre, cumul, maximum et histogramme cumulatif."""
+
+    BUCKETS = (0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+    """Bornes supérieures (s) des classes de l'histogramme, la dernière classe (+Inf) étant implicite."""
+
+    def __init__(self):
+        self.count, self.seconds, self.max = 0, 0.0, 0.0
+        self.buckets = [0] * len(self.BUCKETS)
+        self._lock = threading.Lock()
+
+    def __str__(self):
+        average = self.seconds / self.count if self.count else 0
+        return f'{self.count:,} calls / {average:.3f} s avg / {self.max:.3f} s max'
+
+    def observe(self, seconds: float) -> None:
+        with self._lock:
+            self.count += 1
+            self.seconds += seconds
+            self.max = max(self.max, seconds)
+            for i, bound in enumerate(self.BUCKETS):
+                if seconds <= bound:
+                    self.buckets[i] += 1
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            return {
+                'count': self.count, 'seconds': round(self.seconds, 6), 'max': round(self.max, 6),
+                'buckets': dict(zip(map(str, self.BUCKETS), self.buckets))
+            }
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        del state['_lock']
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._lock = threading.Lock()
+
+
+class Metrics:
+    """Mesures de l'analyse : appels et durée par vérification, recherches, succès et durée par règle, débit.
+
+    Si path est indiqué, un instantané est écrit toutes les interval secondes (tick) dans path.json et, au format
+    texte de Prometheus (collecteur textfile de node_exporter), dans path.prom. Sinon (timed faux), les vérifications
+    et les recherches ne sont ni comptées ni chronométrées : l'appelant les fait directement.
+    """
+
+    PREFIX = 'checkosm'
+
+    def __init__(self, patterns=(), path: str | None = None, interval: float = 60, timed: bool | None = None):
+        self.patterns = [pattern for pattern in patterns]
+        """Motif de chaque règle, dans l'ordre d'invalid_ways_name.csv."""
+        self.path = path
+        self.interval = interval
+        self.timed = path is not None if timed is None else timed
+        """Vérifications et recherches à mesurer (check, search), par défaut si path est indiqué."""
+        self.checks: dict = {}
+        """Par vérification : [appels, durée cumulée (s)]."""
+        self.rule_searches = array.array('q', bytes(8 * len(self.patterns)))
+        self.rule_hits = array.array('q', bytes(8 * len(self.patterns)))
+        self.rule_seconds = array.array('d', bytes(8 * len(self.patterns)))
+        self.blocks, self.elements = 0, 0
+        self.start = time.monotonic()
+        self._written = self.start
+
+    def check(self, name: str, seconds: float) -> None:
+        stats = self.checks.get(name)
+        if stats is None:
+            stats = self.checks[name] = [0, 0.0]
+        stats[0] += 1
+        stats[1] += seconds
+
+    def search(self, i: int, regex, value: str):
+        """regex.search(value) pour la règle n° i, comptée et chronométrée."""
+        start = time.perf_counter()
+        match = regex.search(value)
+        self.rule_seconds[i] += time.perf_counter() - start
+        self.rule_searches[i] += 1
+        if match:
+            self.rule_hits[i] += 1
+        return match
+
+    def update(self, other: 'Metrics') -> None:
+        """Ajoute les mesures de other (résultat partiel d'un processus de travail)."""
+        for name, (calls, seconds) in other.checks.items():
+            stats = self.checks.setdefault(name, [0, 0.0])
+            stats[0] += calls
+            stats[1] += seconds
+        for i in range(len(other.patterns)):
+            self.rule_searches[i] += other.rule_searches[i]
+            self.rule_hits[i] += other.rule_hits[i]
+            self.rule_seconds[i] += other.rule_seconds[i]
+        self.blocks += other.blocks
+        self.elements += other.elements
+
+    def snapshot(self, latencies: dict | None = None) -> dict:
+        """Instantané des mesures, latencies : {nom du service: Latency}."""
+        elapsed = time.monotonic() - self.start
+        return {
+            'time': datetime.datetime.now().isoformat(timespec='seconds'),
+            'elapsed': round(elapsed, 3),
+            'blocks': self.blocks,
+            'elements': self.elements,
+            'blocks_per_s': round(self.blocks / elapsed, 3) if elapsed else None,
+            'elements_per_s': round(self.elements / elapsed, 3) if elapsed else None,
+            'checks': {
+                name: {'calls': calls, 'seconds': round(seconds, 6)} for name, (calls, seconds) in self.checks.items()
+            },
+            'rules': [
+                {
+                    'rule': i, 'pattern': pattern, 'searches': self.rule_searches[i], 'hits': self.rule_hits[i],
+                    'seconds': round(self.rule_seconds[i], 6)
+                }
+                for i, pattern in enumerate(self.patterns)
+            ],
+            'latencies': {name: latency.snapshot() for name, latency in (latencies or {}).items()}
+        }
+
+    @staticmethod
+    def _label(value) -> str:
+        return str(value).replace('\\', r'\\').replace('"', r'\"').replace('\n', r'\n')
+
+    def prometheus(self, snapshot: dict) -> str:
+        """Instantané au format texte d'exposition de Prometheus."""
+        p = self.PREFIX
+        lines = []
+
+        def metric(name: str, type_: str, help_: str, samples) -> None:
+            lines.append(f'# HELP {p}_{name} {help_}')
+            lines.append(f'# TYPE {p}_{name} {type_}')
+            for labels, value in samples:
+                labels = ','.join(f'{k}="{self._label(v)}"' for k, v in labels.items())
+                lines.append(f'{p}_{name}{{{labels}}} {value}' if labels else f'{p}_{name} {value}')
+
+        metric('blocks_total', 'counter', 'Blocs analysés.', [({}, snapshot['blocks'])])
+        metric('elements_total', 'counter', 'Éléments analysés.', [({}, snapshot['elements'])])
+        metric('blocks_per_second', 'gauge', 'Débit moyen (blocs).', [({}, snapshot['blocks_per_s'] or 0)])
+        metric('elements_per_second', 'gauge', 'Débit moyen (éléments).', [({}, snapshot['elements_per_s'] or 0)])
+        checks = snapshot['checks'].items()
+        metric('check_calls_total', 'counter', 'Appels par vérification.',
+               [({'check': name}, stats['calls']) for name, stats in checks])
+        metric('check_seconds_total', 'counter', 'Durée cumulée par vérification.',
+               [({'check': name}, stats['seconds']) for name, stats in checks])
+        rules = snapshot['rules']
+        metric('rule_searches_total', 'counter', "Recherches par règle d'invalid_ways_name.csv.",
+               [({'rule': r['rule'], 'pattern': r['pattern']}, r['searches']) for r in rules])
+        metric('rule_hits_total', 'counter', "Libellés reconnus par règle d'invalid_ways_name.csv.",
+               [({'rule': r['rule'], 'pattern': r['pattern']}, r['hits']) for r in rules])
+        metric('rule_seconds_total', 'counter', "Durée cumulée des recherches par règle d'invalid_ways_name.csv.",
+               [({'rule': r['rule'], 'pattern': r['pattern']}, r['seconds']) for r in rules])
+        samples = []
+        for service, latency in snapshot['latencies'].items():
+            for bound, count in latency['buckets'].items():
+                samples.append(({'service': service, 'le': bound}, count))
+            samples.append(({'service': service, 'le': '+Inf'}, latency['count']))
+        lines.append(f'# HELP {p}_request_duration_seconds Durée des appels aux services externes.')
+        lines.append(f'# TYPE {p}_request_duration_seconds histogram')
+        for labels, value in samples:
+            labels = ','.join(f'{k}="{self._label(v)}"' for k, v in labels.items())
+            lines.append(f'{p}_request_duration_seconds_bucket{{{labels}}} {value}')
+        for service, latency in snapshot['latencies'].items():
+            lines.append(f'{p}_request_duration_seconds_sum{{service="{service}"}} {latency["seconds"]}')
+            lines.append(f'{p}_request_duration_seconds_count{{service="{service}"}} {latency["count"]}')
+        return '\n'.join(lines) + '\n'
+
+    def tick(self, latencies: dict | None = None, force: bool = False) -> None:
+        """Écrit un instantané si path est indiqué et que interval secondes se sont écoulées (ou si force)."""
+        if self.path is None:
+            return
+        now = time.monotonic()
+        if not force and now - self._written < self.interval:
+            return
+        self._written = now
+        snapshot = self.snapshot(latencies)
+        for filename, content in (
+                (f'{self.path}.json', json.dumps(snapshot, indent=1, ensure_ascii=False)),
+                (f'{self.path}.prom', self.prometheus(snapshot))
+        ):
+            tmp = f'{filename}.{os.getpid()}.tmp'
+            with open(tmp, 'w', encoding='utf8') as f:
+                f.write(content)
+            os.replace(tmp, filename)  # Jamais de fichier partiel pour les lecteurs
@@ -0,0 +1,153 @@
+import array
+import csv
+import heapq
+import itertools
+import operator
+import os
+import tempfile
+
+
+class NameIndex:
+    """Collecte compacte des libellés (tag name) et des éléments qui les portent.
+
+    Chaque libellé n'est conservé qu'une fois, les références aux éléments sont codées (id << 2 | type) dans des
+    tableaux d'entiers 64 bits. Au-delà de memory_limit octets (estimés), le contenu est trié et déversé dans un
+    fichier temporaire, les séries étant fusionnées à la lecture (items).
+    Si directory est indiqué, les séries y sont des fichiers nommés (files), repris par reopen après une interruption.
+    """
+
+    TYPES = ('node', 'way', 'relation')
+    CODES = {type_: code for code, type_ in enumerate(TYPES)}
+    REF_SIZE = 16
+    """Octets par référence (n° de libellé + élément codé)."""
+    NAME_OVERHEAD = 120
+    """Octets estimés par libellé, en plus de sa longueur (objet str, entrée de dictionnaire)."""
+
+    def __init__(self, memory_limit: int | None = 512 << 20, directory: str | None = None):
+        self.memory_limit = memory_limit
+        self.directory = directory
+        self._ids: dict = {}  # libellé -> n°
+        self._names: list = []  # n° -> libellé
+        self._slots = array.array('q')
+        self._refs = array.array('q')
+        self._size = 0
+        self._runs: list = []
+        self.spilled = 0
+        """Nombre de libellés déversés sur disque (un même libellé peut figurer dans plusieurs séries)."""
+
+    def __len__(self):
+        return len(self._ids) + self.spilled
+
+    def add(self, name: str, type_: str, id_: int) -> None:
+        slot = self._ids.get(name)
+        if slot is None:
+            slot = self._ids[name] = len(self._names)
+            self._names.append(name)
+            self._size += len(name) + self.NAME_OVERHEAD
+        self._slots.append(slot)
+        self._refs.append(int(id_) << 2 | self.CODES[type_])
+        self._size += self.REF_SIZE
+        if self.memory_limit and self._size > self.memory_limit:
+            self._spill()
+
+    def update(self, other: 'NameIndex') -> None:
+        """Ajoute le contenu de other (résultat partiel d'un processus de travail)."""
+        for name, refs in other.raw_items():
+            for ref in refs:
+                self.add(name, self.TYPES[ref & 3], ref >> 2)
+
+    def load(self, filename: str, skip=frozenset()) -> None:
+        """Relit un fichier names.csv (save_names), sauf les éléments de skip ((type, id))."""
+        with open(filename, encoding='UTF8', newline='') as f:
+            for row in csv.reader(f):
+                for ref in row[1:]:
+                    type_, id_ = ref.split('/')
+                    if (type_, int(id_)) not in skip:
+                        self.add(row[0], type_, int(id_))
+
+    def _sorted(self):
+        """Contenu en mémoire trié par libellé : (libellé, références dans l'ordre d'ajout).
+
+        Tri par dénombrement des références, sans autre objet Python par référence qu'un tableau de même taille.
+        """
+        counts = [0] * len(self._names)
+        for slot in self._slots:
+            counts[slot] += 1
+        by_name = sorted(range(len(self._names)), key=self._names.__getitem__)
+        starts = [0] * len(self._names)
+        pos = 0
+        for slot in by_name:
+            starts[slot] = pos
+            pos += counts[slot]
+        ordered = array.array('q', bytes(8 * len(self._refs)))
+        fill = starts.copy()
+        for slot, ref in zip(self._slots, self._refs):
+            ordered[fill[slot]] = ref
+            fill[slot] += 1
+        for slot in by_name:
+            yield self._names[slot], ordered[starts[slot]:starts[slot] + counts[slot]].tolist()
+
+    def _spill(self) -> None:
+        if self.directory is None:
+            run = tempfile.TemporaryFile(mode='w+', encoding='UTF8', newline='')
+        else:
+            run = tempfile.NamedTemporaryFile(
+                mode='w+', encoding='UTF8', newline='', dir=self.directory, prefix='names-', suffix='.csv',
+                delete=False
+            )
+        writer = csv.writer(run)
+        for name, refs in self._sorted():
+            writer.writerow([name, *refs])
+        run.flush()
+        self.spilled += len(self._ids)
+        self._runs.append(run)
+        self._ids, self._names = {}, []
+        self._slots, self._refs = array.array('q'), array.array('q')
+        self._size = 0
+
+    def spill(self) -> None:
+        """Déverse le contenu en mémoire (point de reprise) : files décrit alors toute la collecte."""
+        if self._refs:
+            self._spill()
+
+    @property
+    def files(self) -> list:
+        """Séries déversées dans directory."""
+        return [run.name for run in self._runs]
+
+    def reopen(self, files) -> None:
+        """Reprend des séries déversées (files) par une exécution interrompue."""
+        for filename in files:
+            run = open(filename, 'r+', encoding='UTF8', newline='')
+            self.spilled += sum(1 for _ in csv.reader(run))
+            self._runs.append(run)
+
+    @staticmethod
+    def _read(run):
+        run.seek(0)
+        for row in csv.reader(run):
+            yield row[0], [int(ref) for ref in row[1:]]
+
+    def raw_items(self):
+        """Fusion des séries (disque et mémoire) : (libellé, références codées sans doublon), triés par libellé."""
+        runs = [self._read(run) for run in self._runs] + [self._sorted()]
+        for name, group in itertools.groupby(heapq.merge(*runs, key=operator.itemgetter(0)), operator.itemgetter(0)):
+            yield name, list(dict.fromkeys(itertools.chain.from_iterable(refs for _, refs in group)))
+
+    def items(self):
+        """(libellé, ['type/id', ...]) triés par libellé."""
+        for name, refs in self.raw_items():
+            yield name, [f'{self.TYPES[ref & 3]}/{ref >> 2}' for ref in refs]
+
+    def close(self) -> None:
+        """Supprime les fichiers temporaires."""
+        for run in self._runs:
+            run.close()
+            if self.directory is not None:
+                os.unlink(run.name)
+        self._runs = []
+
+    def __getstate__(self):
+        if self._runs:
+            raise TypeError('NameIndex déversé sur disque, non transmissible')
+        return self.__dict__
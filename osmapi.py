@@ -0,0 +1,86 @@
+import logging
+import time
+import xml.etree.ElementTree
+
+import requests
+import requests.adapters
+
+from metrics import Latency
+
+
+class OsmApi:
+    """Lecture groupée des éléments via l'API OSM (multi fetch /nodes?nodes=…, /ways?ways=…, /relations?relations=…).
+
+    Une session HTTP persistante est réutilisée, les requêtes sont espacées d'au moins min_interval secondes et
+    les réponses 429/509 (limite de débit) et 5xx (serveur indisponible) sont réessayées après le délai Retry-After.
+    """
+
+    RETRY = frozenset((429, 500, 502, 503, 504, 509))
+    """Réponses réessayées, après Retry-After ou un délai doublé à chaque essai."""
+
+    def __init__(self, url: str = 'https://api.openstreetmap.org/api/0.6', batch_size: int = 100,
+                 min_interval: float = 0.2, retries: int = 5, session: requests.Session | None = None):
+        self.url = url.rstrip('/')
+        self.batch_size = batch_size
+        self.min_interval = min_interval
+        self.retries = retries
+        if session is None:
+            session = requests.Session()
+            adapter = requests.adapters.HTTPAdapter(pool_connections=1, pool_maxsize=1)
+            session.mount('http://', adapter)
+            session.mount('https://', adapter)
+        self.session = session
+        self.requests = 0
+        self.latency = Latency()
+        self._last = 0.0
+
+    def _get(self, url: str, params: dict | None = None) -> requests.Response:
+        for attempt in range(self.retries + 1):
+            wait = self._last + self.min_interval - time.monotonic()
+            if wait > 0:
+                time.sleep(wait)
+            started = time.monotonic()
+            req = self.session.get(url, params=params)
+            self._last = time.monotonic()
+            self.latency.observe(self._last - started)
+            self.requests += 1
+            if req.status_code not in self.RETRY or attempt == self.retries:
+                return req
+            delay = float(req.headers.get('Retry-After', 2 ** attempt))
+            logging.info(f'API OSM : réponse {req.status_code}, nouvel essai dans {delay} s')
+            time.sleep(delay)
+        return req
+
+    def fetch(self, type_: str, ids) -> dict:
+        """Éléments XML de type type_ ('node', 'way' ou 'relation') par id (str), None pour un élément supprimé.
+
+        Une erreur HTTP autre que 410 Gone est levée (requests.exceptions.HTTPError).
+        """
+        ids = list(dict.fromkeys(str(i) for i in ids))
+        elements = {}
+        for i in range(0, len(ids), self.batch_size):
+            batch = ids[i:i + self.batch_size]
+            req = self._get(f'{self.url}/{type_}s', params={f'{type_}s': ','.join(batch)})
+            if req.status_code == 404 and len(batch) > 1:
+                # Un des éléments n'a jamais existé : lecture un par un pour isoler l'erreur
+                for id_ in batch:
+                    elements.update(self._fetch_one(type_, id_))
+                continue
+            req.raise_for_status()
+            for element in xml.etree.ElementTree.fromstring(req.content):
+                if element.tag == type_:
+                    # Le multi fetch retourne les éléments supprimés avec visible="false"
+                    gone = element.attrib.get('visible') == 'false'
+                    elements[element.attrib['id']] = None if gone else element
+        return elements
+
+    def _fetch_one(self, type_: str, id_: str) -> dict:
+        req = self._get(f'{self.url}/{type_}/{id_}')
+        try:
+            req.raise_for_status()
+        except requests.exceptions.HTTPError:
+            if req.status_code == 410:  # Element Gone !
+                return {id_: None}
+            raise
+        root = xml.etree.ElementTree.fromstring(req.content)
+        return {id_: root[0]}
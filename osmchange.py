@@ -0,0 +1,53 @@
+import gzip
+import xml.etree.ElementTree
+
+import esy.osm.pbf
+
+ACTIONS = ('create', 'modify', 'delete')
+
+
+def _entry(element):
+    """Construit un Node, Way ou Relation (ids entiers) à partir d'un élément XML osmChange."""
+    id_ = int(element.attrib['id'])
+    tags = {i.attrib['k']: i.attrib['v'] for i in element.iter('tag')}
+    match element.tag:
+        case 'node':
+            lonlat = (float(element.attrib['lon']), float(element.attrib['lat'])) if 'lat' in element.attrib else None
+            return esy.osm.pbf.Node(id=id_, tags=tags, lonlat=lonlat)
+        case 'way':
+            return esy.osm.pbf.Way(id=id_, tags=tags, refs=tuple(int(nd.attrib['ref']) for nd in element.iter('nd')))
+        case 'relation':
+            return esy.osm.pbf.Relation(id=id_, tags=tags, members=[
+                (int(m.attrib['ref']), m.attrib['type'].upper(), m.attrib.get('role', ''))
+                for m in element.iter('member')
+            ])
+
+
+def read_changes(filename: str):
+    """Lit un fichier osmChange (.osc ou .osc.gz) au fil de l'eau : produit (action, Node | Way | Relation, version)."""
+    with (gzip.open if filename.endswith('.gz') else open)(filename, 'rb') as f:
+        action = None
+        for event, element in xml.etree.ElementTree.iterparse(f, events=('start', 'end')):
+            if event == 'start':
+                if element.tag in ACTIONS:
+                    action = element.tag
+            elif element.tag in ('node', 'way', 'relation') and action is not None:
+                yield action, _entry(element), int(element.attrib.get('version', 0))
+                element.clear()
+            elif element.tag in ACTIONS:
+                action = None
+
+
+def last_changes(filenames) -> dict:
+    """Dernière modification de chaque élément sur une suite de fichiers osmChange (dans l'ordre de publication).
+
+    Retourne {(type, id): (action, élément, version)}.
+    """
+    changes = {}
+    for filename in filenames:
+        for action, entry, version in read_changes(filename):
+            key = (type(entry).__name__.lower(), entry.id)
+            if action == 'modify' and changes.get(key, ('',))[0] == 'create':
+                action = 'create'  # Créé puis modifié dans la même suite
+            changes[key] = (action, entry, version)
+    return changes
@@ -0,0 +1,474 @@
+import argparse
+import bisect
+import collections
+import csv
+import datetime
+import functools
+import http.server
+import itertools
+import json
+import os
+import random
+import shutil
+import subprocess
+import sys
+import threading
+import time
+import urllib.parse
+import zlib
+from xml.sax.saxutils import quoteattr
+
+import esy.osm.pbf
+from esy.osm.pbf import osmformat_pb2
+
+from findings import FindingStore
+from scheduler import load_regions
+
+Fault = collections.namedtuple('Fault', 'latency errors')
+"""Comportement d'un service simulé : délai ajouté à chaque réponse (s), taux d'erreur par code HTTP ({429: 0.05})."""
+
+
+def parse_errors(spec: str) -> dict:
+    """Taux d'erreur « CODE=TAUX,CODE=TAUX » : {code: taux}."""
+    errors = {}
+    for item in filter(None, spec.split(',')):
+        code, _, rate = item.partition('=')
+        errors[int(code)] = float(rate)
+    return errors
+
+
+class ElementIndex:
+    """Éléments des extraits servis par l'API simulée, relus à la demande.
+
+    Seuls le premier et le dernier id de chaque type sont indexés par bloc (les blocs d'un extrait sont triés par
+    type et id) ; les blocs relus sont conservés dans un cache LRU de cache_size blocs.
+    """
+
+    TYPES = ('node', 'way', 'relation')
+
+    def __init__(self, paths, cache_size: int = 64):
+        self._files = {path: open(path, 'rb') for path in paths}
+        self._blocks = {type_: [] for type_ in self.TYPES}
+        """Par type : un index par extrait, [(premier id, dernier id, position du bloc, taille)] triés."""
+        for path, file in self._files.items():
+            ranges = {type_: [] for type_ in self.TYPES}
+            for block in esy.osm.pbf.File(file).blocks:
+                if block.header.type != 'OSMData':
+                    continue
+                primitive_block = osmformat_pb2.PrimitiveBlock()
+                primitive_block.ParseFromString(esy.osm.pbf.read_blob(file, block.ofs, block.header.datasize))
+                ids = {type_: [] for type_ in self.TYPES}
+                for group in primitive_block.primitivegroup:
+                    ids['node'].extend(itertools.accumulate(group.dense.id))
+                    ids['node'].extend(node.id for node in group.nodes)
+                    ids['way'].extend(way.id for way in group.ways)
+                    ids['relation'].extend(relation.id for relation in group.relations)
+                for type_, values in ids.items():
+                    if values:
+                        ranges[type_].append((min(values), max(values), block.ofs, block.header.datasize))
+            for type_ in self.TYPES:
+                self._blocks[type_].append((path, sorted(ranges[type_])))
+        self._lock = threading.Lock()
+        self._decode = functools.lru_cache(cache_size)(self._decode)
+
+    def _decode(self, path: str, ofs: int, size: int) -> dict:
+        primitive_block = osmformat_pb2.PrimitiveBlock()
+        primitive_block.ParseFromString(esy.osm.pbf.read_blob(self._files[path], ofs, size))
+        return {
+            (entry.__class__.__name__.lower(), entry.id): entry
+            for entry in esy.osm.pbf.file.iter_primitive_block(primitive_block)
+        }
+
+    def get(self, type_: str, id_: int):
+        """Élément (Node, Way, Relation) des extraits, None s'il en est absent."""
+        with self._lock:
+            for path, ranges in self._blocks[type_]:
+                i = bisect.bisect_right(ranges, (id_, float('inf'))) - 1
+                if i >= 0 and ranges[i][1] >= id_:
+                    entry = self._decode(path, *ranges[i][2:]).get((type_, id_))
+                    if entry is not None:
+                        return entry
+        return None
+
+    def close(self) -> None:
+        for file in self._files.values():
+            file.close()
+
+
+def element_xml(type_: str, entry) -> str:
+    """Élément au format XML de l'API OSM 0.6."""
+    attributes = f'id="{entry.id}" visible="true" version="1"'
+    children = [f'<tag k={quoteattr(k)} v={quoteattr(v)}/>' for k, v in entry.tags.items()]
+    match type_:
+        case 'node':
+            attributes += f' lat="{entry.lonlat[1]:.7f}" lon="{entry.lonlat[0]:.7f}"'
+        case 'way':
+            children = [f'<nd ref="{ref}"/>' for ref in entry.refs] + children
+        case 'relation':
+            children = [
+                f'<member type="{member_type.lower()}" ref="{ref}" role={quoteattr(role)}/>'
+                for ref, member_type, role in entry.members
+            ] + children
+    return f'<{type_} {attributes}>{"".join(children)}</{type_}>'
+
+
+class StandInHandler(http.server.BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'  # Connexions persistantes, comme les services remplacés
+    disable_nagle_algorithm = True  # En-têtes et corps écrits séparément : sans cela, ~40 ms d'ACK retardé par réponse
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_HEAD(self):
+        self._dispatch(head=True)
+
+    def do_GET(self):
+        self._dispatch(head=False)
+
+    def _dispatch(self, head: bool) -> None:
+        parts = urllib.parse.urlsplit(self.path)
+        service, _, path = parts.path.lstrip('/').partition('/')
+        if service not in StandIn.SERVICES:
+            self.send_error(404)
+            return
+        status = self.server.fault(service)
+        if status:
+            self._reply(service, status, headers={'Retry-After': '0'} if status in (429, 503) else {}, head=head)
+            return
+        params = {key: values[-1] for key, values in urllib.parse.parse_qs(parts.query).items()}
+        match service:
+            case 'josm':
+                self._josm(path, params, head)
+            case 'api':
+                self._api(path.split('/'), params, head)
+            case 'extracts':
+                self._extract(urllib.parse.unquote(path), head)
+
+    def _reply(self, service: str, status: int, body: bytes = b'', headers: dict | None = None,
+               head: bool = False) -> None:
+        self.server.count(service, status, 0 if head else len(body))
+        self.send_response(status)
+        for key, value in (headers or {}).items():
+            self.send_header(key, value)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        if not head:
+            self.wfile.write(body)
+
+    def _josm(self, path: str, params: dict, head: bool) -> None:
+        if path != 'load_object':
+            self._reply('josm', 404, head=head)
+            return
+        self.server.record(params)
+        self._reply('josm', 200, b'OK\r\n', {'Content-Type': 'text/plain'}, head)
+
+    def _api(self, path: list, params: dict, head: bool) -> None:
+        headers = {'Content-Type': 'text/xml; charset=utf-8'}
+        match path:
+            case ['0.6', ('nodes' | 'ways' | 'relations') as types] if types in params:
+                type_ = types[:-1]
+                elements = []
+                for id_ in params[types].split(','):
+                    if self.server.gone(type_, int(id_)):
+                        elements.append(f'<{type_} id="{id_}" visible="false"/>')
+                    elif (entry := self.server.elements.get(type_, int(id_))) is not None:
+                        elements.append(element_xml(type_, entry))
+                    else:
+                        self._reply('api', 404, head=head)  # Comme l'API : un seul élément inconnu fait échouer
+                        return
+            case ['0.6', ('node' | 'way' | 'relation') as type_, id_] if id_.isdigit():
+                if self.server.gone(type_, int(id_)):
+                    self._reply('api', 410, head=head)
+                    return
+                entry = self.server.elements.get(type_, int(id_))
+                if entry is None:
+                    self._reply('api', 404, head=head)
+                    return
+                elements = [element_xml(type_, entry)]
+            case _:
+                self._reply('api', 404, head=head)
+                return
+        body = f'<?xml version="1.0" encoding="UTF-8"?>\n<osm version="0.6">{"".join(elements)}</osm>'
+        self._reply('api', 200, body.encode(), headers, head)
+
+    def _extract(self, path: str, head: bool) -> None:
+        root = os.path.realpath(self.server.directory)
+        filename = os.path.realpath(os.path.join(root, *path.split('/')))
+        if os.path.commonpath((root, filename)) != root or not os.path.isfile(filename):
+            self._reply('extracts', 404, head=head)
+            return
+        stat = os.stat(filename)
+        etag = f'"{stat.st_mtime_ns:x}-{stat.st_size:x}"'
+        if self.headers.get('If-None-Match') == etag:
+            self._reply('extracts', 304, headers={'ETag': etag}, head=head)
+            return
+        self.server.count('extracts', 200, 0 if head else stat.st_size)
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/octet-stream')
+        self.send_header('Content-Length', str(stat.st_size))
+        self.send_header('ETag', etag)
+        self.end_headers()
+        if not head:
+            with open(filename, 'rb') as f:
+                shutil.copyfileobj(f, self.wfile)
+
+
+class StandIn(http.server.ThreadingHTTPServer):
+    """Serveur local remplaçant JOSM, l'API OSM et le serveur des extraits, pour mesurer une analyse complète sans
+    réseau :
+
+    - /josm/load_object : appels acceptés et enregistrés (une ligne JSON par appel dans record) ;
+    - /api/0.6/... : lecture groupée (/nodes?nodes=…) ou d'un élément (/node/123), éléments lus dans les extraits
+      de elements ;
+    - /extracts/... : fichiers de directory, chemins identiques à ceux des URL de regions.csv (ETag, HEAD).
+
+    Chaque service répond après faults[service].latency secondes et échoue au hasard (429, 5xx...) selon
+    faults[service].errors. Pour l'API, le taux du code 410 est celui des éléments supprimés : toujours les mêmes
+    pour une même graine, lus visible="false" en lecture groupée et 410 Gone en lecture d'un élément.
+    """
+
+    SERVICES = ('josm', 'api', 'extracts')
+    daemon_threads = True
+
+    def __init__(self, directory: str, elements=(), faults: dict | None = None, record: str | None = None,
+                 address: tuple = ('127.0.0.1', 0), seed: int = 0):
+        super().__init__(address, StandInHandler)
+        self.directory = directory
+        self.elements = ElementIndex(elements)
+        self.faults = {service: (faults or {}).get(service, Fault(0.0, {})) for service in self.SERVICES}
+        self.seed = seed
+        self.requests = collections.Counter()
+        """Réponses par (service, code HTTP)."""
+        self.bytes = collections.Counter()
+        """Octets envoyés par service."""
+        self.injected = collections.Counter()
+        """Délai simulé (faults[service].latency) cumulé par service (s), distinct du coût du transport."""
+        self.calls, self.objects = 0, 0
+        """Appels load_object reçus et objets demandés."""
+        self._record = open(record, 'w', encoding='utf8') if record else None
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self._thread = None
+
+    @property
+    def url(self) -> str:
+        host, port = self.server_address[:2]
+        return f'http://{host}:{port}'
+
+    def start(self) -> 'StandIn':
+        self._thread = threading.Thread(target=self.serve_forever, name='stand-in', daemon=True)
+        self._thread.start()
+        return self
+
+    def close(self) -> None:
+        if self._thread is not None:
+            self.shutdown()
+            self._thread.join()
+        self.server_close()
+        self.elements.close()
+        if self._record:
+            self._record.close()
+
+    def fault(self, service: str) -> int | None:
+        """Attend le délai du service puis tire au hasard l'erreur à simuler (None : réponse normale)."""
+        latency, errors = self.faults[service]
+        if latency:
+            time.sleep(latency)
+        with self._lock:
+            self.injected[service] += latency
+            draw = self._random.random()
+        for status, rate in errors.items():
+            if status == 410 and service == 'api':
+                continue  # Éléments supprimés (gone)
+            if draw < rate:
+                return status
+            draw -= rate
+        return None
+
+    def gone(self, type_: str, id_: int) -> bool:
+        rate = self.faults['api'].errors.get(410, 0.0)
+        return rate > 0 and zlib.crc32(f'{self.seed}/{type_}/{id_}'.encode()) < rate * 2 ** 32
+
+    def count(self, service: str, status: int, size: int) -> None:
+        with self._lock:
+            self.requests[service, status] += 1
+            self.bytes[service] += size
+
+    def record(self, params: dict) -> None:
+        with self._lock:
+            self.calls += 1
+            self.objects += len(params.get('objects', '').split(','))
+            if self._record:
+                self._record.write(json.dumps(params, ensure_ascii=False) + '\n')
+
+    def stats(self) -> dict:
+        """Requêtes par service et code HTTP, octets envoyés, délai simulé cumulé, appels load_object."""
+        with self._lock:
+            return {
+                'requests': {
+                    service: {
+                        str(status): n for (name, status), n in sorted(self.requests.items()) if name == service
+                    }
+                    for service in self.SERVICES
+                },
+                'bytes': dict(self.bytes),
+                'injected_seconds': {service: round(seconds, 3) for service, seconds in self.injected.items()},
+                'load_object': {'calls': self.calls, 'objects': self.objects},
+            }
+
+
+def extract_path(directory: str, url: str) -> str:
+    """Fichier de directory servi pour l'extrait url (même chemin que l'URL)."""
+    return os.path.join(directory, *urllib.parse.urlsplit(url).path.lstrip('/').split('/'))
+
+
+def faults(args) -> dict:
+    """Comportement de chaque service simulé, d'après les options --SERVICE-latency et --SERVICE-errors."""
+    return {
+        service: Fault(getattr(args, f'{service}_latency'), getattr(args, f'{service}_errors'))
+        for service in StandIn.SERVICES
+    }
+
+
+def replay(args, extra: list) -> dict:
+    """Analyse les régions choisies avec main.py contre le serveur local : durée, requêtes, constats."""
+    output = os.path.abspath(args.output)
+    regions = [region for region in load_regions(args.regions) if not args.region or region.name in args.region]
+    if not regions:
+        raise SystemExit(f'Aucune région de {args.regions} à analyser.')
+    paths = [extract_path(args.extracts, url) for region in regions for url in region.urls]
+    missing = [path for path in paths if not os.path.isfile(path)]
+    if missing:
+        raise SystemExit(f'Extraits absents : {", ".join(missing)}')
+
+    # Démarrage à froid : extraits à télécharger, aucun résultat ni point de reprise d'une exécution précédente
+    os.makedirs(output, exist_ok=True)
+    for name in ('cache', 'checkpoint'):
+        shutil.rmtree(os.path.join(output, name), ignore_errors=True)
+    for name in ('results.sqlite', 'results.sqlite-wal', 'results.sqlite-shm'):
+        if os.path.exists(os.path.join(output, name)):
+            os.unlink(os.path.join(output, name))
+    regions_file = os.path.join(output, 'regions.csv')
+    with open(regions_file, 'w', newline='', encoding='utf8') as f:
+        writer = csv.writer(f)
+        writer.writerow(['Region', 'Extract'])
+        writer.writerows((region.name, url) for region in regions for url in region.urls)
+
+    print(f'Indexing {len(paths)} extracts...', end=' ', flush=True)
+    server = StandIn(
+        args.extracts, paths, faults(args), os.path.join(output, 'josm.jsonl'), ('127.0.0.1', args.port), args.seed
+    ).start()
+    print(f'serving on {server.url}.')
+    findings = os.path.join(output, 'findings.sqlite')
+    command = [
+        sys.executable, 'main.py', '--regions', regions_file, '--extracts-url', f'{server.url}/extracts',
+        '--josm-url', f'{server.url}/josm', '--osm-api', f'{server.url}/api/0.6',
+        '--api-interval', str(args.api_interval), '--processes', str(args.processes),
+        '--cache', os.path.join(output, 'cache'), '--checkpoint', os.path.join(output, 'checkpoint'),
+        '--result-cache', os.path.join(output, 'results.sqlite'), '--findings', findings,
+        '--summary', os.path.join(output, 'summary.csv'), *extra
+    ]
+    started = time.monotonic()
+    try:
+        returncode = subprocess.run(command, cwd=os.path.dirname(os.path.abspath(__file__))).returncode
+    finally:
+        wall = time.monotonic() - started
+        server.close()
+
+    report = {
+        'started': datetime.datetime.now().isoformat(timespec='seconds'),
+        'regions': [region.name for region in regions],
+        'command': command,
+        'returncode': returncode,
+        'wall_seconds': round(wall, 3),
+        **server.stats(),
+    }
+    store = FindingStore(findings)
+    runs = store.runs()
+    if runs:
+        run = runs[-1][0]
+        report['findings'] = {
+            'run': run,
+            'total': runs[-1][3],
+            'checks': dict(collections.Counter(finding.check for finding in store.query(run))),
+        }
+        if len(runs) > 1:
+            # Validation d'une optimisation : mêmes constats que la précédente exécution ?
+            diff = collections.Counter(sign for sign, _ in store.diff(runs[-2][0], run))
+            report['findings'].update(previous=runs[-2][0], added=diff['+'], removed=diff['-'])
+    store.close()
+    summary = os.path.join(output, 'summary.csv')
+    if os.path.exists(summary):
+        with open(summary, newline='', encoding='utf8') as f:
+            report['summary'] = list(csv.DictReader(f))
+    with open(os.path.join(output, 'report.json'), 'w', encoding='utf8') as f:
+        json.dump(report, f, indent=2, ensure_ascii=False)
+    return report
+
+
+if __name__ == '__main__':
+    common = argparse.ArgumentParser(add_help=False)
+    common.add_argument('--extracts', default='fixtures', metavar='REPERTOIRE',
+                        help='Extraits servis, aux chemins de leurs URL (fixtures/extracts/europe/france/...)')
+    common.add_argument('--seed', type=int, default=0, help='Graine des erreurs simulées')
+    for service, name in (('josm', 'de JOSM'), ('api', "de l'API OSM"), ('extracts', 'du serveur des extraits')):
+        common.add_argument(f'--{service}-latency', type=float, default=0.0, metavar='SECONDES',
+                            help=f'Délai de chaque réponse {name}')
+        common.add_argument(f'--{service}-errors', type=parse_errors, default={}, metavar='CODE=TAUX,...',
+                            help=f"Taux d'erreur par code HTTP {name} (410=0.01,429=0.05,503=0.01)")
+
+    parser = argparse.ArgumentParser(
+        description="Analyse hors ligne : JOSM, l'API OSM et le serveur des extraits remplacés par un serveur local."
+    )
+    commands = parser.add_subparsers(dest='command', required=True)
+    serve = commands.add_parser('serve', parents=[common], help="Démarre le serveur local jusqu'à Ctrl-C")
+    serve.add_argument('--port', type=int, default=8112)
+    serve.add_argument('--record', default='josm.jsonl', metavar='FICHIER', help='Appels load_object reçus')
+    run = commands.add_parser(
+        'run', parents=[common],
+        help='Analyse des régions par main.py contre le serveur local (autres options transmises à main.py)'
+    )
+    run.add_argument('--regions', default='regions.csv', metavar='FICHIER')
+    run.add_argument('--region', action='append', help='Région à analyser (toutes par défaut), option répétable')
+    run.add_argument('--processes', type=int, default=1)
+    run.add_argument('--api-interval', type=float, default=0.0, metavar='SECONDES',
+                     help="Délai minimal entre deux requêtes à l'API OSM (main.py --api-interval)")
+    run.add_argument('--port', type=int, default=0, help='Port du serveur local (0 : choisi par le système)')
+    run.add_argument('--output', default='replay', metavar='REPERTOIRE',
+                     help='Constats (conservés d\'une exécution à l\'autre), appels JOSM, bilan et rapport')
+    args, extra = parser.parse_known_args()
+
+    match args.command:
+        case 'serve':
+            if extra:
+                parser.error(f'arguments non reconnus : {" ".join(extra)}')
+            paths = [
+                os.path.join(root, name) for root, _, names in os.walk(args.extracts)
+                for name in names if name.endswith('.osm.pbf')
+            ]
+            server = StandIn(args.extracts, paths, faults(args), args.record, ('127.0.0.1', args.port), args.seed)
+            print(f'python main.py --extracts-url {server.url}/extracts --josm-url {server.url}/josm '
+                  f'--osm-api {server.url}/api/0.6')
+            try:
+                server.serve_forever()
+            except KeyboardInterrupt:
+                pass
+            finally:
+                server.close()
+            print(json.dumps(server.stats(), indent=2))
+        case 'run':
+            report = replay(args, extra)
+            print(f'Wall time : {report["wall_seconds"]:,.1f} s (main.py exit code {report["returncode"]})')
+            for service, statuses in report['requests'].items():
+                print(f'{service:>8} : {sum(statuses.values()):,} requests {statuses}, '
+                      f'{report["bytes"].get(service, 0) / 1e6:,.1f} MB, '
+                      f'{report["injected_seconds"].get(service, 0):,.1f} s injected latency')
+            print(f'    JOSM : {report["load_object"]["calls"]:,} load_object, '
+                  f'{report["load_object"]["objects"]:,} objects')
+            if 'findings' in report:
+                findings = report['findings']
+                print(f'Findings : {findings["total"]:,} (run {findings["run"]}) {findings["checks"]}')
+                if 'previous' in findings:
+                    print(f'  vs run {findings["previous"]} : +{findings["added"]:,} / -{findings["removed"]:,}')
+            print(f'Report : {os.path.join(args.output, "report.json")}')
+            sys.exit(report['returncode'])
@@ -0,0 +1,66 @@
+import hashlib
+import logging
+import sqlite3
+
+
+class ResultCache:
+    """Résultats des vérifications par élément, d'une exécution à l'autre : (type, id) -> (version, sans erreur).
+
+    Le cache est vidé automatiquement dès qu'un des fichiers de paramétrage (sources) change.
+    """
+
+    TYPES = ('node', 'way', 'relation')
+    CODES = {type_: code for code, type_ in enumerate(TYPES)}
+
+    def __init__(self, filename: str, sources=()):
+        self.filename = filename
+        self.db = sqlite3.connect(filename, timeout=60)
+        self.db.execute('PRAGMA journal_mode=WAL')
+        self.db.execute('PRAGMA synchronous=NORMAL')
+        self.db.execute('CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT) WITHOUT ROWID')
+        self.db.execute(
+            'CREATE TABLE IF NOT EXISTS results ('
+            'type INTEGER, id INTEGER, version INTEGER, clean INTEGER, PRIMARY KEY (type, id)) WITHOUT ROWID'
+        )
+        digest = hashlib.sha256()
+        for source in sources:
+            with open(source, 'rb') as f:
+                digest.update(f.read())
+        row = self.db.execute("SELECT value FROM meta WHERE key = 'sources'").fetchone()
+        if row is None or row[0] != digest.hexdigest():
+            logging.debug(f'Paramétrage modifié, {filename} vidé.')
+            with self.db:
+                self.db.execute('DELETE FROM results')
+                self.db.execute("INSERT OR REPLACE INTO meta VALUES ('sources', ?)", (digest.hexdigest(),))
+        self.skipped = 0
+
+    def close(self) -> None:
+        self.db.close()
+
+    def clean(self, entries: list, versions: list) -> dict:
+        """Versions déjà vérifiées sans erreur des éléments d'un bloc : {(type, id): version}.
+
+        Une requête par type d'élément sur l'intervalle des ids du bloc.
+        """
+        ranges = {}
+        for entry in entries:
+            type_ = type(entry).__name__.lower()
+            lo, hi = ranges.get(type_, (entry.id, entry.id))
+            ranges[type_] = (min(lo, entry.id), max(hi, entry.id))
+        known = {}
+        for type_, (lo, hi) in ranges.items():
+            for id_, version in self.db.execute(
+                    'SELECT id, version FROM results WHERE type = ? AND id BETWEEN ? AND ? AND clean',
+                    (self.CODES[type_], lo, hi)
+            ):
+                known[(type_, id_)] = version
+        return known
+
+    def store(self, results: list) -> None:
+        """Enregistre [(type, id, version, sans erreur)]."""
+        if results:
+            with self.db:
+                self.db.executemany(
+                    'INSERT OR REPLACE INTO results VALUES (?, ?, ?, ?)',
+                    ((self.CODES[type_], id_, version, clean) for type_, id_, version, clean in results)
+                )
@@ -0,0 +1,246 @@
+import collections
+import csv
+import hashlib
+import itertools
+import logging
+import os
+import pickle
+import re
+import sys
+import unicodedata
+
+try:
+    import re._parser as sre_parse  # Python >= 3.11
+except ImportError:
+    import sre_parse
+
+
+def _flatten(tree):
+    """Aplatit un motif analysé (sre_parse) : caractère littéral obligatoire, ou None pour une rupture."""
+    for op, av in tree:
+        if op is sre_parse.LITERAL:
+            yield chr(av)
+        elif op is sre_parse.AT:
+            pass  # Ancres (^, $, \b) de largeur nulle : la suite continue
+        elif op is sre_parse.SUBPATTERN and not av[1] and not av[2]:
+            yield from _flatten(av[3])  # Groupe obligatoire sans drapeaux locaux
+        else:
+            yield None
+
+
+def _fragment(pattern: re.Pattern) -> str:
+    """Plus long fragment littéral présent dans toute occurrence du motif."""
+    chars = _flatten(sre_parse.parse(pattern.pattern, pattern.flags))
+    runs = (''.join(run) for is_char, run in itertools.groupby(chars, lambda c: c is not None) if is_char)
+    return max(runs, key=len, default='')
+
+
+class RuleSet:
+    """Règles de invalid_ways_name.csv, indexées par trigrammes de leurs fragments littéraux obligatoires.
+
+    Seules les règles dont le fragment apparaît dans le libellé sont évaluées, dans l'ordre du fichier.
+    """
+
+    GRAM = 3
+
+    def __init__(self, rules):
+        self._rules = list(rules)
+
+        # Extraction du plus long fragment littéral obligatoire de chaque motif
+        frags = [(_fragment(rule[0]), bool(rule[0].flags & re.IGNORECASE)) for rule in self._rules]
+
+        # Table de repliement exacte vis à vis de re.IGNORECASE : chaque caractère équivalent à une lettre des
+        # fragments est ramené à un unique représentant (ſ -> s, K (Kelvin) -> k, İ -> i...)
+        alphabet = sorted({c for f, i in frags if i for c in f})
+        self._fold = {}
+        if alphabet:
+            every = ''.join(map(chr, itertools.chain(range(0xd800), range(0xe000, 0x110000))))
+            klass = re.compile('[' + ''.join(map(re.escape, alphabet)) + ']', re.IGNORECASE)
+            cased = ''.join(klass.findall(every))
+            for c in cased:
+                if ord(c) not in self._fold:
+                    equivalents = re.compile(re.escape(c), re.IGNORECASE).findall(cased)
+                    rep = min(equivalents)
+                    for e in equivalents:
+                        self._fold[ord(e)] = rep
+
+        self._frags = [(f.translate(self._fold) if i else f, i) for f, i in frags]
+        self._always = []  # Fragments trop courts pour l'index, simplement recherchés dans le libellé
+        self._index = ({}, {})  # (sensible à la casse, insensible à la casse)
+        for n, (frag, icase) in enumerate(self._frags):
+            if len(frag) < self.GRAM:
+                self._always.append(n)
+            else:
+                self._index[icase].setdefault(frag[:self.GRAM], []).append(n)
+
+    def __len__(self):
+        return len(self._rules)
+
+    def __iter__(self):
+        return (self[i] for i in range(len(self._rules)))
+
+    def __getitem__(self, item):
+        rule = self._rules[item]
+        if rule[0].__class__ is tuple:  # Relu depuis un instantané : motif compilé à la première utilisation
+            rule = self._rules[item] = (re.compile(*rule[0]), *rule[1:])
+        return rule
+
+    @property
+    def patterns(self) -> list:
+        """Motif de chaque règle, sans les compiler."""
+        return [rule[0][0] if rule[0].__class__ is tuple else rule[0].pattern for rule in self._rules]
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        state['_rules'] = [
+            rule if rule[0].__class__ is tuple else ((rule[0].pattern, rule[0].flags), *rule[1:])
+            for rule in self._rules
+        ]
+        return state
+
+    def candidates(self, value: str, start: int = 0) -> list:
+        """Indices (>= start, dans l'ordre du fichier) des règles susceptibles de trouver une occurrence dans value."""
+        folded = value.translate(self._fold)
+        texts = (value, folded)
+        found = set(n for n in self._always if n >= start and self._frags[n][0] in texts[self._frags[n][1]])
+        for icase, text in enumerate(texts):
+            index = self._index[icase]
+            for i in range(len(text) - self.GRAM + 1):
+                for n in index.get(text[i:i + self.GRAM], ()):
+                    if n >= start and self._frags[n][0] in text:
+                        found.add(n)
+        return sorted(found)
+
+
+def _validate(line: int, row: list) -> tuple:
+    """Règle compilée (motif,) ou (motif, remplacement) d'une ligne d'invalid_ways_name.csv.
+
+    Le modèle de remplacement (\\1, \\g<nom>...) est vérifié vis à vis des groupes du motif, comme le fera
+    match.expand. Lève re.error en précisant la ligne.
+    """
+    try:
+        regex = re.compile(row[0])
+    except re.error as e:
+        raise re.error(f'ligne {line} : {e.msg} dans le motif "{row[0]}"', row[0], e.pos) from None
+    if len(row) == 1:
+        return (regex,)
+    try:
+        sre_parse.parse_template(row[1], regex)
+    except (re.error, IndexError) as e:
+        raise re.error(f'ligne {line} : {e} dans le remplacement "{row[1]}" de "{row[0]}"', row[1]) from None
+    return regex, row[1]
+
+
+def compile_rules(filename: str) -> RuleSet:
+    """Compile et valide toutes les règles (motifs et remplacements) de filename.
+
+    Toutes les erreurs sont signalées (log) avant de lever re.error.
+    """
+    rules, errors = [], []
+    with open(filename, newline='', encoding="utf8") as f:
+        reader = csv.reader(f)
+        next(reader)  # Saute la 1ère ligne
+        for row in reader:
+            if len(row) and row[0][0] != '#':
+                try:
+                    rules.append(_validate(reader.line_num, row))
+                except re.error as e:
+                    logging.error(f'{filename}, {e.msg}')
+                    errors.append(e)
+    if errors:
+        raise re.error(f'{len(errors)} règle(s) invalide(s) dans {filename}')
+    return RuleSet(rules)
+
+
+class Snapshot:
+    """Instantané d'un RuleSet compilé (index, table de repliement, motifs), relu sans recompilation.
+
+    L'instantané est estampillé de sa version, de celle de Python et d'Unicode (le repliement de casse en dépend) et
+    de l'empreinte SHA-256 du CSV source : il est recompilé automatiquement dès que l'un d'eux change.
+    """
+
+    MAGIC = b'CKRS'
+    VERSION = 1
+
+    def __init__(self, filename: str = 'invalid_ways_name.csv', path: str | None = None):
+        self.filename = filename
+        self.path = path or os.path.splitext(filename)[0] + '.rules'
+
+    def _stamp(self, digest: str | None = None) -> dict:
+        stat = os.stat(self.filename)
+        return {
+            'version': self.VERSION, 'python': sys.version_info[:2], 'unicode': unicodedata.unidata_version,
+            'mtime': stat.st_mtime_ns, 'size': stat.st_size, 'sha256': digest or self._digest()
+        }
+
+    def _digest(self) -> str:
+        with open(self.filename, 'rb') as f:
+            return hashlib.sha256(f.read()).hexdigest()
+
+    def load(self) -> RuleSet:
+        """RuleSet relu depuis l'instantané s'il est à jour, sinon compilé puis enregistré."""
+        try:
+            with open(self.path, 'rb') as f:
+                if f.read(len(self.MAGIC)) == self.MAGIC:
+                    stamp, rules = pickle.load(f)
+                    current = self._stamp(stamp['sha256'])
+                    touched = stamp != current
+                    if touched:  # Date ou taille du CSV modifiées : son contenu l'est-il ?
+                        current = {**self._stamp(), 'mtime': stamp['mtime'], 'size': stamp['size']}
+                    if stamp == current:
+                        if touched:
+                            self.save(rules)
+                        logging.debug(f'Règles lues depuis {self.path}.')
+                        return rules
+        except (OSError, EOFError, pickle.UnpicklingError, ValueError, KeyError, TypeError):
+            pass
+        rules = compile_rules(self.filename)
+        self.save(rules)
+        return rules
+
+    def save(self, rules: RuleSet) -> None:
+        try:
+            tmp = f'{self.path}.{os.getpid()}.tmp'
+            with open(tmp, 'wb') as f:
+                f.write(self.MAGIC)
+                pickle.dump((self._stamp(), rules), f, pickle.HIGHEST_PROTOCOL)
+            os.replace(tmp, self.path)
+        except OSError as e:
+            logging.info(f"Instantané des règles non enregistré ({e})")
+
+
+class VerdictCache:
+    """Cache LRU borné des verdicts de check_name, par (key, value).
+
+    Un verdict vaut () si aucune règle de remplacement ne s'applique, (n, remplacement) sinon.
+    """
+
+    def __init__(self, maxsize: int):
+        self.maxsize = maxsize
+        self._data = collections.OrderedDict()
+        self.hits, self.misses, self.evictions = 0, 0, 0
+
+    def __len__(self):
+        return len(self._data)
+
+    def __str__(self):
+        return f'{self.hits:,} hits / {self.misses:,} misses / {self.evictions:,} evictions'
+
+    def get(self, key):
+        """Verdict mémorisé pour key, None s'il est absent."""
+        try:
+            verdict = self._data[key]
+        except KeyError:
+            self.misses += 1
+            return None
+        self._data.move_to_end(key)
+        self.hits += 1
+        return verdict
+
+    def put(self, key, verdict: tuple) -> None:
+        self._data[key] = verdict
+        self._data.move_to_end(key)
+        if len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+            self.evictions += 1
+
@@ -0,0 +1,85 @@
+import collections
+import concurrent.futures
+import csv
+import logging
+import shutil
+import tempfile
+import time
+
+from download import ExtractCache, rebase
+
+Region = collections.namedtuple('Region', 'name urls')
+"""Région analysée d'un bloc (un calque JOSM) : nom et URL de ses extraits départementaux."""
+
+Job = collections.namedtuple('Job', 'region size path download')
+"""Région prête à être analysée : taille de ses extraits (octets), fichier les concaténant (None tant qu'il n'est pas
+téléchargé), durée de téléchargement (s)."""
+
+
+def load_regions(filename: str = 'regions.csv', base: str | None = None) -> list:
+    """Régions et extraits du fichier (une ligne par extrait, lignes commençant par # ignorées), dans son ordre.
+
+    base remplace l'origine des URL des extraits (rebase).
+    """
+    regions = {}
+    with open(filename, newline='', encoding='utf8') as f:
+        reader = csv.reader(f)
+        next(reader)  # Saute la 1ère ligne
+        for row in reader:
+            if len(row) < 2 or row[0].startswith('#'):
+                continue
+            regions.setdefault(row[0].strip(), []).append(rebase(row[1].strip(), base))
+    return [Region(name, sorted(urls)) for name, urls in regions.items()]
+
+
+class Scheduler:
+    """Ordonnancement des régions : de la plus coûteuse à la moins coûteuse, le coût étant estimé par la taille de
+    ses extraits. Les prefetch régions suivantes sont téléchargées et concaténées (dans directory) pendant l'analyse
+    de la région en cours.
+
+    ready(nom) donne le fichier déjà prêt d'une région (reprise d'une analyse interrompue), analysée en premier.
+    """
+
+    def __init__(self, extracts: ExtractCache, regions, prefetch: int = 2, directory: str | None = None,
+                 ready=lambda name: None):
+        self.extracts = extracts
+        self.regions = list(regions)
+        self.prefetch = prefetch
+        self.directory = directory
+        self.ready = ready
+
+    def jobs(self) -> list:
+        """Régions dans l'ordre d'analyse, sans fichier pour celles à télécharger."""
+        sizes = iter(self.extracts.sizes([url for region in self.regions for url in region.urls]))
+        jobs = []
+        for region in self.regions:
+            size = sum(next(sizes) for _ in region.urls)
+            jobs.append(Job(region, size, self.ready(region.name), 0.0))
+        return sorted(jobs, key=lambda job: (job.path is None, -job.size))
+
+    def _download(self, job: Job) -> Job:
+        """Télécharge les extraits de la région et les concatène dans un fichier temporaire."""
+        start = time.monotonic()
+        with tempfile.NamedTemporaryFile(
+                mode='wb', delete=False, dir=self.directory, prefix='region-', suffix='.osm.pbf'
+        ) as dest:
+            for path in self.extracts.fetch_all(job.region.urls):
+                with open(path, 'rb') as src:
+                    shutil.copyfileobj(src, dest)
+        logging.debug(f'{job.region.name} : {len(job.region.urls)} extraits téléchargés.')
+        return job._replace(path=dest.name, download=time.monotonic() - start)
+
+    def __iter__(self):
+        """Produit les régions prêtes (Job), dans l'ordre d'analyse, pendant que les suivantes se téléchargent."""
+        jobs = collections.deque(self.jobs())
+        pending = collections.deque()
+        with concurrent.futures.ThreadPoolExecutor(max(self.prefetch, 1), thread_name_prefix='prefetch') as executor:
+            while jobs or pending:
+                while jobs and len(pending) <= self.prefetch:
+                    job = jobs.popleft()
+                    if job.path is None:
+                        pending.append(executor.submit(self._download, job))
+                    else:
+                        pending.append(concurrent.futures.Future())
+                        pending[-1].set_result(job)
+                yield pending.popleft().result()
@@ -0,0 +1,130 @@
+import array
+import re
+
+
+def distance(a: str, b: str, limit: int) -> int:
+    """Distance d'édition (Levenshtein) entre a et b, ou limit + 1 dès qu'elle dépasse limit."""
+    if abs(len(a) - len(b)) > limit:
+        return limit + 1
+    # Préfixe et suffixe communs retirés : une typo ne touche en général que quelques caractères
+    start = 0
+    while start < len(a) and start < len(b) and a[start] == b[start]:
+        start += 1
+    end = 0
+    while end < len(a) - start and end < len(b) - start and a[-1 - end] == b[-1 - end]:
+        end += 1
+    a, b = a[start:len(a) - end], b[start:len(b) - end]
+    previous = list(range(len(b) + 1))
+    for i, ca in enumerate(a, 1):
+        current = [i]
+        for j, cb in enumerate(b, 1):
+            current.append(min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + (ca != cb)))
+        if min(current) > limit:
+            return limit + 1
+        previous = current
+    return min(previous[-1], limit + 1)
+
+
+def _grams(name: str) -> set:
+    padded = f'\x02{name}\x03'
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+def _template(text: str) -> str:
+    """text littéral dans un modèle de remplacement (match.expand)."""
+    return text.replace('\\', r'\\')
+
+
+def rule(rare: str, frequent: str) -> tuple:
+    """Règle (recherche, remplacement) au format d'invalid_ways_name.csv corrigeant rare en frequent.
+
+    Si un seul mot diffère, la règle porte sur ce mot quel que soit le reste du libellé, sinon sur le libellé entier.
+    """
+    words, expected = rare.split(' '), frequent.split(' ')
+    if len(words) == len(expected):
+        differ = [(w, e) for w, e in zip(words, expected) if w != e]
+        if len(differ) == 1 and differ[0][0] and differ[0][0].lower() != differ[0][1].lower():
+            word, replace = differ[0]
+            # \b seulement du côté d'un caractère de mot : pas de limite de mot après « St. » ni avant « -Jean »
+            before = r'\b' if re.match(r'\w', word[0]) else ''
+            after = r'\b' if re.match(r'\w', word[-1]) else ''
+            # \g<1> plutôt que \1 : le mot remplaçant peut commencer par un chiffre (\11er serait le groupe 11)
+            return rf'(?i)^(.*){before}{re.escape(word)}{after}(.*)$', rf'\g<1>{_template(replace)}\g<2>'
+    return f'^{re.escape(rare)}$', _template(frequent)
+
+
+class SimilarNames:
+    """Index par trigrammes des libellés fréquents, pour retrouver ceux dont un libellé rare est une variante proche.
+
+    Seuls les max_distance * 3 + 1 trigrammes les plus rares d'un libellé sont recherchés dans l'index (filtrage par
+    préfixe), les candidats sont ensuite filtrés sur leur longueur puis sur la distance d'édition.
+    """
+
+    def __init__(self, max_distance: int = 2, min_frequent: int = 10, ratio: float = 10, max_rare: int = 2,
+                 min_length: int = 6):
+        self.max_distance = max_distance
+        self.min_frequent = min_frequent
+        """Occurrences minimales d'un libellé de référence."""
+        self.ratio = ratio
+        """Rapport minimal d'occurrences entre le libellé de référence et sa variante."""
+        self.max_rare = max_rare
+        """Occurrences maximales d'une variante signalée."""
+        self.min_length = min_length
+        self._names: list = []
+        self._counts = array.array('q')
+        self._digits: list = []
+        self._postings: dict = {}
+
+    def __len__(self):
+        return len(self._names)
+
+    def add(self, name: str, count: int) -> None:
+        """Ajoute un libellé de référence s'il est assez fréquent."""
+        if count < self.min_frequent:
+            return
+        n = len(self._names)
+        self._names.append(name)
+        self._counts.append(count)
+        self._digits.append(re.sub(r'\D', '', name))
+        for gram in _grams(name):
+            postings = self._postings.get(gram)
+            if postings is None:
+                postings = self._postings[gram] = array.array('l')
+            postings.append(n)
+
+    def _limit(self, name: str) -> int:
+        return min(self.max_distance, len(name) // self.min_length)
+
+    def search(self, name: str, count: int) -> tuple | None:
+        """Libellé de référence le plus proche de name (s'il en est une variante rare) : (libellé, occurrences,
+        distance), None sinon."""
+        limit = self._limit(name)
+        if count > self.max_rare or limit == 0:
+            return None
+        grams = _grams(name)
+        prefix = sorted(grams, key=lambda g: len(self._postings.get(g, ())))[:limit * 3 + 1]
+        digits = re.sub(r'\D', '', name)
+        best = None
+        for n in set().union(*(self._postings.get(gram, ()) for gram in prefix)):
+            candidate = self._names[n]
+            if candidate == name or self._counts[n] < count * self.ratio or abs(len(candidate) - len(name)) > limit:
+                continue
+            if self._digits[n] != digits:
+                continue  # « Rue du 8 Mai 1945 » n'est pas une variante de « Rue du 9 Mai 1945 »
+            d = distance(name, candidate, limit)
+            if d <= limit and (best is None or (d, -self._counts[n]) < (best[2], -best[1])):
+                best = (candidate, self._counts[n], d)
+        return best
+
+    def near_duplicates(self, items):
+        """Variantes rares des libellés fréquents : produit (libellé, références, libellé de référence, ses
+        occurrences, distance).
+
+        items() produit les (libellé, références), elle est appelée deux fois : indexation puis recherche.
+        """
+        for name, refs in items():
+            self.add(name, len(refs))
+        for name, refs in items():
+            found = self.search(name, len(refs))
+            if found:
+                yield name, refs, *found
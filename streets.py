@@ -0,0 +1,247 @@
+import array
+import bisect
+import heapq
+import math
+
+import esy.osm.pbf
+
+
+def _normalize(name: str) -> str:
+    return ' '.join(name.casefold().replace('’', "'").split())
+
+
+def _clip(x0: float, y0: float, x1: float, y1: float, bbox: tuple) -> tuple | None:
+    """Portion du segment comprise dans le rectangle bbox (Liang-Barsky), None s'il est entièrement dehors."""
+    t0, t1 = 0.0, 1.0
+    dx, dy = x1 - x0, y1 - y0
+    for p, q in ((-dx, x0 - bbox[0]), (dx, bbox[2] - x0), (-dy, y0 - bbox[1]), (dy, bbox[3] - y0)):
+        if p == 0:
+            if q < 0:
+                return None
+        elif p < 0:
+            t0 = max(t0, q / p)
+        else:
+            t1 = min(t1, q / p)
+        if t0 > t1:
+            return None
+    return x0 + t0 * dx, y0 + t0 * dy, x0 + t1 * dx, y0 + t1 * dy
+
+
+def _sorted_unique(keys, presorted: bool = False) -> array.array:
+    """Clés triées sans doublons, dans un tableau array('q')."""
+    result = array.array('q')
+    last = None
+    for k in (keys if presorted else sorted(keys)):
+        if k != last:
+            result.append(k)
+            last = k
+    return result
+
+
+class StreetIndex:
+    """Contrôle spatial des adresses : addr:street d'un nœud sans voie de ce nom à proximité.
+
+    Tout est conservé dans des tableaux : coordonnées des nœuds (séries triées par id, une par extrait), adresses,
+    voies nommées (libellé et nœuds). En fin d'analyse (missing), les voies sont tracées sur une grille de cellules
+    d'au moins radius mètres de côté, chaque couple (cellule, libellé) formant une clé d'un tableau trié : une adresse
+    est signalée si aucune des 9 cellules qui l'entourent ne contient une voie de même libellé (à la casse et aux
+    espaces près).
+    """
+
+    METERS_PER_DEGREE = 111_320
+    CHUNK = 1 << 20
+    """Clés (cellule, libellé) accumulées avant d'être triées et dédoublonnées en une série."""
+
+    def __init__(self, radius: float = 200):
+        self.radius = radius
+        self._codes: dict = {}  # libellé -> n°
+        self._strings: list = []  # n° -> libellé
+        self._runs: list = []  # [(ids array('q'), longitudes array('f'), latitudes array('f'))]
+        self._addresses = (array.array('q'), array.array('f'), array.array('f'), array.array('l'))
+        self._ways = (array.array('l'), array.array('q'))  # n° de libellé, fin des nœuds de chaque voie dans _refs
+        self._refs = array.array('q')
+
+    def _code(self, name: str) -> int:
+        code = self._codes.get(name)
+        if code is None:
+            code = self._codes[name] = len(self._strings)
+            self._strings.append(name)
+        return code
+
+    def add_nodes(self, entries) -> None:
+        """Coordonnées des nœuds d'un bloc (tous, les voies n'étant connues qu'après les nœuds)."""
+        if not entries or entries[0].__class__ is not esy.osm.pbf.file.Node:
+            return  # Les nœuds sont regroupés dans leurs propres blocs
+        for entry in entries:
+            if entry.__class__ is not esy.osm.pbf.file.Node or entry.lonlat is None:
+                continue
+            id_ = int(entry.id)
+            if not self._runs or self._runs[-1][0] and id_ <= self._runs[-1][0][-1]:
+                self._runs.append((array.array('q'), array.array('f'), array.array('f')))
+            ids, lons, lats = self._runs[-1]
+            ids.append(id_)
+            lons.append(entry.lonlat[0])
+            lats.append(entry.lonlat[1])
+
+    def add_ways(self, entries) -> None:
+        """Voies nommées d'un bloc (toutes, y compris celles déjà vues dans une autre région ou hors de la zone
+        d'analyse : les adresses voisines y renvoient)."""
+        if not entries or entries[0].__class__ is not esy.osm.pbf.file.Way:
+            return  # Les voies sont regroupées dans leurs propres blocs
+        for entry in entries:
+            if entry.__class__ is esy.osm.pbf.file.Way and 'name' in entry.tags and (
+                    'highway' in entry.tags or entry.tags.get('place') == 'square'
+            ):
+                self.add_way(entry)
+
+    def add_address(self, entry) -> None:
+        if entry.lonlat is None:
+            return
+        ids, lons, lats, names = self._addresses
+        ids.append(int(entry.id))
+        lons.append(entry.lonlat[0])
+        lats.append(entry.lonlat[1])
+        names.append(self._code(entry.tags['addr:street']))
+
+    def add_way(self, entry) -> None:
+        self._refs.extend(entry.refs)
+        self._ways[0].append(self._code(entry.tags['name']))
+        self._ways[1].append(len(self._refs))
+
+    def update(self, other: 'StreetIndex') -> None:
+        """Ajoute le contenu de other (résultat partiel d'un processus de travail, dans l'ordre du fichier)."""
+        codes = array.array('l', (self._code(name) for name in other._strings))
+        for ids, lons, lats in other._runs:
+            if ids and self._runs and (not self._runs[-1][0] or ids[0] > self._runs[-1][0][-1]):
+                self._runs[-1][0].extend(ids)
+                self._runs[-1][1].extend(lons)
+                self._runs[-1][2].extend(lats)
+            else:
+                self._runs.append((ids, lons, lats))
+        for mine, theirs in zip(self._addresses, other._addresses[:3]):
+            mine.extend(theirs)
+        self._addresses[3].extend(codes[code] for code in other._addresses[3])
+        base = len(self._refs)
+        self._refs.extend(other._refs)
+        self._ways[0].extend(codes[code] for code in other._ways[0])
+        self._ways[1].extend(end + base for end in other._ways[1])
+
+    def mark(self) -> tuple:
+        """Taille actuelle du contenu, point de départ de tail (les tableaux ne font que grandir jusqu'à clear)."""
+        return (
+            len(self._strings), len(self._runs), len(self._runs[-1][0]) if self._runs else 0,
+            len(self._addresses[0]), len(self._ways[0]), len(self._refs)
+        )
+
+    def tail(self, mark: tuple | None) -> dict:
+        """Contenu ajouté depuis mark (None : depuis le début), à rajouter par extend (points de reprise)."""
+        strings, runs, last, addresses, ways, refs = mark or (0, 0, 0, 0, 0, 0)
+        first = max(runs - 1, 0)
+        return {
+            'strings': self._strings[strings:],
+            'runs': [
+                (n, *(values[last if n == runs - 1 else 0:] for values in self._runs[n]))
+                for n in range(first, len(self._runs))
+            ],
+            'addresses': [values[addresses:] for values in self._addresses],
+            'ways': [values[ways:] for values in self._ways],
+            'refs': self._refs[refs:]
+        }
+
+    def extend(self, tail: dict) -> None:
+        """Rajoute un contenu produit par tail, dans l'ordre où il a été produit."""
+        for name in tail['strings']:
+            self._code(name)
+        for n, ids, lons, lats in tail['runs']:
+            if n < len(self._runs):
+                for mine, theirs in zip(self._runs[n], (ids, lons, lats)):
+                    mine.extend(theirs)
+            else:
+                self._runs.append((ids, lons, lats))
+        for mine, theirs in zip(self._addresses, tail['addresses']):
+            mine.extend(theirs)
+        for mine, theirs in zip(self._ways, tail['ways']):
+            mine.extend(theirs)
+        self._refs.extend(tail['refs'])
+
+    def _locate(self, id_: int, hint: int) -> tuple:
+        """(n° de série, position) du nœud id_, en commençant par la série hint ; (hint, -1) s'il est inconnu."""
+        for n in (hint, *range(len(self._runs))):
+            ids = self._runs[n][0]
+            i = bisect.bisect_left(ids, id_)
+            if i < len(ids) and ids[i] == id_:
+                return n, i
+        return hint, -1
+
+    def missing(self):
+        """Adresses sans voie de même libellé à proximité : produit (id, addr:street)."""
+        if not self._addresses[0] or not self._runs:
+            return
+        cell_lat = self.radius / self.METERS_PER_DEGREE
+        cell_lon = 2 * cell_lat  # Cellules d'au moins radius mètres de large jusqu'à 60° de latitude
+        # Libellés normalisés, numérotés à partir de ceux des voies
+        normalized, norms = {}, array.array('l')
+        for name in self._strings:
+            norms.append(normalized.setdefault(_normalize(name), len(normalized)))
+        x_bits = math.ceil(360 / cell_lon).bit_length()
+        shift = len(normalized).bit_length()
+        if x_bits + math.ceil(180 / cell_lat).bit_length() + shift > 63:
+            raise ValueError(f'Rayon de {self.radius} m trop petit pour la grille')
+
+        def cell(lon: float, lat: float) -> tuple:
+            return int((lat + 90) / cell_lat), int((lon + 180) / cell_lon)
+
+        def key(row: int, col: int, name: int) -> int:
+            return (row << x_bits | col) << shift | name
+
+        # Seules les cellules voisines d'une adresse sont consultées : les côtés des voies sont coupés au rectangle
+        # englobant les adresses, élargi de deux cellules (la cellule voisine d'une adresse peut commencer jusqu'à
+        # deux largeurs de cellule avant elle)
+        _, lons, lats, _ = self._addresses
+        bbox = (min(lons) - 2 * cell_lon, min(lats) - 2 * cell_lat, max(lons) + 2 * cell_lon, max(lats) + 2 * cell_lat)
+
+        runs = []  # Séries triées et dédoublonnées de clés (cellule, libellé)
+        keys = array.array('q')
+        start, hint = 0, 0
+        for code, end in zip(*self._ways):
+            points = []
+            for ref in self._refs[start:end]:
+                hint, i = self._locate(ref, hint)
+                if i >= 0:
+                    points.append((self._runs[hint][1][i], self._runs[hint][2][i]))
+            start = end
+            name = norms[code]
+            for segment in zip(points, points[1:] or points):
+                clipped = _clip(*segment[0], *segment[1], bbox)
+                if clipped is None:
+                    continue
+                lon0, lat0, lon1, lat1 = clipped
+                # Tracé du segment par pas d'au plus une cellule
+                steps = max(1, math.ceil(max(abs(lon1 - lon0) / cell_lon, abs(lat1 - lat0) / cell_lat)))
+                for step in range(steps + 1):
+                    t = step / steps
+                    keys.append(key(*cell(lon0 + (lon1 - lon0) * t, lat0 + (lat1 - lat0) * t), name))
+            if len(keys) >= self.CHUNK:
+                runs.append(_sorted_unique(keys))
+                keys = array.array('q')
+        runs.append(_sorted_unique(keys))
+        keys = runs[0] if len(runs) == 1 else _sorted_unique(heapq.merge(*runs), presorted=True)
+        del runs
+
+        for id_, lon, lat, code in zip(*self._addresses):
+            row, col = cell(lon, lat)
+            name = norms[code]
+            for dy in (-1, 0, 1):
+                for dx in (-1, 0, 1):
+                    k = key(row + dy, col + dx, name)
+                    i = bisect.bisect_left(keys, k)
+                    if i < len(keys) and keys[i] == k:
+                        break
+                else:
+                    continue
+                break
+            else:
+                yield id_, self._strings[code]
+
+    def clear(self) -> None:
+        self.__init__(self.radius)
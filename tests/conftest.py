@@ -0,0 +1,108 @@
+import http.server
+import os
+import sys
+import threading
+
+import pytest
+from esy.osm.pbf import osmformat_pb2
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from bench import Fixture  # noqa: E402
+
+
+class Server(http.server.ThreadingHTTPServer):
+    """Serveur HTTP local : respond(méthode, chemin, en-têtes) -> (code, en-têtes, corps), requêtes enregistrées."""
+
+    daemon_threads = True
+
+    def __init__(self, respond):
+        class Handler(http.server.BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+            disable_nagle_algorithm = True
+
+            def log_message(self, format, *args):
+                pass
+
+            def _reply(self, head: bool):
+                self.server.requests.append((self.command, self.path))
+                status, headers, body = respond(self.command, self.path, self.headers)
+                self.send_response(status)
+                for key, value in headers.items():
+                    self.send_header(key, value)
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                if not head:
+                    self.wfile.write(body)
+
+            def do_GET(self):
+                self._reply(False)
+
+            def do_HEAD(self):
+                self._reply(True)
+
+        super().__init__(('127.0.0.1', 0), Handler)
+        self.requests = []
+
+    def handle_error(self, request, client_address):
+        pass  # Client parti avant la réponse (délai dépassé)
+
+    @property
+    def url(self) -> str:
+        return f'http://127.0.0.1:{self.server_address[1]}'
+
+
+@pytest.fixture
+def serve():
+    """Démarre un serveur local (Server) pour la durée du test."""
+    servers = []
+
+    def start(respond) -> Server:
+        server = Server(respond)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        servers.append(server)
+        return server
+
+    yield start
+    for server in servers:
+        server.shutdown()
+        server.server_close()
+
+
+def write_pbf(path, nodes=(), ways=()) -> str:
+    """Petit extrait .osm.pbf : nodes [(id, lon, lat, tags)] et ways [(id, refs, tags)] triés par id."""
+    with open(path, 'wb') as f:
+        header = osmformat_pb2.HeaderBlock()
+        header.required_features.extend(('OsmSchema-V0.6', 'DenseNodes'))
+        Fixture._blob(f, 'OSMHeader', header)
+        block = osmformat_pb2.PrimitiveBlock()
+        string, close = Fixture._strings(block)
+        dense = block.primitivegroup.add().dense
+        last = (0, 0, 0)
+        for id_, lon, lat, tags in nodes:
+            current = (id_, round(lat * 1e7), round(lon * 1e7))
+            dense.id.append(current[0] - last[0])
+            dense.lat.append(current[1] - last[1])
+            dense.lon.append(current[2] - last[2])
+            dense.denseinfo.version.append(1)
+            last = current
+            for key, value in tags.items():
+                dense.keys_vals.extend((string(key), string(value)))
+            dense.keys_vals.append(0)
+        close()
+        Fixture._blob(f, 'OSMData', block)
+        block = osmformat_pb2.PrimitiveBlock()
+        string, close = Fixture._strings(block)
+        group = block.primitivegroup.add()
+        for id_, refs, tags in ways:
+            way = group.ways.add()
+            way.id = id_
+            way.info.version = 1
+            for key, value in tags.items():
+                way.keys.append(string(key))
+                way.vals.append(string(value))
+            way.refs.extend(ref - previous for ref, previous in zip(refs, (0, *refs)))
+        close()
+        Fixture._blob(f, 'OSMData', block)
+    return str(path)
@@ -0,0 +1,80 @@
+import logging
+import urllib.parse
+
+import pytest
+
+import main
+from conftest import ROOT
+from findings import Finding, FindingStore
+
+CHANGES = '''<?xml version="1.0" encoding="UTF-8"?>
+<osmChange version="0.6">
+  <delete>
+    <way id="1" version="3"/>
+  </delete>
+  <modify>
+    <way id="2" version="2"><nd ref="10"/><nd ref="11"/>
+      <tag k="highway" v="residential"/><tag k="name" v="Rue de la Mairie"/></way>
+  </modify>
+  <create>
+    <way id="5" version="1"><nd ref="10"/><nd ref="11"/>
+      <tag k="highway" v="residential"/><tag k="name" v="Avenue Jean Jaures"/></way>
+  </create>
+</osmChange>
+'''
+
+DELETE = '''<?xml version="1.0" encoding="UTF-8"?>
+<osmChange version="0.6"><delete><way id="3" version="2"/></delete></osmChange>
+'''
+
+
+def api(method, path, headers):
+    """API OSM : la voie 5 telle que créée par CHANGES."""
+    parts = urllib.parse.urlsplit(path)
+    ids = urllib.parse.parse_qs(parts.query).get('ways', [''])[0].split(',')
+    if not parts.path.endswith('/ways') or ids != ['5']:
+        return 404, {}, b''
+    return 200, {}, (
+        '<osm><way id="5" visible="true" version="1"><nd ref="10"/><nd ref="11"/>'
+        '<tag k="highway" v="residential"/><tag k="name" v="Avenue Jean Jaures"/></way></osm>'
+    ).encode()
+
+
+def finding(id_: int, value: str) -> Finding:
+    return Finding('check_highway_name', 'Jaures', 'way', id_, 'name', value, None, logging.WARNING, 'Bretagne')
+
+
+@pytest.fixture
+def app(tmp_path, monkeypatch, serve):
+    monkeypatch.chdir(ROOT)
+    app = main.Application(
+        findings=str(tmp_path / 'findings.sqlite'), log_findings=False, osm_api=f'{serve(api).url}/api/0.6',
+        api_interval=0, josm_output=str(tmp_path / 'josm.jsonl')
+    )
+    # Exécution complète précédente
+    app.findings.start('full')
+    for id_ in (1, 2, 3):
+        app.findings.add(finding(id_, 'Avenue Jean Jaures'))
+    yield app
+    app.josm.close()
+    app.names.close()
+    app.findings.close()
+
+
+def current(app) -> set:
+    return {(f.type, f.id, f.region) for f in FindingStore(app.findings.filename).query(app.findings.run)}
+
+
+def test_changes_retract_deleted_and_fixed_elements(app, tmp_path):
+    (tmp_path / 'a.osc').write_text(CHANGES, encoding='utf8')
+    app.findings.start('a.osc')
+    app.parse_changes('Changes', [str(tmp_path / 'a.osc')], names_file=str(tmp_path / 'names.csv'))
+    app.findings.flush()
+    # 1 supprimée, 2 corrigée : retirées ; 3 inchangée : reprise ; 5 créée : nouveau constat
+    assert current(app) == {('way', 3, 'Bretagne'), ('way', 5, 'Changes')}
+
+    (tmp_path / 'b.osc').write_text(DELETE, encoding='utf8')
+    app.findings.start('b.osc')
+    app.parse_changes('Changes', [str(tmp_path / 'b.osc')], names_file=str(tmp_path / 'names.csv'))
+    app.findings.flush()
+    assert current(app) == {('way', 5, 'Changes')}
@@ -0,0 +1,82 @@
+import os
+
+import esy.osm.pbf
+import pytest
+
+import main
+from bench import Fixture
+from checkpoint import Checkpoint
+from conftest import ROOT
+from names import NameIndex
+
+
+def test_clear_keeps_unrelated_files(tmp_path):
+    directory = tmp_path / 'checkpoint'
+    checkpoints = Checkpoint(str(directory))
+    names = NameIndex(memory_limit=None, directory=str(directory))
+    names.add('Grande Rue', 'way', 1)
+    names.spill()
+    (directory / 'region-abc.osm.pbf').write_bytes(b'')
+    (directory / 'notes.txt').write_text('à garder')
+    (directory / 'sub').mkdir()
+    (directory / 'sub' / 'names-1.csv').write_text('')
+    checkpoints.save({'region': 'A'}, {}, None)
+    checkpoints.clear()
+    assert sorted(name for name in os.listdir(directory) if not name.startswith('checkpoint.sqlite')) == [
+        'notes.txt', 'sub'
+    ]
+    assert checkpoints.load()[0] == {}
+    checkpoints.close()
+
+
+@pytest.fixture
+def application(tmp_path, monkeypatch):
+    monkeypatch.chdir(ROOT)
+    apps = []
+
+    def start(**options) -> main.Application:
+        app = main.Application(log_findings=False, josm_output=str(tmp_path / 'josm.jsonl'), **options)
+        apps.append(app)
+        return app
+
+    yield start
+    for app in apps:
+        app.close_workers()
+        app.josm.close()
+        app.names.close()
+        if app.checkpoints:
+            app.checkpoints.close()
+
+
+def test_pending_verifications_kept_without_network(application, tmp_path, serve):
+    server = serve(lambda method, path, headers: (500, {}, b''))
+    directory = str(tmp_path / 'checkpoint')
+    app = application(checkpoint=directory, osm_api=f'{server.url}/api/0.6')
+    app.verify_name('way', 5, 'name')
+    app.checkpoint(3, 1, 2, 3)
+    app.checkpoints.wait()
+    assert server.requests == []  # Aucune relecture pendant le point de reprise
+    resumed = application(checkpoint=directory)
+    resumed.resume()
+    assert resumed._to_verify == [('way', 5, 'name')]
+
+
+def test_parallel_area_checkpoints_absolute_blocks(application, tmp_path, monkeypatch, serve):
+    """Avec une zone d'analyse, le n° de bloc enregistré est celui du fichier, pas celui des blocs retenus."""
+    api = serve(lambda method, path, headers: (200, {}, b'<osm/>'))  # Éléments relus tous supprimés
+    path = Fixture(nodes=6_000, ways=600, relations=0, block_size=300).build(str(tmp_path))
+    with esy.osm.pbf.File(path) as pbf:
+        lon, lat = next(iter(list(pbf.blocks)[15])).lonlat
+    saved = {}
+    for processes in (1, 3):
+        app = application(
+            checkpoint=str(tmp_path / f'checkpoint-{processes}'), checkpoint_interval=0,
+            area=f'{lon - 0.001},{lat - 0.001},{lon + 0.001},{lat + 0.001}', osm_api=f'{api.url}/api/0.6'
+        )
+        blocks = saved[processes] = []
+        monkeypatch.setattr(app, 'checkpoint', lambda block, *counts: blocks.append(block))
+        with esy.osm.pbf.File(path) as pbf:
+            app.parse('A', pbf, processes)
+    assert saved[1][0] == -1 and saved[1][-1] is None and 15 in saved[1]
+    assert saved[3][-2] == saved[1][-2] == max(block for block in saved[1] if block is not None)
+    assert set(saved[3]) <= set(saved[1])
@@ -0,0 +1,99 @@
+import json
+import os
+import threading
+import time
+
+import pytest
+import requests
+
+from download import ExtractCache
+
+CONTENT = {'/fr/a.osm.pbf': os.urandom(3 * ExtractCache.CHUNK_SIZE + 123), '/fr/b.osm.pbf': b'b' * 1000}
+
+
+def extracts(versions: dict):
+    """Serveur d'extraits : ETag et Last-Modified, 304 si le client a déjà la version courante."""
+    def respond(method, path, headers):
+        if path not in CONTENT:
+            return 404, {}, b''
+        tag = f'"{versions.get(path, 1)}"'
+        if headers.get('If-None-Match') == tag:
+            return 304, {'ETag': tag}, b''
+        body = CONTENT[path] + str(versions.get(path, 1)).encode()
+        return 200, {'ETag': tag, 'Last-Modified': 'Mon, 05 Oct 2026 10:00:00 GMT'}, body
+    return respond
+
+
+def test_fetch_streams_then_revalidates(tmp_path, serve):
+    versions = {}
+    server = serve(extracts(versions))
+    cache = ExtractCache(str(tmp_path))
+    url = f'{server.url}/fr/a.osm.pbf'
+    path = cache.fetch(url)
+    assert path == os.path.join(str(tmp_path), f'127.0.0.1_{server.server_address[1]}', 'fr', 'a.osm.pbf')
+    with open(path, 'rb') as f:
+        assert f.read() == CONTENT['/fr/a.osm.pbf'] + b'1'
+    assert not os.path.exists(path + '.part')
+    with open(path + '.meta.json', encoding='utf8') as f:
+        assert json.load(f) == {'etag': '"1"', 'last-modified': 'Mon, 05 Oct 2026 10:00:00 GMT'}
+
+    assert cache.fetch(url) == path  # 304 : fichier conservé
+    assert (cache.downloaded, cache.revalidated) == (1, 1)
+
+    versions['/fr/a.osm.pbf'] = 2
+    cache.fetch(url)
+    with open(path, 'rb') as f:
+        assert f.read().endswith(b'2')
+    assert (cache.downloaded, cache.revalidated) == (2, 1)
+
+
+def test_if_modified_since(tmp_path, serve):
+    sent = []
+
+    def respond(method, path, headers):
+        sent.append(headers.get('If-Modified-Since'))
+        if headers.get('If-Modified-Since'):
+            return 304, {}, b''
+        return 200, {'Last-Modified': 'Mon, 05 Oct 2026 10:00:00 GMT'}, b'data'
+
+    cache = ExtractCache(str(tmp_path))
+    url = f'{serve(respond).url}/fr/c.osm.pbf'
+    cache.fetch(url)
+    cache.fetch(url)
+    assert sent == [None, 'Mon, 05 Oct 2026 10:00:00 GMT']
+    assert cache.revalidated == 1
+
+
+def test_fetch_all_is_parallel_and_ordered(tmp_path, serve):
+    barrier = threading.Barrier(2, timeout=5)  # Échoue si les deux requêtes ne sont pas simultanées
+    respond = extracts({})
+
+    def parallel(method, path, headers):
+        barrier.wait()
+        return respond(method, path, headers)
+
+    server = serve(parallel)
+    cache = ExtractCache(str(tmp_path), workers=2)
+    urls = [f'{server.url}/fr/b.osm.pbf', f'{server.url}/fr/a.osm.pbf']
+    paths = list(cache.fetch_all(urls))
+    assert paths == [cache.path(url) for url in urls]
+    assert os.path.getsize(paths[1]) == len(CONTENT['/fr/a.osm.pbf']) + 1
+
+
+def test_sizes(tmp_path, serve):
+    server = serve(extracts({}))
+    cache = ExtractCache(str(tmp_path))
+    cache.fetch(f'{server.url}/fr/b.osm.pbf')
+    urls = [f'{server.url}/fr/a.osm.pbf', f'{server.url}/fr/b.osm.pbf', f'{server.url}/fr/x.osm.pbf']
+    assert cache.sizes(urls) == [len(CONTENT['/fr/a.osm.pbf']) + 1, 1001, 0]
+    assert ('HEAD', '/fr/b.osm.pbf') not in server.requests  # Taille du fichier en cache
+
+
+def test_stalled_server_times_out(tmp_path, serve):
+    def stalled(method, path, headers):
+        time.sleep(1)
+        return 200, {}, b'late'
+
+    cache = ExtractCache(str(tmp_path), timeout=0.2)
+    with pytest.raises(requests.exceptions.Timeout):
+        cache.fetch(f'{serve(stalled).url}/fr/a.osm.pbf')
@@ -0,0 +1,35 @@
+import collections
+
+from exclusions import Exclusions
+
+Entry = collections.namedtuple('Entry', 'id')
+Way = collections.namedtuple('Way', 'id')
+
+
+def exclusions(tmp_path, *rows) -> Exclusions:
+    (tmp_path / 'exclusions.csv').write_text('\n'.join(('element', *rows)) + '\n', encoding='utf8')
+    return Exclusions(str(tmp_path / 'exclusions.csv'))
+
+
+def test_window_without_exclusions(tmp_path):
+    assert exclusions(tmp_path).window([Entry(1), Entry(2)]) is None
+
+
+def test_window_sorted_block(tmp_path):
+    excluded = exclusions(tmp_path, 'node 5', 'node 50', 'way 7')
+    assert excluded.window([Entry(3), Entry(4), Entry(8)]) == {
+        'node': frozenset((5,)), 'way': frozenset((7,)), 'relation': frozenset()
+    }
+    assert excluded.window([Entry(10), Entry(20)]) is None
+    assert excluded.window([]) is None
+
+
+def test_window_unsorted_block(tmp_path):
+    window = exclusions(tmp_path, 'node 5', 'node 50').window([Entry(40), Entry(60), Entry(4)])
+    assert window['node'] == frozenset((5, 50))
+
+
+def test_window_mixed_types(tmp_path):
+    # Bloc d'un fichier osmChange : types mélangés, dans l'ordre du fichier
+    window = exclusions(tmp_path, 'way 5').window([Entry(1000), Way(5), Way(2000)])
+    assert window['way'] == frozenset((5,))
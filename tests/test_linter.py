@@ -0,0 +1,81 @@
+import random
+import re
+
+import pytest
+
+from linter import MOIS, NameLinter
+
+CHECKS = ('name_egale_addr_housenumber', 'name_egale_ref', 'name_commence_ou_termine_par_espace',
+          'name_commence_par_un_chiffre')
+
+
+def reference(type_: str, id_: int, tags: dict) -> list:
+    """Vérifications séparées d'avant NameLinter, dans leur ordre d'appel.
+
+    Deux corrections voulues : le libellé terminé par un espace (re.match(r'\\s$') ne trouvait qu'un libellé réduit à
+    un espace) et l'exception de addr:housenumber, comparée à l'id entier de l'élément et non à une chaîne.
+    """
+    found = []
+    name = tags['name']
+    if type_ in ('node', 'way'):
+        if 'addr:housenumber' in tags and name == tags['addr:housenumber']:
+            if not ((type_ == 'node' and id_ in (121991199,)) or tags.get('amenity') == 'restaurant'):
+                found.append('name_egale_addr_housenumber')
+    if 'ref' in tags and name == tags['ref']:
+        found.append('name_egale_ref')
+    if re.match(r'^\s', name):
+        found.append('name_commence_par_espace')
+    if re.search(r'\s$', name):
+        found.append('name_termine_par_espace')
+    if type_ in ('node', 'way') and re.match(r'^\d', name):
+        if not (
+                re.match(f'^\\d+ ({"|".join(MOIS)})', name) or
+                re.match(r'^(1er|1ère|\d+e|\d+è|\d+ème)\s', name) or
+                'amenity' in tags or
+                tags.get('highway') in ('bus_stop',) or
+                tags.get('historic') in ('memorial',) or
+                'office' in tags or
+                tags.get('public_transport') in ('stop_position', 'plateform') or
+                'razed:shop' in tags or
+                'shop' in tags or
+                tags.get('tourism') in ('artwork', 'chalet', 'hotel')
+        ):
+            found.append('name_commence_par_un_chiffre')
+    return found
+
+
+def random_tags(rng: random.Random) -> dict:
+    head = rng.choice(('', ' ', '\t', '1', '12', '٣', '8 ', '1er', '2ème', '3e', '4è', '10ème'))
+    body = rng.choice(('', ' ', 'Rue', 'Mai', 'Mai 1945', 'Novembre', ' Juin', 'Place', 'er', 'A12'))
+    tail = rng.choice(('', ' ', ' ', '\n', 'x'))
+    name = head + body + tail
+    tags = {'name': name or 'x'}
+    for key, values in (
+            ('addr:housenumber', (name, '12', '1')), ('ref', (name, 'A12')),
+            ('amenity', ('restaurant', 'bench')), ('shop', ('bakery',)), ('office', ('yes',)),
+            ('razed:shop', ('yes',)), ('highway', ('bus_stop', 'residential')),
+            ('historic', ('memorial', 'castle')), ('public_transport', ('stop_position', 'plateform', 'station')),
+            ('tourism', ('artwork', 'chalet', 'hotel', 'museum')),
+    ):
+        if rng.random() < 0.15:
+            tags[key] = rng.choice(values)
+    return tags
+
+
+@pytest.mark.parametrize('seed', range(4))
+def test_same_findings_as_separate_checks(seed):
+    rng = random.Random(seed)
+    linter = NameLinter(CHECKS)
+    for _ in range(5000):
+        type_ = rng.choice(('node', 'way', 'relation'))
+        id_ = rng.choice((121991199, 1, 42))
+        tags = random_tags(rng)
+        assert list(linter.lint(type_, id_, tags)) == reference(type_, id_, tags), (type_, id_, tags)
+
+
+def test_housenumber_exception():
+    tags = {'name': '12', 'addr:housenumber': '12'}
+    linter = NameLinter(('name_egale_addr_housenumber',))
+    assert list(linter.lint('node', 121991199, tags)) == []
+    assert list(linter.lint('node', 1, tags)) == ['name_egale_addr_housenumber']
+    assert list(linter.lint('way', 121991199, tags)) == ['name_egale_addr_housenumber']
@@ -0,0 +1,46 @@
+import csv
+import random
+import types
+
+import pytest
+
+import main
+from names import NameIndex
+
+NAMES = ['Grande Rue', 'Rue de l\'Église', 'Rue de l’Église', 'Place "du" Marché', 'Allée, des Tilleuls',
+         'Chemin\ndu Moulin', ' Rue Haute', 'Rue Haute ', 'rue haute', 'Ébène', 'Zénith', '8 Mai 1945', '']
+
+
+def additions(seed: int, count: int = 10_000) -> list:
+    rng = random.Random(seed)
+    names = NAMES + [f'Rue {n}' for n in range(300)]
+    return [
+        (rng.choice(names), rng.choice(NameIndex.TYPES), rng.randrange(1, 5000) * rng.choice((1, 1 << 40)))
+        for _ in range(count)
+    ]
+
+
+def baseline(path, added: list) -> None:
+    """names.csv d'avant NameIndex : dictionnaire libellé -> références (sans doublon, dans l'ordre d'ajout)."""
+    names = {}
+    for name, type_, id_ in added:
+        names.setdefault(name, {})[f'{type_}/{id_}'] = None
+    with open(path, 'w', encoding='UTF8', newline='') as f:
+        writer = csv.writer(f)
+        for k in sorted(names):
+            writer.writerow([k, *names[k]])
+
+
+@pytest.mark.parametrize('memory_limit', [None, 4096, 65536])
+@pytest.mark.parametrize('spill_to_directory', [False, True])
+def test_save_names_matches_dict(tmp_path, memory_limit, spill_to_directory):
+    added = additions(memory_limit or 0)
+    index = NameIndex(memory_limit, str(tmp_path) if spill_to_directory else None)
+    for name, type_, id_ in added:
+        index.add(name, type_, id_)
+    if memory_limit:
+        assert index._runs  # Séries déversées sur disque
+    main.Application.save_names(types.SimpleNamespace(names=index), str(tmp_path / 'names.csv'))
+    index.close()
+    baseline(tmp_path / 'expected.csv', added)
+    assert (tmp_path / 'names.csv').read_bytes() == (tmp_path / 'expected.csv').read_bytes()
@@ -0,0 +1,96 @@
+import time
+import urllib.parse
+
+import pytest
+import requests
+
+from osmapi import OsmApi
+
+
+def stand_in(gone=(), missing=(), multi_missing=()):
+    """API OSM : éléments gone supprimés (visible="false", 410), missing jamais créés (404).
+
+    Les éléments multi_missing ne provoquent un 404 que dans une lecture groupée.
+    """
+    def element(id_):
+        if id_ in gone:
+            return f'<node id="{id_}" visible="false"/>'
+        return f'<node id="{id_}" visible="true" lat="48" lon="2"><tag k="name" v="Rue {id_}"/></node>'
+
+    def respond(method, path, headers):
+        parts = urllib.parse.urlsplit(path)
+        if parts.path == '/api/0.6/nodes':
+            ids = urllib.parse.parse_qs(parts.query)['nodes'][0].split(',')
+            if not {*missing, *multi_missing}.isdisjoint(ids):
+                return 404, {}, b''
+            return 200, {}, f'<osm>{"".join(map(element, ids))}</osm>'.encode()
+        id_ = parts.path.rsplit('/', 1)[1]
+        if id_ in missing:
+            return 404, {}, b''
+        if id_ in gone:
+            return 410, {}, b''
+        return 200, {}, f'<osm>{element(id_)}</osm>'.encode()
+    return respond
+
+
+def failing(statuses: list, headers: dict):
+    """stand_in(), précédé des réponses en erreur statuses."""
+    respond = stand_in()
+
+    def failing_respond(method, path, request_headers):
+        if statuses:
+            return statuses.pop(0), headers, b''
+        return respond(method, path, request_headers)
+    return failing_respond
+
+
+def paths(server) -> list:
+    return [urllib.parse.unquote(path) for _, path in server.requests]
+
+
+def test_multi_fetch_batches(serve):
+    server = serve(stand_in(gone={'4'}))
+    osm = OsmApi(f'{server.url}/api/0.6', batch_size=3, min_interval=0)
+    elements = osm.fetch('node', [1, 2, 3, 4, 5, 6, 7, 1, '2'])
+    assert sorted(elements, key=int) == ['1', '2', '3', '4', '5', '6', '7']
+    assert elements['4'] is None
+    assert elements['5'].find('tag').attrib['v'] == 'Rue 5'
+    assert paths(server) == ['/api/0.6/nodes?nodes=1,2,3', '/api/0.6/nodes?nodes=4,5,6', '/api/0.6/nodes?nodes=7']
+    assert osm.requests == 3
+
+
+def test_404_falls_back_to_single_fetches(serve):
+    server = serve(stand_in(gone={'9'}, multi_missing={'9'}))
+    elements = OsmApi(f'{server.url}/api/0.6', min_interval=0).fetch('node', [8, 9])
+    assert elements['8'].attrib['id'] == '8'
+    assert elements['9'] is None  # 410 Gone
+    assert paths(server) == ['/api/0.6/nodes?nodes=8,9', '/api/0.6/node/8', '/api/0.6/node/9']
+
+
+def test_404_single_fetch_raises(serve):
+    server = serve(stand_in(missing={'13'}))
+    with pytest.raises(requests.exceptions.HTTPError):
+        OsmApi(f'{server.url}/api/0.6', min_interval=0).fetch('node', [8, 13])
+    assert paths(server)[-1] == '/api/0.6/node/13'
+
+
+def test_429_waits_retry_after(serve):
+    osm = OsmApi(f'{serve(failing([429, 429], {"Retry-After": "0.2"})).url}/api/0.6', min_interval=0)
+    started = time.monotonic()
+    assert osm.fetch('node', [1])['1'] is not None
+    assert time.monotonic() - started >= 0.4
+    assert osm.requests == 3
+
+
+@pytest.mark.parametrize('status', [500, 502, 503, 504])
+def test_5xx_is_retried(serve, status):
+    osm = OsmApi(f'{serve(failing([status], {"Retry-After": "0"})).url}/api/0.6', min_interval=0)
+    assert osm.fetch('node', [1])['1'] is not None
+    assert osm.requests == 2
+
+
+def test_retries_exhausted(serve):
+    osm = OsmApi(f'{serve(failing([503] * 3, {"Retry-After": "0"})).url}/api/0.6', min_interval=0, retries=2)
+    with pytest.raises(requests.exceptions.HTTPError):
+        osm.fetch('node', [1])
+    assert osm.requests == 3
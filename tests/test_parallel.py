@@ -0,0 +1,53 @@
+import esy.osm.pbf
+import pytest
+
+import main
+from bench import Fixture
+from conftest import ROOT
+from replay import Fault, StandIn
+
+
+@pytest.fixture(scope='module')
+def fixture(tmp_path_factory):
+    return Fixture(nodes=30_000, ways=5_000, relations=500, block_size=500).build(str(tmp_path_factory.mktemp('bench')))
+
+
+def run(fixture: str, directory, processes: int) -> dict:
+    """Analyse de fixture en processes processus : constats, names.csv et compteurs."""
+    server = StandIn(str(directory), [fixture], {'api': Fault(0.0, {410: 0.05})}).start()
+    app = main.Application(
+        log_findings=False, osm_api=f'{server.url}/api/0.6', api_interval=0,
+        josm_output=str(directory / f'josm-{processes}.jsonl')
+    )
+    found = []
+    app.subscribers.append(found.append)
+    try:
+        with esy.osm.pbf.File(fixture) as pbf:
+            app.parse('Bench', pbf, processes)
+        app.save_names(str(directory / f'names-{processes}.csv'))
+    finally:
+        app.close_workers()
+        app.josm.close()
+        app.names.close()
+        server.close()
+    return {
+        'findings': found,
+        'names': (directory / f'names-{processes}.csv').read_bytes(),
+        'errors': app.errors,
+        'lookups': app._verdicts.hits + app._verdicts.misses,  # Un cache par processus : seule la somme est égale
+        'seen': {type_: len(ids) for type_, ids in app.seen.items()},
+        'elements': app.metrics.elements,
+    }
+
+
+@pytest.mark.parametrize('extracts', [1, 2])
+def test_parallel_matches_serial(fixture, tmp_path, monkeypatch, extracts):
+    """Région d'un extrait, ou de deux extraits qui se recouvrent (éléments vus publiés d'un extrait à l'autre)."""
+    monkeypatch.chdir(ROOT)
+    region = tmp_path / 'region.osm.pbf'
+    with open(fixture, 'rb') as f:
+        region.write_bytes(f.read() * extracts)
+    serial = run(str(region), tmp_path, 1)
+    parallel = run(str(region), tmp_path, 3)
+    assert serial['findings']
+    assert parallel == serial
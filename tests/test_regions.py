@@ -0,0 +1,57 @@
+import esy.osm.pbf
+import pytest
+
+import main
+from conftest import ROOT, write_pbf
+
+STREET = (10, (1, 2), {'highway': 'residential', 'name': 'Rue Test'})
+NODES = [(1, 2.3495, 48.8505, {}), (2, 2.3505, 48.8505, {})]
+ADDRESS = (3, 2.35, 48.85, {'addr:housenumber': '1', 'addr:street': 'Rue Test'})
+
+
+@pytest.fixture
+def application(tmp_path, monkeypatch):
+    monkeypatch.chdir(ROOT)
+    apps = []
+
+    def start(**options) -> main.Application:
+        app = main.Application(log_findings=False, josm_output=str(tmp_path / 'josm.jsonl'), **options)
+        app.found = []
+        app.subscribers.append(app.found.append)
+        apps.append(app)
+        return app
+
+    yield start
+    for app in apps:
+        app.josm.close()
+        app.names.close()
+
+
+def missing(app) -> list:
+    return [finding.id for finding in app.found if finding.check == 'addr_street_sans_voie']
+
+
+def parse(app, region: str, path: str) -> None:
+    with esy.osm.pbf.File(path) as pbf:
+        app.parse(region, pbf)
+
+
+def test_street_seen_in_previous_region(application, tmp_path):
+    """La voie, déjà vue dans la région A, reste connue des adresses de la région B."""
+    app = application()
+    parse(app, 'A', write_pbf(tmp_path / 'a.osm.pbf', NODES, [STREET]))
+    parse(app, 'B', write_pbf(tmp_path / 'b.osm.pbf', [*NODES, ADDRESS], [STREET]))
+    assert missing(app) == []
+
+
+def test_street_next_to_area(application, tmp_path):
+    """Adresse dans la zone d'analyse, voie juste à côté."""
+    app = application(area='2.3499,48.8499,2.3501,48.8501')
+    parse(app, 'A', write_pbf(tmp_path / 'a.osm.pbf', [*NODES, ADDRESS], [STREET]))
+    assert missing(app) == []
+
+
+def test_street_missing(application, tmp_path):
+    app = application()
+    parse(app, 'A', write_pbf(tmp_path / 'a.osm.pbf', [*NODES, ADDRESS], [(*STREET[:2], {'name': 'Rue Test'})]))
+    assert missing(app) == [3]
@@ -0,0 +1,47 @@
+import os
+import random
+
+import pytest
+
+from bench import street_names
+from conftest import ROOT
+from rules import _fragment, compile_rules
+
+
+@pytest.fixture(scope='module')
+def rules():
+    return compile_rules(os.path.join(ROOT, 'invalid_ways_name.csv'))
+
+
+def variants(name: str):
+    """Libellé, ses variantes de casse et d'apostrophe, et ses lettres équivalentes pour re.IGNORECASE."""
+    yield name
+    yield name.upper()
+    yield name.lower()
+    yield name.swapcase()
+    yield name.replace("'", '’')
+    yield name.replace('’', "'")
+    yield name.replace('s', 'ſ').replace('k', 'K').replace('i', 'İ')
+
+
+def names(rules) -> list:
+    rng = random.Random(0)
+    values = street_names(500, rng)
+    # Fragments littéraux de chaque règle, seuls et au milieu d'un libellé
+    for rule in rules:
+        fragment = _fragment(rule[0])
+        values += [fragment, f"Rue de l'{fragment} Haute"]
+    values += ["Rue de l'Église", 'Rue de l’Église', 'Allée des  Tilleuls', ' Rue du Moulin', 'Rue du Moulin ']
+    return [variant for value in values for variant in variants(value)]
+
+
+def test_candidates_match_linear_scan(rules):
+    """Les règles retenues par l'index trouvent exactement les mêmes occurrences que l'évaluation de toutes."""
+    compiled = [rule[0] for rule in rules]
+    for value in names(rules):
+        expected = [i for i, regex in enumerate(compiled) if regex.search(value)]
+        assert [i for i in rules.candidates(value) if compiled[i].search(value)] == expected, value
+        start = len(compiled) // 2
+        assert [i for i in rules.candidates(value, start) if compiled[i].search(value)] == [
+            i for i in expected if i >= start
+        ], value
@@ -0,0 +1,36 @@
+import pytest
+
+from rules import RuleSet, _validate
+from similar import rule
+
+PAIRS = [
+    ('Rue du 1ere Mai', 'Rue du 1er Mai'),
+    ('Rue du 8 Mia 1945', 'Rue du 8 Mai 1945'),
+    ('Rue Victor Hgo', 'Rue Victor Hugo'),
+    ('Chemin d\\Eglise', 'Chemin d\\Église'),
+    ('Rue A\\1', 'Rue B\\2'),
+    ('Rue\\1 de  la Mairie', 'Rue\\2 de la Mairie'),
+    ('Allee des Tilleuls', 'Allée des Tilleuls'),
+    ('Rue St. Jean', 'Rue Saint Jean'),
+    ("Rue 'Pasteur", 'Rue Pasteur'),
+    ('Rue Jean- Jaurès', 'Rue Jean Jaurès'),
+    ('Rue -Gambetta', 'Rue Gambetta'),
+]
+
+
+@pytest.mark.parametrize('rare, frequent', PAIRS)
+def test_suggested_rule_applies(rare, frequent):
+    compiled = _validate(1, list(rule(rare, frequent)))
+    rules = RuleSet([compiled])
+    assert rules.candidates(rare) == [0]
+    match = rules[0][0].search(rare)
+    assert match and match.expand(rules[0][1]) == frequent
+
+
+@pytest.mark.parametrize('rare, frequent, pattern', [
+    ('Rue St. Jean', 'Rue Saint Jean', r'(?i)^(.*)\bSt\.(.*)$'),
+    ("Rue 'Pasteur", 'Rue Pasteur', r"(?i)^(.*)'Pasteur\b(.*)$"),
+    ('Rue Victor Hgo', 'Rue Victor Hugo', r'(?i)^(.*)\bHgo\b(.*)$'),
+])
+def test_word_boundaries_on_word_characters_only(rare, frequent, pattern):
+    assert rule(rare, frequent)[0] == pattern
@@ -0,0 +1,52 @@
+import esy.osm.pbf
+import pytest
+
+from streets import StreetIndex
+
+RADIUS = 200
+CELL_LAT = RADIUS / StreetIndex.METERS_PER_DEGREE
+CELL_LON = 2 * CELL_LAT
+ROW, COL = int((48.5 + 90) / CELL_LAT), int((2.5 + 180) / CELL_LON)
+
+
+def center(row: int, col: int) -> tuple:
+    return (col + 0.5) * CELL_LON - 180, (row + 0.5) * CELL_LAT - 90
+
+
+def index(dy: int, dx: int) -> StreetIndex:
+    """Adresse au centre d'une cellule, voie de même nom dans la cellule décalée de (dy, dx)."""
+    streets = StreetIndex(RADIUS)
+    lon, lat = center(ROW + dy, COL + dx)
+    address = esy.osm.pbf.Node(1, {'addr:street': 'Rue de la Mairie'}, center(ROW, COL))
+    streets.add_nodes([
+        address, esy.osm.pbf.Node(2, {}, (lon - CELL_LON / 4, lat)), esy.osm.pbf.Node(3, {}, (lon + CELL_LON / 4, lat))
+    ])
+    streets.add_address(address)
+    streets.add_way(esy.osm.pbf.Way(10, {'name': 'rue de la  Mairie', 'highway': 'residential'}, (2, 3)))
+    return streets
+
+
+@pytest.mark.parametrize('dy, dx', [(dy, dx) for dy in (-1, 0, 1) for dx in (-1, 0, 1)])
+def test_street_in_neighbour_cell(dy, dx):
+    assert list(index(dy, dx).missing()) == []
+
+
+@pytest.mark.parametrize('dy, dx', [(-2, 0), (2, 0), (0, -2), (0, 2), (2, -2), (-2, 2)])
+def test_street_too_far(dy, dx):
+    assert list(index(dy, dx).missing()) == [(1, 'Rue de la Mairie')]
+
+
+def test_long_segment_is_clipped():
+    """Un côté traversant la planète n'est tracé qu'autour des adresses."""
+    streets = StreetIndex(RADIUS)
+    address = esy.osm.pbf.Node(1, {'addr:street': 'Grande Rue'}, (2.5, 48.5))
+    streets.add_nodes([address, esy.osm.pbf.Node(2, {}, (-179.0, 48.5)), esy.osm.pbf.Node(3, {}, (179.0, 48.5))])
+    streets.add_address(address)
+    streets.add_way(esy.osm.pbf.Way(10, {'name': 'Grande Rue', 'highway': 'primary'}, (2, 3)))
+    assert list(streets.missing()) == []
+
+
+def test_many_chunks(monkeypatch):
+    monkeypatch.setattr(StreetIndex, 'CHUNK', 1)
+    assert list(index(1, -1).missing()) == []
+    assert list(index(2, 2).missing()) == [(1, 'Rue de la Mairie')]